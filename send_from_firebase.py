@@ -54,7 +54,7 @@ try:
             insights = saved_insights['data']
             
             # Format message
-            message = format_insight_message(insights, user['name'])
+            message = format_insight_message(insights, user['name'], user.get('frequency'))
             
             # Send via WhatsApp
             whatsapp.send_text_message(user['phone'], message)
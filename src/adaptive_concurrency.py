@@ -0,0 +1,132 @@
+"""
+Adaptive (AIMD) concurrency limit for outbound Graph API calls
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from loguru import logger
+
+from src.config import settings
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Find the highest sustainable number of in-flight requests
+    
+    Additive increase: every `limit` healthy responses raise the limit by
+    one, i.e. +1 per round of requests. Multiplicative decrease: a throttling
+    response cuts the limit by `backoff`; latency above the target trims it
+    more gently. Throttles arriving within `target_latency` of a cut come
+    from requests that were already in flight, so they don't cut again.
+    
+    Callers block in acquire() while the limit is reached, so a pool of
+    worker threads sized to `max_limit` self-regulates to the tier's rate.
+    """
+    
+    def __init__(self, min_limit: Optional[int] = None, max_limit: Optional[int] = None,
+                 initial_limit: Optional[int] = None, target_latency: Optional[float] = None,
+                 backoff: float = 0.5, latency_backoff: float = 0.9,
+                 is_throttle: Optional[Callable[[Exception], bool]] = None):
+        """
+        Initialize limiter
+        
+        Args:
+            min_limit: Lowest concurrency (default: settings.send_concurrency_min)
+            max_limit: Highest concurrency (default: settings.send_concurrency_max)
+            initial_limit: Starting concurrency (default: settings.send_concurrency_initial)
+            target_latency: Response time in seconds above which the limit is trimmed
+                            (default: settings.send_target_latency_seconds)
+            backoff: Factor applied to the limit on a throttling response
+            latency_backoff: Factor applied when latency exceeds the target
+            is_throttle: Predicate deciding whether an exception is a rate-limit response
+        """
+        self.min_limit = min_limit or settings.send_concurrency_min
+        self.max_limit = max_limit or settings.send_concurrency_max
+        self.target_latency = target_latency or settings.send_target_latency_seconds
+        self.backoff = backoff
+        self.latency_backoff = latency_backoff
+        self.is_throttle = is_throttle or (lambda e: False)
+        
+        self._limit = float(initial_limit or settings.send_concurrency_initial)
+        self._in_flight = 0
+        self._last_cut = 0.0
+        self._condition = threading.Condition()
+    
+    @property
+    def limit(self) -> int:
+        """Current concurrency limit"""
+        return int(self._limit)
+    
+    @property
+    def in_flight(self) -> int:
+        """Requests currently holding a slot"""
+        return self._in_flight
+    
+    def acquire(self):
+        """Block until a request slot is free"""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+    
+    def release(self):
+        """Free a request slot"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+    
+    def on_success(self, latency: float):
+        """
+        Record a healthy response
+        
+        Args:
+            latency: Response time in seconds
+        """
+        with self._condition:
+            if latency > self.target_latency:
+                self._decrease(self.latency_backoff, f"latency {latency:.2f}s")
+                return
+            if self._limit < self.max_limit:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+                # A raised limit may admit a waiting caller
+                self._condition.notify()
+    
+    def on_throttle(self):
+        """Record a rate-limit response"""
+        with self._condition:
+            self._decrease(self.backoff, "throttled")
+    
+    def _decrease(self, factor: float, reason: str):
+        """Cut the limit, at most once per cooldown (caller holds the lock)"""
+        now = time.monotonic()
+        if now - self._last_cut < self.target_latency:
+            return
+        self._last_cut = now
+        previous = int(self._limit)
+        self._limit = max(float(self.min_limit), self._limit * factor)
+        if int(self._limit) != previous:
+            logger.info(f"Send concurrency {previous} -> {int(self._limit)} ({reason})")
+    
+    @contextmanager
+    def slot(self):
+        """
+        Hold a slot for one request and feed its outcome back
+        
+        Example:
+            with limiter.slot():
+                response = session.post(url, data=body)
+        """
+        self.acquire()
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            if self.is_throttle(e):
+                self.on_throttle()
+            raise
+        else:
+            self.on_success(time.perf_counter() - start)
+        finally:
+            self.release()
@@ -0,0 +1,96 @@
+"""
+Async Firebase Manager for the ASGI webhook server
+"""
+from firebase_admin import firestore_async
+from google.cloud.firestore_v1.base_query import FieldFilter
+from datetime import datetime
+from typing import Dict, List, Optional
+from loguru import logger
+
+from src.firebase_manager import FIRESTORE_BATCH_LIMIT, initialize_firebase
+from src.utils import format_phone_number
+
+
+class AsyncFirebaseManager:
+    """Non-blocking Firestore operations needed to answer inbound messages"""
+    
+    def __init__(self):
+        """Initialize async Firestore client"""
+        initialize_firebase()
+        
+        self.db = firestore_async.client()
+        self.users_collection = self.db.collection('whatsapp_users')
+        self.insights_collection = self.db.collection('insights')
+        self.statuses_collection = self.db.collection('message_statuses')
+    
+    async def get_user_by_phone(self, phone: str) -> Optional[Dict]:
+        """
+        Get user by phone number
+        
+        Args:
+            phone: Phone number to search for
+            
+        Returns:
+            User dictionary with ID, or None if not found
+        """
+        formatted_phone = format_phone_number(phone)
+        query = self.users_collection.where(filter=FieldFilter('phone', '==', formatted_phone)).limit(1)
+        
+        async for doc in query.stream():
+            user_data = doc.to_dict()
+            user_data['id'] = doc.id
+            return user_data
+        
+        return None
+    
+    async def get_insights(self, user_id: str) -> Optional[Dict]:
+        """
+        Get insights for a specific user
+        
+        Args:
+            user_id: User's Firebase document ID
+            
+        Returns:
+            Insights dictionary or None
+        """
+        doc = await self.insights_collection.document(user_id).get()
+        
+        if doc.exists:
+            return doc.to_dict()
+        return None
+    
+    async def delete_user(self, user_id: str):
+        """
+        Delete a user (soft delete by setting active=False)
+        
+        Args:
+            user_id: User's Firebase document ID
+        """
+        await self.users_collection.document(user_id).update({'active': False})
+        logger.info(f"Deactivated user {user_id}")
+    
+    async def reactivate_user(self, user_id: str):
+        """
+        Reactivate a previously deactivated user
+        
+        Args:
+            user_id: User's Firebase document ID
+        """
+        await self.users_collection.document(user_id).update({'active': True})
+        logger.info(f"Reactivated user {user_id}")
+    
+    async def save_message_statuses(self, records: List[Dict]):
+        """
+        Persist coalesced status records in batched commits
+        
+        Args:
+            records: Records from StatusBuffer.drain(), one per message ID
+        """
+        for start in range(0, len(records), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for record in records[start:start + FIRESTORE_BATCH_LIMIT]:
+                doc_ref = self.statuses_collection.document(record['message_id'])
+                batch.set(doc_ref, {**record, "updated_at": datetime.now()}, merge=True)
+            await batch.commit()
+        
+        logger.debug(f"Saved {len(records)} message statuses")
@@ -0,0 +1,99 @@
+"""
+Async WhatsApp sender for the ASGI webhook server
+"""
+import httpx
+from typing import Dict
+from loguru import logger
+
+from src.circuit_breaker import CircuitBreaker
+from src.config import settings
+from src.utils import format_phone_number
+
+
+def is_async_graph_outage(error: Exception) -> bool:
+    """
+    Whether an httpx error means the Graph API itself is unhealthy
+    
+    Mirrors whatsapp_sender.is_graph_outage: transport errors (connection
+    failures, timeouts) and 5xx responses count, 4xx responses don't.
+    """
+    if isinstance(error, httpx.TransportError):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return False
+
+
+# One breaker per process for async calls to graph.facebook.com
+ASYNC_GRAPH_BREAKER = CircuitBreaker("graph_api", is_failure=is_async_graph_outage)
+
+
+class AsyncWhatsAppSender:
+    """Send WhatsApp messages via Meta's Business API without blocking the event loop"""
+    
+    def __init__(self):
+        """Initialize a pooled async HTTP client with Meta credentials"""
+        self.phone_number_id = settings.whatsapp_phone_number_id
+        self.base_url = f"{settings.meta_graph_api_url}/{self.phone_number_id}/messages"
+        
+        self.client = httpx.AsyncClient(
+            headers={
+                "Authorization": f"Bearer {settings.whatsapp_access_token}",
+                "Content-Type": "application/json"
+            },
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        )
+        
+        logger.info(f"Async WhatsApp sender initialized with phone ID: {self.phone_number_id}")
+    
+    async def close(self):
+        """Close pooled connections"""
+        await self.client.aclose()
+    
+    async def send_text_message(self, to: str, message: str) -> Dict:
+        """
+        Send a text message via WhatsApp
+        
+        Args:
+            to: Recipient phone number (will be formatted to E.164)
+            message: Message text to send
+            
+        Returns:
+            API response dictionary
+            
+        Raises:
+            CircuitOpenError: If the Graph API circuit is open - no request is made
+        """
+        formatted_phone = format_phone_number(to)
+        
+        payload = {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": formatted_phone,
+            "type": "text",
+            "text": {
+                "preview_url": False,
+                "body": message
+            }
+        }
+        
+        ASYNC_GRAPH_BREAKER.before_call()
+        try:
+            response = await self.client.post(self.base_url, json=payload)
+            response.raise_for_status()
+            ASYNC_GRAPH_BREAKER.record_success()
+            
+            result = response.json()
+            logger.success(f"Message sent to {formatted_phone}: {result.get('messages', [{}])[0].get('id', 'unknown')}")
+            return result
+            
+        except httpx.HTTPStatusError as e:
+            ASYNC_GRAPH_BREAKER.record_failure(e)
+            logger.error(f"Failed to send message to {formatted_phone}: {e}")
+            logger.error(f"Response: {e.response.text}")
+            raise
+        except Exception as e:
+            ASYNC_GRAPH_BREAKER.record_failure(e)
+            logger.error(f"Unexpected error sending message: {e}")
+            raise
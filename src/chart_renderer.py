@@ -0,0 +1,332 @@
+"""
+Headless PNG charts of weekly insight metrics, rendered with NumPy
+"""
+import hashlib
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+from loguru import logger
+
+from src.config import settings
+from src.insight_deltas import TREND_METRICS, numeric_value
+
+
+# Indexed palette: background, axis, previous week, this week (up), this week (down), text
+PALETTE = bytes([
+    255, 255, 255,
+    200, 200, 200,
+    170, 180, 195,
+    37, 160, 90,
+    210, 70, 60,
+    40, 40, 40,
+])
+BACKGROUND, AXIS, PREVIOUS, UP, DOWN, TEXT = range(6)
+
+LABELS = {
+    "leads": "LEADS",
+    "new_offers": "OFFERS",
+    "sales": "SALES",
+    "revenue": "REV",
+    "commission": "COMM",
+    "active_listings": "LIST",
+    "avg_price": "PRICE",
+    "sales_velocity": "DAYS",
+}
+
+# 3x5 bitmap glyphs, enough for the labels and percentages
+GLYPHS = {
+    "A": ("010", "101", "111", "101", "101"), "C": ("011", "100", "100", "100", "011"),
+    "D": ("110", "101", "101", "101", "110"), "E": ("111", "100", "110", "100", "111"),
+    "F": ("111", "100", "110", "100", "100"), "I": ("111", "010", "010", "010", "111"),
+    "L": ("100", "100", "100", "100", "111"), "M": ("101", "111", "111", "101", "101"),
+    "N": ("110", "101", "101", "101", "101"), "O": ("010", "101", "101", "101", "010"),
+    "P": ("110", "101", "110", "100", "100"), "Y": ("101", "101", "010", "010", "010"),
+    "R": ("110", "101", "110", "101", "101"), "S": ("011", "100", "010", "001", "110"),
+    "T": ("111", "010", "010", "010", "010"), "V": ("101", "101", "101", "101", "010"),
+    "0": ("111", "101", "101", "101", "111"), "1": ("010", "110", "010", "010", "111"),
+    "2": ("110", "001", "010", "100", "111"), "3": ("110", "001", "010", "001", "110"),
+    "4": ("101", "101", "111", "001", "001"), "5": ("111", "100", "110", "001", "110"),
+    "6": ("011", "100", "111", "101", "111"), "7": ("111", "001", "010", "010", "010"),
+    "8": ("111", "101", "111", "101", "111"), "9": ("111", "101", "111", "001", "110"),
+    "+": ("000", "010", "111", "010", "000"), "-": ("000", "000", "111", "000", "000"),
+    "%": ("101", "001", "010", "100", "101"), " ": ("000", "000", "000", "000", "000"),
+}
+GLYPH_BITMAPS = {char: np.array([[c == "1" for c in row] for row in rows]) for char, rows in GLYPHS.items()}
+
+
+def chart_inputs(insights: Dict) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    """
+    Extract what the chart draws: (previous, current) per trend metric
+    
+    Args:
+        insights: Insights dictionary, optionally with 'deltas'
+    
+    Returns:
+        Dictionary of metric -> (previous or None, current)
+    """
+    deltas = insights.get("deltas", {})
+    inputs = {}
+    for metric in TREND_METRICS:
+        current = numeric_value(insights.get(metric))
+        if current is not None:
+            inputs[metric] = (deltas.get(metric, {}).get("previous"), current)
+    return inputs
+
+
+def chart_key(inputs: Dict) -> str:
+    """Hash of the chart inputs - identical numbers give an identical image"""
+    return hashlib.sha256(orjson.dumps(inputs, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def encode_png(pixels: np.ndarray, palette: bytes = PALETTE) -> bytes:
+    """
+    Encode an indexed image as PNG
+    
+    Args:
+        pixels: 2D uint8 array of palette indexes
+        palette: RGB triples
+    
+    Returns:
+        PNG file bytes
+    """
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    
+    height, width = pixels.shape
+    # Filter byte 0 (none) before each scanline
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), pixels.astype(np.uint8)]).tobytes()
+    
+    return b"".join((
+        b"\x89PNG\r\n\x1a\n",
+        chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)),
+        chunk(b"PLTE", palette),
+        chunk(b"IDAT", zlib.compress(raw, 9)),
+        chunk(b"IEND", b""),
+    ))
+
+
+def _draw_text(canvas: np.ndarray, text: str, x: int, y: int, color: int, scale: int = 2):
+    """Draw text with its top-left corner at (x, y)"""
+    x = max(0, x)
+    for char in text:
+        glyph = GLYPH_BITMAPS.get(char.upper(), GLYPH_BITMAPS[" "])
+        block = glyph.repeat(scale, axis=0).repeat(scale, axis=1)
+        h, w = block.shape
+        region = canvas[y:y + h, x:x + w]
+        region[block[:region.shape[0], :region.shape[1]]] = color
+        x += (glyph.shape[1] + 1) * scale
+
+
+def _text_width(text: str, scale: int = 2) -> int:
+    """Width in pixels of text drawn by _draw_text"""
+    return len(text) * 4 * scale - scale
+
+
+def render_chart(inputs: Dict[str, Tuple[Optional[float], Optional[float]]],
+                 width: int = 480, height: int = 240) -> bytes:
+    """
+    Draw paired bars (previous report, this report) for each metric
+    
+    Metrics have very different scales, so each pair is normalized to its
+    own maximum and labelled with the change since the previous report.
+    
+    Args:
+        inputs: Output of chart_inputs()
+        width: Image width in pixels
+        height: Image height in pixels
+    
+    Returns:
+        PNG bytes
+    """
+    canvas = np.full((height, width), BACKGROUND, dtype=np.uint8)
+    if not inputs:
+        return encode_png(canvas)
+    
+    top, bottom = 28, height - 24
+    canvas[bottom, 8:width - 8] = AXIS
+    
+    slot = (width - 16) // len(inputs)
+    bar = max(4, slot // 4)
+    
+    for i, (metric, (previous, current)) in enumerate(inputs.items()):
+        left = 8 + i * slot
+        centre = left + slot // 2
+        peak = max(abs(previous or 0), abs(current), 1)
+        
+        def draw_bar(value: float, x: int, color: int):
+            bar_height = int((bottom - top) * abs(value) / peak)
+            canvas[bottom - bar_height:bottom, x:x + bar] = color
+        
+        if previous is not None:
+            draw_bar(previous, centre - bar - 1, PREVIOUS)
+        draw_bar(current, centre + 1 if previous is not None else centre - bar // 2,
+                 DOWN if previous is not None and current < previous else UP)
+        
+        label = LABELS.get(metric, metric[:5].upper())
+        _draw_text(canvas, label, centre - _text_width(label) // 2, bottom + 6, TEXT)
+        
+        if previous:
+            change = f"{(current - previous) / abs(previous) * 100:+.0f}%"
+            _draw_text(canvas, change, centre - _text_width(change) // 2, 8,
+                       DOWN if current < previous else UP)
+    
+    return encode_png(canvas)
+
+
+def _render_keyed(item: Tuple[str, Dict]) -> Tuple[str, bytes]:
+    """Process-pool entry point"""
+    key, inputs = item
+    return key, render_chart(inputs)
+
+
+class ChartRenderer:
+    """
+    Render insight charts in worker processes with an on-disk render cache
+    
+    Renders are keyed by a hash of the charted numbers, so users with
+    identical metrics (and re-runs of the same week) reuse one file. Almost
+    every chart is unique to its user, so files older than the cache's max
+    age are pruned when the renderer starts.
+    """
+    
+    def __init__(self, cache_dir: Optional[str] = None, processes: Optional[int] = None,
+                 max_age_days: Optional[float] = None):
+        """
+        Initialize renderer
+        
+        Args:
+            cache_dir: Directory of cached PNGs (default: settings.chart_cache_dir)
+            processes: Worker processes (default: CPU count)
+            max_age_days: Age after which cached PNGs are deleted
+                          (default: settings.chart_cache_max_age_days)
+        """
+        self.cache_dir = cache_dir or settings.chart_cache_dir
+        self.max_age_seconds = (max_age_days or settings.chart_cache_max_age_days) * 86400
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.prune()
+        self.pool = ProcessPoolExecutor(max_workers=processes)
+        self.hits = 0
+        self.renders = 0
+        self._counts_lock = threading.Lock()
+    
+    def prune(self) -> int:
+        """
+        Delete cached PNGs (and abandoned temp files) older than the max age
+        
+        Returns:
+            Number of files removed
+        """
+        cutoff = time.time() - self.max_age_seconds
+        removed = 0
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                        removed += 1
+                except FileNotFoundError:
+                    # Another process pruned it first
+                    continue
+        if removed:
+            logger.info(f"Pruned {removed} cached charts older than "
+                        f"{self.max_age_seconds / 86400:g} days")
+        return removed
+    
+    def _path(self, key: str) -> str:
+        """Cache file for a render key"""
+        return os.path.join(self.cache_dir, f"{key}.png")
+    
+    def _cached(self, key: str) -> Optional[bytes]:
+        """Cached PNG bytes, or None on a miss"""
+        try:
+            with open(self._path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+    
+    def _store(self, key: str, png: bytes):
+        """Write a render to the cache atomically"""
+        tmp_path = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(png)
+        os.replace(tmp_path, self._path(key))
+    
+    def render(self, insights: Dict) -> bytes:
+        """
+        Get one user's chart, rendering it in a worker process on a cache miss
+        
+        Safe to call from many threads; each blocks only on its own render.
+        
+        Args:
+            insights: Insights dictionary (with 'deltas' for previous-report bars)
+        
+        Returns:
+            PNG bytes
+        """
+        inputs = chart_inputs(insights)
+        key = chart_key(inputs)
+        
+        png = self._cached(key)
+        if png is not None:
+            with self._counts_lock:
+                self.hits += 1
+            return png
+        
+        _, png = self.pool.submit(_render_keyed, (key, inputs)).result()
+        self._store(key, png)
+        with self._counts_lock:
+            self.renders += 1
+        return png
+    
+    def render_many(self, insights_list: List[Dict], chunksize: int = 64) -> List[bytes]:
+        """
+        Render charts for a batch of users, in chunks across all cores
+        
+        Args:
+            insights_list: Insights dictionaries
+            chunksize: Charts sent to a worker per task
+        
+        Returns:
+            PNG bytes in input order
+        """
+        keyed = [(chart_key(inputs), inputs) for inputs in map(chart_inputs, insights_list)]
+        results = {key: self._cached(key) for key, _ in keyed}
+        missing = {key: inputs for key, inputs in keyed if results[key] is None}
+        
+        for key, png in self.pool.map(_render_keyed, missing.items(), chunksize=chunksize):
+            self._store(key, png)
+            results[key] = png
+        
+        with self._counts_lock:
+            self.hits += len(keyed) - len(missing)
+            self.renders += len(missing)
+        return [results[key] for key, _ in keyed]
+    
+    def close(self):
+        """Shut down the worker processes"""
+        self.pool.shutdown()
+        logger.info(f"Charts: {self.renders} rendered, {self.hits} served from cache")
+
+
+if __name__ == "__main__":
+    # Render a sample chart
+    sample = {
+        "leads": 145, "new_offers": 4, "sales": 3, "revenue": 8_000_000,
+        "commission": 240_000, "active_listings": 42,
+        "deltas": {
+            "leads": {"previous": 120}, "new_offers": {"previous": 6}, "sales": {"previous": 3},
+            "revenue": {"previous": 6_500_000}, "commission": {"previous": 195_000},
+            "active_listings": {"previous": 45},
+        },
+    }
+    png = render_chart(chart_inputs(sample))
+    with open("sample_chart.png", "wb") as f:
+        f.write(png)
+    print(f"Wrote sample_chart.png ({len(png):,} bytes)")
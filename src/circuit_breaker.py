@@ -0,0 +1,166 @@
+"""
+Circuit breakers for outbound calls to the Graph API and Firestore
+"""
+import functools
+import threading
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+
+from src.config import settings
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of making a call while a circuit is open"""
+    
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Stop calling a dependency that keeps failing
+    
+    closed    - calls go through; consecutive failures are counted
+    open      - calls fail immediately with CircuitOpenError until the
+                recovery timeout has passed
+    half-open - a single probe call is let through; success closes the
+                circuit, failure opens it again for another timeout
+    
+    Only errors that indicate the dependency is unhealthy should trip the
+    breaker - a 400 for a bad phone number says nothing about the API.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+    
+    def __init__(self, name: str, failure_threshold: Optional[int] = None,
+                 recovery_timeout: Optional[float] = None,
+                 is_failure: Optional[Callable[[Exception], bool]] = None):
+        """
+        Initialize breaker
+        
+        Args:
+            name: Dependency name for logs and errors
+            failure_threshold: Consecutive failures that open the circuit
+                               (default: settings.circuit_failure_threshold)
+            recovery_timeout: Seconds to stay open before probing
+                              (default: settings.circuit_recovery_seconds)
+            is_failure: Predicate deciding whether an exception counts as a
+                        dependency failure (default: every exception)
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold or settings.circuit_failure_threshold
+        self.recovery_timeout = recovery_timeout or settings.circuit_recovery_seconds
+        self.is_failure = is_failure or (lambda e: True)
+        
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+    
+    @property
+    def state(self) -> str:
+        """Current state, moving open -> half-open once the timeout has passed"""
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self._state = self.HALF_OPEN
+            return self._state
+    
+    @property
+    def retry_after(self) -> float:
+        """Seconds until the circuit will allow a probe (0 if calls are allowed)"""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at))
+    
+    def before_call(self):
+        """
+        Check that a call may proceed
+        
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe in flight
+        """
+        with self._lock:
+            if self._state == self.OPEN:
+                elapsed = time.monotonic() - self._opened_at
+                if elapsed < self.recovery_timeout:
+                    raise CircuitOpenError(self.name, self.recovery_timeout - elapsed)
+                self._state = self.HALF_OPEN
+            
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    raise CircuitOpenError(self.name, self.recovery_timeout)
+                self._probing = True
+                logger.info(f"Circuit '{self.name}' half-open, probing")
+    
+    def record_success(self):
+        """Record a successful call"""
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.success(f"Circuit '{self.name}' closed, dependency recovered")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+    
+    def record_failure(self, error: Exception):
+        """
+        Record a failed call
+        
+        Args:
+            error: Exception raised by the call
+        """
+        with self._lock:
+            if not self.is_failure(error):
+                # The dependency answered - a client error still proves it is up
+                if self._state == self.HALF_OPEN:
+                    self._state = self.CLOSED
+                self._failures = 0
+                self._probing = False
+                return
+            
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.warning(f"Circuit '{self.name}' opened after {self._failures} "
+                                   f"failures: {error}")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+    
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call a function through the breaker
+        
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        self.before_call()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success()
+        return result
+
+
+def guarded(breaker: CircuitBreaker) -> Callable:
+    """
+    Decorator routing every call of a function through a breaker
+    
+    Args:
+        breaker: Breaker shared by all guarded calls to one dependency
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return breaker.call(func, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,233 @@
+"""
+Columnar cohort of users and their metrics for vectorized bulk processing
+"""
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.insight_deltas import TREND_METRICS, numeric_value
+from src.models import User
+from src.sharding import shard_for
+
+
+def _python_number(value: float) -> Union[int, float]:
+    """Convert a float64 back to the int/float a snapshot would have stored"""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class Cohort:
+    """
+    Users and their trend metrics held as parallel NumPy arrays
+    
+    Identity columns (ids, phones, names, time zones) are string arrays and
+    each metric is a float64 column with NaN where a user has no value.
+    Filtering, sorting, sharding, period-over-period deltas and aggregates are
+    whole-column operations; per-user objects are only touched when a row
+    is handed to the send pipeline.
+    """
+    
+    def __init__(self, users: Sequence[Union[Dict, User]]):
+        """
+        Build the identity columns
+        
+        Args:
+            users: User dictionaries or models (kept as the row objects)
+        """
+        self.rows: List[Union[Dict, User]] = list(users)
+        self.ids = np.array([user['id'] for user in self.rows], dtype=str)
+        self.phones = np.array([user.get('phone') or '' for user in self.rows], dtype=str)
+        self.names = np.array([user.get('name') or '' for user in self.rows], dtype=str)
+        self.timezones = np.array([user.get('timezone') or '' for user in self.rows], dtype=str)
+        self.metrics: Dict[str, np.ndarray] = {}
+        self.previous: Dict[str, np.ndarray] = {}
+    
+    def __len__(self) -> int:
+        return len(self.rows)
+    
+    def __iter__(self) -> Iterator[Union[Dict, User]]:
+        return iter(self.rows)
+    
+    # SELECTION
+    
+    def take(self, index: np.ndarray) -> "Cohort":
+        """
+        New cohort with the rows at an index array or boolean mask
+        
+        Args:
+            index: Integer positions or a boolean mask of length len(self)
+        """
+        index = np.flatnonzero(index) if index.dtype == bool else index
+        subset = Cohort.__new__(Cohort)
+        subset.rows = [self.rows[i] for i in index.tolist()]
+        subset.ids = self.ids[index]
+        subset.phones = self.phones[index]
+        subset.names = self.names[index]
+        subset.timezones = self.timezones[index]
+        subset.metrics = {name: column[index] for name, column in self.metrics.items()}
+        subset.previous = {name: column[index] for name, column in self.previous.items()}
+        return subset
+    
+    def filter(self, mask: np.ndarray) -> "Cohort":
+        """Rows where a boolean mask is True, e.g. cohort.filter(cohort.metrics['sales'] > 0)"""
+        return self.take(np.asarray(mask, dtype=bool))
+    
+    def sort_by(self, column: str, descending: bool = False) -> "Cohort":
+        """
+        Rows ordered by a metric or identity column (NaN metrics last)
+        
+        Args:
+            column: Metric name, or 'ids', 'phones', 'names', 'timezones'
+            descending: Largest first
+        """
+        values = self.metrics[column] if column in self.metrics else getattr(self, column)
+        if descending and values.dtype.kind == 'f':
+            # Negate rather than reverse, so NaNs still sort last
+            order = np.argsort(-values, kind='stable')
+        else:
+            order = np.argsort(values, kind='stable')
+            if descending:
+                order = order[::-1]
+        return self.take(order)
+    
+    def shard(self, shard_index: int, num_shards: int) -> "Cohort":
+        """
+        Rows belonging to a shard (same assignment as src.sharding.filter_shard)
+        
+        The keyed hash has no array form, so shard numbers are computed per ID;
+        selecting the rows is a single mask.
+        
+        Args:
+            shard_index: Shard owned by this worker
+            num_shards: Total number of shards
+        """
+        shards = np.fromiter((shard_for(user_id, num_shards) for user_id in self.ids.tolist()),
+                             dtype=np.int64, count=len(self))
+        return self.filter(shards == shard_index)
+    
+    # METRICS
+    
+    @staticmethod
+    def _metric_columns(records: Iterable[Optional[Dict]], size: int) -> Dict[str, np.ndarray]:
+        """Trend metric columns from per-user dictionaries, NaN where missing or non-numeric"""
+        columns = {metric: np.full(size, np.nan) for metric in TREND_METRICS}
+        for i, record in enumerate(records):
+            if not record:
+                continue
+            for metric in TREND_METRICS:
+                value = numeric_value(record.get(metric))
+                if value is not None:
+                    columns[metric][i] = value
+        return columns
+    
+    def set_metrics(self, insights: Sequence[Dict]):
+        """
+        Load this period's metrics
+        
+        Args:
+            insights: Insights dictionaries in row order
+        """
+        self.metrics = self._metric_columns(insights, len(self))
+    
+    def set_previous(self, snapshots: Dict[str, Dict]):
+        """
+        Load the previous period's metrics
+        
+        Args:
+            snapshots: User ID -> previously saved insights (see get_insights_bulk)
+        """
+        self.previous = self._metric_columns((snapshots.get(user_id) for user_id in self.ids.tolist()), len(self))
+    
+    def deltas(self) -> Dict[str, Dict[str, np.ndarray]]:
+        """
+        Change since the previous report for every user and metric at once
+        
+        Returns:
+            Dictionary of metric -> {'previous', 'change', 'percent', 'valid'} columns.
+            'valid' marks users with both values; 'percent' is NaN where the
+            previous value was zero.
+        """
+        deltas = {}
+        for metric in TREND_METRICS:
+            current = self.metrics.get(metric)
+            previous = self.previous.get(metric)
+            if current is None or previous is None:
+                continue
+            
+            change = current - previous
+            with np.errstate(divide='ignore', invalid='ignore'):
+                percent = np.where(previous != 0, change / previous * 100, np.nan)
+            deltas[metric] = {
+                "previous": previous,
+                "change": change,
+                "percent": percent,
+                "valid": ~np.isnan(current) & ~np.isnan(previous),
+            }
+        return deltas
+    
+    def delta_rows(self) -> List[Dict[str, Dict]]:
+        """
+        Per-user delta dictionaries, same shape as src.insight_deltas.compute_deltas
+        
+        Returns:
+            One dictionary per row (empty where no metric has both values)
+        """
+        rows = [{} for _ in range(len(self))]
+        for metric, delta in self.deltas().items():
+            valid = np.flatnonzero(delta["valid"])
+            if not valid.size:
+                continue
+            # Gather the valid entries column-wise and convert each column to
+            # Python numbers once, rather than indexing NumPy scalars per user
+            percent = delta["percent"][valid]
+            entries = zip(
+                valid.tolist(),
+                delta["previous"][valid].tolist(),
+                delta["change"][valid].tolist(),
+                np.where(np.isnan(percent), None, percent).tolist(),
+            )
+            for i, previous, change, percent_value in entries:
+                rows[i][metric] = {
+                    "previous": _python_number(previous),
+                    "change": _python_number(change),
+                    "percent": percent_value,
+                }
+        return rows
+    
+    def aggregate(self) -> Dict[str, Dict[str, float]]:
+        """
+        Cohort-wide statistics per metric, ignoring missing values
+        
+        Returns:
+            Dictionary of metric -> {'count', 'total', 'mean', 'median'}
+        """
+        stats = {}
+        for metric, column in self.metrics.items():
+            present = column[~np.isnan(column)]
+            stats[metric] = {
+                "count": int(present.size),
+                "total": float(present.sum()),
+                "mean": float(present.mean()) if present.size else 0.0,
+                "median": float(np.median(present)) if present.size else 0.0,
+            }
+        return stats
+
+
+if __name__ == "__main__":
+    # Vectorized deltas and aggregates over a synthetic cohort
+    from src.mock_insights import generate_mock_cohort, generate_mock_users, iter_mock_insights
+    
+    users = generate_mock_users(10000, seed=1)
+    cohort = Cohort(users)
+    cohort.set_metrics(list(iter_mock_insights(generate_mock_cohort(len(users), seed=1))))
+    cohort.set_previous({
+        user['id']: insights
+        for user, insights in zip(users, iter_mock_insights(generate_mock_cohort(len(users), seed=2)))
+    })
+    
+    top = cohort.sort_by("revenue", descending=True).take(np.arange(3))
+    print(f"Top revenue: {', '.join(top.names.tolist())}")
+    print(f"Users with sales: {len(cohort.filter(cohort.metrics['sales'] > 0))}")
+    for metric, stats in cohort.aggregate().items():
+        print(f"{metric:<16} total {stats['total']:>16,.0f}  median {stats['median']:>12,.1f}")
+    print(f"Sample deltas: {cohort.delta_rows()[0]}")
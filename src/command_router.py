@@ -0,0 +1,85 @@
+"""
+Command routing for inbound WhatsApp messages
+"""
+import re
+from typing import Dict, Iterable, Optional
+
+
+class CommandRouter:
+    """
+    Map message text to a command in a single regex pass
+    
+    All keywords are compiled into one alternation with a named group per
+    command, so classifying a message is one scan regardless of how many
+    commands are registered. The earliest keyword in the text wins.
+    Destructive commands can be registered whole_message, so they only
+    fire when the keyword is the entire message.
+    """
+    
+    def __init__(self):
+        """Initialize an empty router"""
+        self._alternatives: Dict[str, str] = {}
+        self._pattern: Optional[re.Pattern] = None
+    
+    def register(self, command: str, keywords: Iterable[str], whole_word: bool = True,
+                 whole_message: bool = False) -> "CommandRouter":
+        """
+        Add a command and the keywords that trigger it
+        
+        Args:
+            command: Command name (must be a valid identifier)
+            keywords: Trigger words or phrases
+            whole_word: Only match keywords on word boundaries
+                        (False matches prefixes too, e.g. 'insight' in 'insights')
+            whole_message: Only match when the trimmed message is just the keyword
+                           (optionally followed by '.' or '!'), e.g. so
+                           "please don't stop the reports" isn't an unsubscribe
+            
+        Returns:
+            The router, for chaining
+        """
+        # Longest first so 'sign up' isn't shadowed by a shorter keyword
+        escaped = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+        if whole_message:
+            self._alternatives[command] = rf"^\s*(?:{escaped})[.!]*\s*$"
+        elif whole_word:
+            self._alternatives[command] = rf"\b(?:{escaped})\b"
+        else:
+            self._alternatives[command] = rf"(?:{escaped})"
+        self._pattern = None
+        return self
+    
+    def compile(self) -> "CommandRouter":
+        """Build the combined pattern (done automatically on first match)"""
+        self._pattern = re.compile(
+            "|".join(f"(?P<{command}>{alt})" for command, alt in self._alternatives.items()),
+            re.IGNORECASE
+        )
+        return self
+    
+    def match(self, text: str) -> Optional[str]:
+        """
+        Find the command a message asks for
+        
+        Args:
+            text: Message text
+            
+        Returns:
+            Command name, or None if the message contains no command
+        """
+        if self._pattern is None:
+            self.compile()
+        found = self._pattern.search(text)
+        return found.lastgroup if found else None
+
+
+def build_command_router() -> CommandRouter:
+    """Router for the commands the webhook servers understand"""
+    return (
+        CommandRouter()
+        .register("insights", ["insight", "report", "stats"], whole_word=False)
+        .register("help", ["help", "commands", "menu"])
+        .register("stop", ["stop", "unsubscribe"], whole_message=True)
+        .register("signup", ["signup", "sign up", "subscribe", "join"])
+        .compile()
+    )
@@ -28,6 +28,7 @@ class Settings(BaseSettings):
     # Meta API Configuration
     meta_api_version: str = "v18.0"
     meta_api_base_url: str = "https://graph.facebook.com"
+    graph_timeout_seconds: float = 10.0
     
     # Firebase
     firebase_project_id: str
@@ -41,13 +42,66 @@ class Settings(BaseSettings):
     database_user: str
     database_password: str
     
+    # Inbound message throttling (per sender, per webhook worker)
+    inbound_rate_limit: int = 5  # Messages allowed per window
+    inbound_rate_window_seconds: float = 60.0
+    reply_coalesce_seconds: float = 30.0  # Repeated requests within this window get one reply
+    
+    # Webhook status callbacks (buffered and written in batches)
+    status_flush_size: int = 400
+    status_flush_interval_seconds: float = 5.0
+    
+    # Circuit breakers (Graph API and Firestore)
+    circuit_failure_threshold: int = 5  # Consecutive outage errors before failing fast
+    circuit_recovery_seconds: float = 30.0  # Time open before a half-open probe
+    parked_retry_rounds: int = 5  # Retries for users parked while a circuit was open
+    parked_throttle_backoff_seconds: float = 15.0  # First wait before retrying rate-limited users (doubles per round)
+    
+    # Adaptive send concurrency (AIMD on Graph API throttling and latency)
+    send_concurrency_min: int = 1
+    send_concurrency_initial: int = 4
+    send_concurrency_max: int = 32  # Also the scheduler's send thread count
+    send_target_latency_seconds: float = 2.0
+    cohort_block_size: int = 1024  # Users per vectorized delta block
+    render_workers: int = 0  # Processes rendering message bodies (0 = render in send threads)
+    render_chunk_size: int = 256  # Users per render task
+    recipient_min_gap_seconds: float = 6.0  # Pair rate limit: min time between messages to one phone
+    
     # Application
     environment: str = "development"
     log_level: str = "INFO"
     timezone: str = "Africa/Johannesburg"
     
+    # Template registry (cached /message_templates)
+    template_cache_path: str = "data/template_cache.json"
+    template_cache_ttl_seconds: int = 3600
+    
+    # Uploaded media IDs (valid 30 days at Meta)
+    media_cache_path: str = "data/media_cache.json"
+    media_cache_ttl_days: int = 29
+    media_cache_save_interval_seconds: float = 30  # New media IDs are written at most this often (and on exit)
+    chart_cache_dir: str = "data/chart_cache"  # Rendered chart PNGs keyed by metrics hash
+    chart_cache_max_age_days: float = 14  # Cached PNGs older than this are deleted
+    
+    # Insights
+    insights_combined_queries: bool = True  # One round-trip per user instead of four
+    insights_cursor_itersize: int = 2000  # Rows per fetch when streaming cohort insights
+    insights_delivery_mode: str = "text"  # "text" (24h window only) or "template" (weekly_insights)
+    
     # Scheduling
-    insights_schedule: str = "0 9 * * 1"  # Every Monday at 9 AM
+    insights_schedule: str = "0 9 * * 1"  # Weekly users: every Monday at 9 AM
+    insights_daily_schedule: str = "0 9 * * *"  # Daily users: every day at 9 AM
+    insights_monthly_schedule: str = "0 9 1 * *"  # Monthly users: 1st of the month at 9 AM
+    
+    # Delivery window (local time per user) and spread-out dispatch
+    delivery_spread: bool = False
+    delivery_window_start: str = "08:00"
+    delivery_window_end: str = "10:00"
+    dispatch_lag_warning_seconds: float = 60.0  # Warn when spread sends fall this far behind plan
+    
+    # Sharding (parallel schedulers)
+    shard_coordinator_path: str = "data/shard_coordinator.sqlite"
+    shard_lease_seconds: int = 900
     
     @property
     def meta_graph_api_url(self) -> str:
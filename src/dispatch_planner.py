@@ -0,0 +1,159 @@
+"""
+Time-zone aware dispatch planning for spreading sends across a delivery window
+"""
+import heapq
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import pytz
+from loguru import logger
+
+from src.config import settings
+
+
+class DispatchPlanner:
+    """
+    Spread deliveries evenly across each user's local delivery window
+
+    Users are grouped by time zone and the sends for each group are spaced
+    evenly across that zone's next window (e.g. 08:00-10:00 local). The
+    resulting plan is a heap ordered by send time, so the dispatcher always
+    pops the next due send and load stays flat instead of bursting.
+
+    The planner also keeps score of how far dispatch falls behind the plan,
+    so a run that can't keep up is visible while it happens.
+    """
+
+    def __init__(self, window_start: Optional[str] = None, window_end: Optional[str] = None,
+                 default_timezone: Optional[str] = None):
+        """
+        Initialize the planner
+
+        Args:
+            window_start: Local start of the delivery window, 'HH:MM'
+                          (default: settings.delivery_window_start)
+            window_end: Local end of the delivery window, 'HH:MM'
+                        (default: settings.delivery_window_end)
+            default_timezone: Time zone for users without one (default: settings.timezone)
+        """
+        self.window_start = self._parse_time(window_start or settings.delivery_window_start)
+        self.window_end = self._parse_time(window_end or settings.delivery_window_end)
+        self.default_timezone = default_timezone or settings.timezone
+
+        if self.window_end <= self.window_start:
+            raise ValueError("Delivery window must end after it starts")
+
+        self._reset_lag()
+
+    @staticmethod
+    def _parse_time(value: str) -> timedelta:
+        """Parse 'HH:MM' into an offset from midnight"""
+        hours, minutes = value.split(':')
+        return timedelta(hours=int(hours), minutes=int(minutes))
+
+    def _get_timezone(self, tz_name: Optional[str]):
+        """Resolve a user's time zone, falling back to the default"""
+        try:
+            return pytz.timezone(tz_name or self.default_timezone)
+        except pytz.UnknownTimeZoneError:
+            logger.warning(f"Unknown time zone '{tz_name}', using {self.default_timezone}")
+            return pytz.timezone(self.default_timezone)
+
+    def next_window(self, tz_name: Optional[str], now: Optional[datetime] = None) -> Tuple[datetime, datetime]:
+        """
+        Get the next (or current) delivery window for a time zone
+
+        Args:
+            tz_name: IANA time zone name
+            now: Reference time (default: now)
+
+        Returns:
+            Tuple of (start, end) as UTC datetimes. If the window is already
+            open, start is now.
+        """
+        tz = self._get_timezone(tz_name)
+        now = now or datetime.now(pytz.utc)
+        local_now = now.astimezone(tz)
+
+        for days_ahead in (0, 1):
+            midnight = datetime.combine(local_now.date() + timedelta(days=days_ahead), datetime.min.time())
+            start = tz.localize(midnight + self.window_start).astimezone(pytz.utc)
+            end = tz.localize(midnight + self.window_end).astimezone(pytz.utc)
+            if now < end:
+                return max(start, now), end
+
+        raise RuntimeError("Unreachable: tomorrow's window always ends in the future")
+
+    def plan(self, users: List[Dict], now: Optional[datetime] = None) -> List[Tuple[datetime, int, Dict]]:
+        """
+        Assign a send time to every user
+
+        Args:
+            users: User dictionaries, optionally with a 'timezone' key
+            now: Reference time (default: now)
+
+        Returns:
+            Heap of (send_at_utc, sequence, user) entries
+        """
+        now = now or datetime.now(pytz.utc)
+        self._reset_lag()
+
+        by_timezone: Dict[str, List[Dict]] = {}
+        for user in users:
+            by_timezone.setdefault(user.get('timezone') or self.default_timezone, []).append(user)
+
+        heap = []
+        sequence = 0
+        for tz_name, tz_users in by_timezone.items():
+            start, end = self.next_window(tz_name, now)
+            step = (end - start) / len(tz_users)
+            for i, user in enumerate(tz_users):
+                # Centre each send in its slot so the window edges aren't crowded
+                heap.append((start + step * (i + 0.5), sequence, user))
+                sequence += 1
+            logger.info(f"Planned {len(tz_users)} sends for {tz_name} between "
+                        f"{start.astimezone(self._get_timezone(tz_name)):%H:%M} and "
+                        f"{end.astimezone(self._get_timezone(tz_name)):%H:%M} local")
+
+        heapq.heapify(heap)
+        return heap
+
+    # LAG
+
+    def _reset_lag(self):
+        """Start a new run's lag statistics"""
+        self.sends = 0
+        self.late_sends = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self._last_warning = 0.0
+
+    def record_lag(self, lag: float):
+        """
+        Note how late a planned send was dispatched
+
+        Warns at most once a minute while sends run more than
+        settings.dispatch_lag_warning_seconds behind their planned time.
+
+        Args:
+            lag: Seconds between the planned send time and dispatch
+        """
+        lag = max(0.0, lag)
+        self.sends += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+
+        if lag >= settings.dispatch_lag_warning_seconds:
+            self.late_sends += 1
+            now = time.monotonic()
+            if now - self._last_warning >= 60:
+                self._last_warning = now
+                logger.warning(f"Dispatch is {lag:.0f}s behind plan "
+                               f"({self.late_sends} late sends so far) - sends can't keep up with the window")
+
+    def lag_summary(self) -> str:
+        """One-line lag report for the run"""
+        mean = self.total_lag / self.sends if self.sends else 0.0
+        return (f"Dispatch lag: mean {mean:.1f}s, max {self.max_lag:.1f}s, "
+                f"{self.late_sends}/{self.sends} sends over {settings.dispatch_lag_warning_seconds:g}s late")
@@ -0,0 +1,137 @@
+"""
+Side-effect-free sinks for dry-run (shadow) scheduler runs
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from src.media_cache import content_digest
+from src.models import User
+from src.template_dispatcher import WeeklyInsightsDispatcher
+from src.whatsapp_sender import WhatsAppSender
+
+
+class RecordingWhatsAppSender(WhatsAppSender):
+    """
+    WhatsApp sender that builds and serializes payloads but never posts them
+    """
+    
+    def __init__(self):
+        """Initialize with the real sender's configuration"""
+        super().__init__()
+        self.messages_built = 0
+        self.bytes_built = 0
+    
+    def send_text_message(self, to: str, message: str) -> Dict:
+        """
+        Build and encode the payload exactly as a real send would, then drop it
+        
+        Args:
+            to: Recipient phone number
+            message: Message text
+            
+        Returns:
+            Fake API response with a dry-run message ID
+        """
+        return self._post(self.build_text_payload(to, message))
+    
+    def _post(self, payload: Dict) -> Dict:
+        """Encode any message payload (text, image, document) and drop it"""
+        body = json.dumps(payload).encode('utf-8')
+        self.messages_built += 1
+        self.bytes_built += len(body)
+        return {"messages": [{"id": f"dryrun.{self.messages_built}"}]}
+    
+    def send_prebuilt(self, body: bytes) -> Dict:
+        """Count a body built by the render pool and drop it"""
+        self.messages_built += 1
+        self.bytes_built += len(body)
+        return {"messages": [{"id": f"dryrun.{self.messages_built}"}]}
+    
+    def upload_media(self, content: bytes, mime_type: str, filename: str = "file",
+                     cache: bool = True) -> str:
+        """Count the upload without sending or caching it"""
+        self.bytes_built += len(content)
+        return f"dryrun.media.{content_digest(content)[:16]}"
+
+
+class RecordingTemplateDispatcher(WeeklyInsightsDispatcher):
+    """
+    Template dispatcher that builds request bodies but never posts them
+    """
+    
+    def __init__(self):
+        """Initialize with the real dispatcher's skeleton"""
+        super().__init__()
+        self.messages_built = 0
+        self.bytes_built = 0
+    
+    def send_body(self, body: bytes) -> Dict:
+        """
+        Count the prebuilt body and drop it
+        
+        Args:
+            body: Output of build_body()
+            
+        Returns:
+            Fake API response with a dry-run message ID
+        """
+        self.messages_built += 1
+        self.bytes_built += len(body)
+        return {"messages": [{"id": f"dryrun.{self.messages_built}"}]}
+
+
+class RecordingFirebaseManager:
+    """
+    Firebase stand-in: reads come from a real manager or synthetic users,
+    writes are counted and discarded
+    """
+    
+    def __init__(self, source=None, users: Optional[List[Dict]] = None):
+        """
+        Initialize sink
+        
+        Args:
+            source: Real FirebaseManager to read users and snapshots from (optional)
+            users: Synthetic users to serve instead of reading Firebase
+        """
+        self.source = source
+        self.users = users
+        self.writes: Dict[str, int] = {}
+    
+    def _record(self, operation: str):
+        self.writes[operation] = self.writes.get(operation, 0) + 1
+    
+    def get_all_active_users(self, as_models: bool = False) -> List:
+        """Synthetic users, or the real active users"""
+        if self.users is not None:
+            return [User.from_dict(u) for u in self.users] if as_models else self.users
+        return self.source.get_all_active_users(as_models)
+    
+    def get_due_users(self, frequency: str, sent_before: datetime, as_models: bool = False) -> List:
+        """Synthetic users on the frequency, or the real due users"""
+        if self.users is not None:
+            due = [u for u in self.users if u.get('frequency') == frequency]
+            return [User.from_dict(u) for u in due] if as_models else due
+        return self.source.get_due_users(frequency, sent_before, as_models)
+    
+    def get_insights_bulk(self, user_ids: List[str], period: Optional[timedelta] = None) -> Dict[str, Dict]:
+        """Previous snapshots (none for synthetic users)"""
+        if self.users is not None:
+            return {}
+        return self.source.get_insights_bulk(user_ids, period=period)
+    
+    def save_insights(self, user_id: str, insights_data: Dict, frequency: Optional[str] = None):
+        """Record a skipped insights write"""
+        self._record("save_insights")
+    
+    def update_user_last_sent(self, user_id: str, run_id: Optional[str] = None):
+        """Record a skipped last_sent update"""
+        self._record("update_user_last_sent")
+    
+    def log_summary(self):
+        """Log the writes that would have happened"""
+        for operation, count in self.writes.items():
+            logger.info(f"Dry run skipped {count} {operation} writes")
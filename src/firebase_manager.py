@@ -3,37 +3,72 @@ Firebase Manager for user and insights data
 """
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core import exceptions as google_exceptions
 from google.cloud.firestore_v1.base_query import FieldFilter
-from typing import List, Dict, Optional
+from typing import Iterable, List, Dict, Optional, Union
 from loguru import logger
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 
+from src.circuit_breaker import CircuitBreaker, guarded
 from src.config import settings
+from src.insight_deltas import TREND_METRICS, numeric_value
+from src.models import User
+from src.utils import PERIOD_KEY_PATTERNS, get_current_time_in_timezone, period_key
+
+
+# Maximum writes in one Firestore batched commit
+FIRESTORE_BATCH_LIMIT = 500
+
+
+def is_firestore_outage(error: Exception) -> bool:
+    """Whether an error means Firestore itself is unavailable or overloaded"""
+    return isinstance(error, (
+        google_exceptions.ServerError,  # 5xx incl. ServiceUnavailable, DeadlineExceeded
+        google_exceptions.TooManyRequests,  # ResourceExhausted
+        google_exceptions.RetryError,
+    ))
+
+
+# One breaker per process for every Firestore call
+FIRESTORE_BREAKER = CircuitBreaker("firestore", is_failure=is_firestore_outage)
+
+
+def initialize_firebase():
+    """Initialize the default Firebase app once per process"""
+    try:
+        # Check if already initialized
+        firebase_admin.get_app()
+        logger.info("Firebase already initialized")
+    except ValueError:
+        # Initialize Firebase
+        cred = credentials.Certificate(settings.firebase_credentials_dict)
+        firebase_admin.initialize_app(cred)
+        logger.info("Firebase initialized successfully")
 
 
 class FirebaseManager:
-    """Manage Firebase operations for WhatsApp users and insights"""
+    """
+    Manage Firebase operations for WhatsApp users and insights
+    
+    Calls go through FIRESTORE_BREAKER, so during an outage they raise
+    CircuitOpenError immediately instead of waiting out retries and timeouts.
+    """
     
     def __init__(self):
         """Initialize Firebase connection"""
-        try:
-            # Check if already initialized
-            firebase_admin.get_app()
-            logger.info("Firebase already initialized")
-        except ValueError:
-            # Initialize Firebase
-            cred = credentials.Certificate(settings.firebase_credentials_dict)
-            firebase_admin.initialize_app(cred)
-            logger.info("Firebase initialized successfully")
+        initialize_firebase()
         
         self.db = firestore.client()
         self.users_collection = self.db.collection('whatsapp_users')
         self.insights_collection = self.db.collection('insights')
+        self.history_collection = self.db.collection('insights_history')
+        self.statuses_collection = self.db.collection('message_statuses')
     
     # USER MANAGEMENT
     
+    @guarded(FIRESTORE_BREAKER)
     def add_user(self, phone: str, name: str, frequency: str = "weekly", 
-                 active: bool = True) -> str:
+                 active: bool = True, timezone: Optional[str] = None) -> str:
         """
         Add a new user to Firebase
         
@@ -42,6 +77,7 @@ class FirebaseManager:
             name: User's name
             frequency: Insight frequency (weekly, daily, monthly)
             active: Whether user is active
+            timezone: User's IANA time zone for delivery windows (default: settings.timezone)
             
         Returns:
             User document ID
@@ -58,6 +94,7 @@ class FirebaseManager:
             "phone": formatted_phone,
             "frequency": frequency,
             "active": active,
+            "timezone": timezone or settings.timezone,
             "created_at": datetime.now(),
             "last_sent": None
         }
@@ -68,24 +105,150 @@ class FirebaseManager:
         logger.info(f"Added user {name} ({formatted_phone}) with ID: {user_id}")
         return user_id
 
-    def get_all_active_users(self) -> List[Dict]:
+    @guarded(FIRESTORE_BREAKER)
+    def get_phone_index(self) -> Dict[str, str]:
+        """
+        Map every registered phone number to its user document ID
+        
+        Only the phone field is fetched, so this stays cheap for large collections.
+        
+        Returns:
+            Dictionary of formatted phone -> user document ID
+        """
+        index = {}
+        for doc in self.users_collection.select(['phone']).stream():
+            phone = (doc.to_dict() or {}).get('phone')
+            if phone:
+                index[phone] = doc.id
+        
+        logger.info(f"Loaded phone index with {len(index)} users")
+        return index
+    
+    @guarded(FIRESTORE_BREAKER)
+    def bulk_add_users(self, users: Iterable[Dict], batch_size: int = FIRESTORE_BATCH_LIMIT,
+                       phone_index: Optional[Dict[str, str]] = None) -> Dict:
+        """
+        Add many users using batched commits
+        
+        Users whose phone is already registered (or appears earlier in the
+        same import) are skipped. Phones must already be normalized - see
+        src.user_import.
+        
+        Args:
+            users: User dictionaries with at least 'name' and 'phone'
+            batch_size: Writes per commit (max 500)
+            phone_index: Existing phone -> ID index (loaded if not given); updated in
+                         place as each batch commits, so it never lists unwritten users
+            
+        Returns:
+            Dictionary with 'added' and 'duplicates' counts
+        """
+        if phone_index is None:
+            phone_index = self.get_phone_index()
+        
+        batch_size = min(batch_size, FIRESTORE_BATCH_LIMIT)
+        added = duplicates = 0
+        batch = self.db.batch()
+        pending: Dict[str, str] = {}  # phone -> document ID in the uncommitted batch
+        now = datetime.now()
+        
+        for user in users:
+            if user['phone'] in phone_index or user['phone'] in pending:
+                duplicates += 1
+                continue
+            
+            doc_ref = self.users_collection.document()
+            batch.set(doc_ref, {
+                "frequency": "weekly",
+                "active": True,
+                "timezone": settings.timezone,
+                **user,
+                "created_at": now,
+                "last_sent": None
+            })
+            pending[user['phone']] = doc_ref.id
+            
+            if len(pending) >= batch_size:
+                batch.commit()
+                phone_index.update(pending)
+                added += len(pending)
+                logger.info(f"Committed {added} users")
+                batch = self.db.batch()
+                pending = {}
+        
+        if pending:
+            batch.commit()
+            phone_index.update(pending)
+            added += len(pending)
+        
+        logger.info(f"Bulk import complete: {added} added, {duplicates} duplicates skipped")
+        return {"added": added, "duplicates": duplicates}
+    
+    @guarded(FIRESTORE_BREAKER)
+    def get_all_active_users(self, as_models: bool = False) -> List[Union[Dict, User]]:
         """
         Get all active users
         
+        Args:
+            as_models: Return compact User models, reading only their fields
+                       (for holding large cohorts in memory)
+        
         Returns:
-            List of user dictionaries with IDs
+            List of user dictionaries with IDs, or User models
+        """
+        query = self.users_collection.where(filter=FieldFilter('active', '==', True))
+        users = self._read_users(query, as_models)
+        
+        logger.info(f"Retrieved {len(users)} active users")
+        return users
+    
+    @guarded(FIRESTORE_BREAKER)
+    def get_due_users(self, frequency: str, sent_before: datetime,
+                      as_models: bool = False) -> List[Union[Dict, User]]:
         """
+        Get active users on a frequency whose next insights are due
+        
+        Only users with the given frequency are read, so a daily run never
+        scans weekly or monthly users. Requires a composite index on
+        (active, frequency, last_sent).
+        
+        Args:
+            frequency: Insight frequency (weekly, daily, monthly)
+            sent_before: Users last sent before this time are due
+            as_models: Return compact User models, reading only their fields
+            
+        Returns:
+            List of user dictionaries with IDs, or User models
+        """
+        base_query = (self.users_collection
+                      .where(filter=FieldFilter('active', '==', True))
+                      .where(filter=FieldFilter('frequency', '==', frequency)))
+        
         users = []
-        docs = self.users_collection.where(filter=FieldFilter('active', '==', True)).stream()
+        # Firestore range filters skip null values, so never-sent users need their own query
+        for query in (base_query.where(filter=FieldFilter('last_sent', '==', None)),
+                      base_query.where(filter=FieldFilter('last_sent', '<', sent_before))):
+            users.extend(self._read_users(query, as_models))
         
-        for doc in docs:
+        logger.info(f"Retrieved {len(users)} due {frequency} users")
+        return users
+    
+    @staticmethod
+    def _read_users(query, as_models: bool) -> List[Union[Dict, User]]:
+        """Stream a users query into dictionaries or User models"""
+        if as_models:
+            # Documents are converted as they stream, so full dicts never pile up
+            return [User.from_firestore(doc.id, doc.to_dict())
+                    for doc in query.select(User.FIRESTORE_FIELDS).stream()]
+        
+        users = []
+        for doc in query.stream():
             user_data = doc.to_dict()
             user_data['id'] = doc.id
             users.append(user_data)
-        
-        logger.info(f"Retrieved {len(users)} active users")
         return users
     
+    @guarded(FIRESTORE_BREAKER)
     def get_user_by_phone(self, phone: str) -> Optional[Dict]:
         """
         Get user by phone number
@@ -108,38 +271,159 @@ class FirebaseManager:
         
         return None
     
-    def update_user_last_sent(self, user_id: str):
+    @guarded(FIRESTORE_BREAKER)
+    def update_user_last_sent(self, user_id: str, run_id: Optional[str] = None):
         """
         Update the last_sent timestamp for a user
         
         Args:
             user_id: Firebase document ID
+            run_id: Delivery run the report was sent in, so a worker taking
+                    over the run's shard can skip this user
         """
-        self.users_collection.document(user_id).update({
-            'last_sent': datetime.now()
-        })
+        update = {'last_sent': datetime.now()}
+        if run_id:
+            update['last_run_id'] = run_id
+        self.users_collection.document(user_id).update(update)
         logger.debug(f"Updated last_sent for user {user_id}")
     
     # INSIGHTS MANAGEMENT
     
-    def save_insights(self, user_id: str, insights_data: Dict):
+    @guarded(FIRESTORE_BREAKER)
+    def save_insights(self, user_id: str, insights_data: Dict, frequency: Optional[str] = None):
         """
         Save insights for a specific user
         
         Args:
             user_id: User's Firebase document ID
             insights_data: Dictionary of insight metrics
+            frequency: User's report frequency (default weekly); history is
+                       kept per day, ISO week or month to match it
         """
+        now = datetime.now()
         insight_doc = {
             "user_id": user_id,
-            "generated_at": datetime.now(),
+            "generated_at": now,
             "data": insights_data
         }
         
+        batch = self.db.batch()
+        
         # Use user_id as document ID to easily overwrite weekly
-        self.insights_collection.document(user_id).set(insight_doc)
+        batch.set(self.insights_collection.document(user_id), insight_doc)
+        
+        # Record this period's numbers in the user's history document for the month;
+        # a second report in the same period replaces the first
+        local_now = get_current_time_in_timezone(settings.timezone)
+        month = f"{local_now:%Y-%m}"
+        batch.set(
+            self.history_collection.document(f"{user_id}_{month}"),
+            {
+                "user_id": user_id,
+                "month": month,
+                "periods": {period_key(local_now, frequency): self._compact_metrics(insights_data)}
+            },
+            merge=True
+        )
+        
+        batch.commit()
         logger.info(f"Saved insights for user {user_id}")
     
+    @staticmethod
+    def _compact_metrics(insights_data: Dict) -> Dict:
+        """Keep only the numeric history metrics from an insights dictionary"""
+        compact = {}
+        for metric in TREND_METRICS:
+            number = numeric_value(insights_data.get(metric))
+            if number is not None:
+                compact[metric] = number
+        return compact
+    
+    @guarded(FIRESTORE_BREAKER)
+    def get_insights_bulk(self, user_ids: List[str], chunk_size: int = 300,
+                          period: Optional[timedelta] = None) -> Dict[str, Dict]:
+        """
+        Get the saved insights of many users with batched reads
+        
+        Args:
+            user_ids: User Firebase document IDs
+            chunk_size: Documents fetched per get_all call
+            period: Only keep snapshots generated about one period ago (between
+                    half and one and a half periods), i.e. the previous report.
+                    A snapshot from a skipped period or a same-period re-run is
+                    dropped rather than compared as if it were last period's.
+            
+        Returns:
+            Dictionary of user ID -> insights data, for users that have any
+        """
+        snapshots = {}
+        for start in range(0, len(user_ids), chunk_size):
+            refs = [self.insights_collection.document(uid) for uid in user_ids[start:start + chunk_size]]
+            for doc in self.db.get_all(refs):
+                if not doc.exists:
+                    continue
+                snapshot = doc.to_dict()
+                if period and not self._from_previous_period(snapshot.get('generated_at'), period):
+                    continue
+                snapshots[doc.id] = snapshot.get('data') or {}
+        
+        logger.info(f"Loaded {len(snapshots)} previous insight snapshots")
+        return snapshots
+    
+    @staticmethod
+    def _from_previous_period(generated_at: Optional[datetime], period: timedelta) -> bool:
+        """Whether a snapshot was generated between half and one and a half periods ago"""
+        if not isinstance(generated_at, datetime):
+            return False
+        # Firestore returns aware UTC datetimes; local test data may be naive
+        now = datetime.now(timezone.utc) if generated_at.tzinfo else datetime.now()
+        return period / 2 <= now - generated_at <= period * 1.5
+    
+    @guarded(FIRESTORE_BREAKER)
+    def get_insights_history(self, user_id: str, months: int = 3, frequency: Optional[str] = None) -> Dict:
+        """
+        Get metric history for trend lines, one point per report period
+        
+        History is stored as one document per user per month (insights_history/
+        {user_id}_{YYYY-MM}) holding a map of period -> metrics, so a few
+        months of trend data is a single batched read. Periods are days, ISO
+        weeks or months by the user's frequency; documents written before
+        that keep their ISO weeks under 'weeks'.
+        
+        Args:
+            user_id: User's Firebase document ID
+            months: Number of calendar months to read, including the current one
+            frequency: Only return periods of this frequency (default weekly), so
+                       a user who changed frequency gets one consistent series
+            
+        Returns:
+            Columnar dictionary: {'periods': [...], 'leads': [...], ...}
+            with None where a period lacks a metric
+        """
+        today = get_current_time_in_timezone(settings.timezone)
+        month_keys = []
+        year, month = today.year, today.month
+        for _ in range(months):
+            month_keys.append(f"{year:04d}-{month:02d}")
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        
+        refs = [self.history_collection.document(f"{user_id}_{key}") for key in month_keys]
+        
+        periods = {}
+        for doc in self.db.get_all(refs):
+            if doc.exists:
+                data = doc.to_dict()
+                periods.update(data.get('weeks', {}))
+                periods.update(data.get('periods', {}))
+        
+        pattern = PERIOD_KEY_PATTERNS[frequency if frequency in PERIOD_KEY_PATTERNS else "weekly"]
+        labels = sorted(label for label in periods if pattern.match(label))
+        history = {"periods": labels}
+        for metric in TREND_METRICS:
+            history[metric] = [periods[label].get(metric) for label in labels]
+        return history
+    
+    @guarded(FIRESTORE_BREAKER)
     def get_insights(self, user_id: str) -> Optional[Dict]:
         """
         Get insights for a specific user
@@ -156,6 +440,47 @@ class FirebaseManager:
             return doc.to_dict()
         return None
     
+    # MESSAGE STATUS TELEMETRY
+    
+    @guarded(FIRESTORE_BREAKER)
+    def save_message_statuses(self, records: List[Dict]):
+        """
+        Persist coalesced status records in batched commits
+        
+        Args:
+            records: Records from StatusBuffer.drain(), one per message ID
+        """
+        for start in range(0, len(records), FIRESTORE_BATCH_LIMIT):
+            batch = self.db.batch()
+            for record in records[start:start + FIRESTORE_BATCH_LIMIT]:
+                doc_ref = self.statuses_collection.document(record['message_id'])
+                batch.set(doc_ref, {**record, "updated_at": datetime.now()}, merge=True)
+            batch.commit()
+        
+        logger.debug(f"Saved {len(records)} message statuses")
+    
+    @guarded(FIRESTORE_BREAKER)
+    def get_delivery_stats(self, since: datetime) -> Dict:
+        """
+        Count messages reaching each delivery stage since a point in time
+        
+        Args:
+            since: Start of the reporting period
+            
+        Returns:
+            Dictionary of counts per stage plus delivery/read rates
+        """
+        stats = {}
+        for state in ('sent', 'delivered', 'read', 'failed'):
+            query = self.statuses_collection.where(filter=FieldFilter(f'{state}_at', '>=', since))
+            stats[state] = int(query.count().get()[0][0].value)
+        
+        sent = stats['sent'] or 1
+        stats['delivery_rate'] = stats['delivered'] / sent
+        stats['read_rate'] = stats['read'] / sent
+        return stats
+    
+    @guarded(FIRESTORE_BREAKER)
     def delete_user(self, user_id: str):
         """
         Delete a user (soft delete by setting active=False)
@@ -165,6 +490,17 @@ class FirebaseManager:
         """
         self.users_collection.document(user_id).update({'active': False})
         logger.info(f"Deactivated user {user_id}")
+    
+    @guarded(FIRESTORE_BREAKER)
+    def reactivate_user(self, user_id: str):
+        """
+        Reactivate a previously deactivated user
+        
+        Args:
+            user_id: User's Firebase document ID
+        """
+        self.users_collection.document(user_id).update({'active': True})
+        logger.info(f"Reactivated user {user_id}")
 
 
 if __name__ == "__main__":
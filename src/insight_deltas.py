@@ -0,0 +1,77 @@
+"""
+Change since the previous report, computed from stored insight snapshots
+"""
+import re
+from typing import Dict, Optional, Union
+
+
+# Numeric metrics tracked over time
+TREND_METRICS = ("leads", "new_offers", "sales", "revenue", "commission", "active_listings",
+                 "avg_price", "sales_velocity")
+
+# Display strings the generators produce: 'R1,250,000', 'R450K', 'R8mil', '21 days'
+LABELLED_NUMBER = re.compile(r"^\s*R?\s*(-?\d[\d,]*(?:\.\d+)?)\s*(k|m|mil|bn)?\s*(?:days?)?\s*$", re.IGNORECASE)
+MULTIPLIERS = {None: 1, "k": 1e3, "m": 1e6, "mil": 1e6, "bn": 1e9}
+
+Number = Union[int, float]
+
+
+def numeric_value(value) -> Optional[Number]:
+    """
+    Coerce a metric value to a number
+    
+    Args:
+        value: Metric value (int, float, numeric string, or a display string
+               such as 'R1,250,000', 'R450K' or '21 days')
+        
+    Returns:
+        int or float, or None if the value isn't numeric (e.g. 'N/A')
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        match = LABELLED_NUMBER.match(value) if isinstance(value, str) else None
+        if not match:
+            return None
+        suffix = match.group(2).lower() if match.group(2) else None
+        number = float(match.group(1).replace(",", "")) * MULTIPLIERS[suffix]
+    return int(number) if number.is_integer() else number
+
+
+def compute_deltas(current: Dict, previous: Optional[Dict]) -> Dict[str, Dict]:
+    """
+    Diff this report's insights against the previous report's snapshot
+    
+    Purely in memory - the previous snapshot is the one already stored in
+    Firebase, so no extra database queries are needed. Callers pass only a
+    snapshot from one period ago (see FirebaseManager.get_insights_bulk), so
+    the change is day-, week- or month-over-month as the user's frequency is.
+    
+    Args:
+        current: Insights being sent now
+        previous: Previous report's insights ('data' of the insights document), or None
+        
+    Returns:
+        Dictionary of metric -> {'previous', 'change', 'percent'}; percent is None
+        when the previous value was zero. Metrics missing or non-numeric in either
+        snapshot are omitted.
+    """
+    if not previous:
+        return {}
+    
+    deltas = {}
+    for metric in TREND_METRICS:
+        now = numeric_value(current.get(metric))
+        before = numeric_value(previous.get(metric))
+        if now is None or before is None:
+            continue
+        
+        change = now - before
+        deltas[metric] = {
+            "previous": before,
+            "change": change,
+            "percent": (change / before) * 100 if before else None,
+        }
+    return deltas
@@ -2,7 +2,8 @@
 Insight generator for property CRM database
 """
 import psycopg2
-from typing import Dict, List, Optional
+import uuid
+from typing import Dict, Iterator, List, Optional, Tuple
 from datetime import datetime, timedelta
 from loguru import logger
 
@@ -12,10 +13,22 @@ from src.config import settings
 class InsightGenerator:
     """Generate insights from property CRM database"""
     
-    def __init__(self):
-        """Initialize database connection"""
+    # Metrics every real report contains (see _build_metrics) - a superset of
+    # what the weekly_insights template needs
+    METRICS = ("leads", "most_active_portal", "new_offers", "sales", "revenue", "commission",
+               "sales_change", "active_listings", "avg_price", "sales_velocity")
+    
+    def __init__(self, connect: bool = True):
+        """
+        Initialize database connection
+        
+        Args:
+            connect: Connect to the database now. Pass False for mock-only use
+                     (dry runs, benchmarks) where no database is available.
+        """
         self.connection = None
-        self.connect()
+        if connect:
+            self.connect()
     
     def connect(self):
         """Establish database connection"""
@@ -53,29 +66,27 @@ class InsightGenerator:
         try:
             cursor = self.connection.cursor()
             
-            # EXAMPLE QUERIES - Customize these for your database schema
-            
-            # 1. Get sales change (last 7 days vs previous 7 days)
-            sales_change = self._calculate_sales_change(cursor, user_id)
-            
-            # 2. Get active listings count
-            active_listings = self._get_active_listings(cursor, user_id)
-            
-            # 3. Get average price
-            avg_price = self._get_average_price(cursor, user_id)
-            
-            # 4. Get sales velocity (days to sell)
-            sales_velocity = self._get_sales_velocity(cursor, user_id)
+            if settings.insights_combined_queries:
+                # Single round-trip: one pass over listings, one over sales
+                insights = self._get_combined_metrics(cursor, user_id)
+            else:
+                # EXAMPLE QUERIES - Customize these for your database schema
+                insights = {
+                    # 1. Get sales change (last 7 days vs previous 7 days)
+                    "sales_change": self._calculate_sales_change(cursor, user_id),
+                    # 2. Get active listings count
+                    "active_listings": self._get_active_listings(cursor, user_id),
+                    # 3. Get average price
+                    "avg_price": self._get_average_price(cursor, user_id),
+                    # 4. Get sales velocity (days to sell)
+                    "sales_velocity": self._get_sales_velocity(cursor, user_id),
+                    # 5. This week's leads, top portal, offers, sales, revenue and commission
+                    **self._get_weekly_activity(cursor, user_id),
+                }
             
             cursor.close()
             
-            insights = {
-                "sales_change": sales_change,
-                "active_listings": active_listings,
-                "avg_price": avg_price,
-                "sales_velocity": sales_velocity,
-                "generated_at": datetime.now().isoformat()
-            }
+            insights["generated_at"] = datetime.now().isoformat()
             
             logger.info(f"Generated insights for user {user_id}")
             return insights
@@ -84,6 +95,211 @@ class InsightGenerator:
             logger.error(f"Failed to generate insights: {e}")
             raise
     
+    def _get_combined_metrics(self, cursor, user_id: str) -> Dict:
+        """
+        Compute all metrics in a single query
+        
+        Active count, average price and 90-day velocity are aggregated in one
+        pass over listings using FILTER clauses, sales change, revenue and
+        commission in one pass over sales, and this week's leads (with the
+        top portal) and offers in one pass each, so the whole report costs
+        one round-trip.
+        
+        CUSTOMIZE THIS QUERY FOR YOUR DATABASE SCHEMA
+        """
+        try:
+            query = """
+                SELECT l.active_listings, l.avg_price, l.avg_days_to_sell,
+                       s.current_week, s.previous_week, s.revenue, s.commission,
+                       COALESCE(p.leads, 0), p.top_portal, p.portal_leads, o.new_offers
+                FROM (
+                    SELECT
+                        COUNT(*) FILTER (WHERE status = 'active') as active_listings,
+                        AVG(price) FILTER (WHERE status = 'active') as avg_price,
+                        AVG(EXTRACT(DAY FROM (sold_date - listed_date)))
+                            FILTER (WHERE status = 'sold'
+                                    AND sold_date >= NOW() - INTERVAL '90 days') as avg_days_to_sell
+                    FROM listings
+                    WHERE user_id = %s
+                      AND (status = 'active'
+                           OR (status = 'sold' AND sold_date >= NOW() - INTERVAL '90 days'))
+                ) l
+                CROSS JOIN (
+                    SELECT 
+                        COUNT(*) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days') as current_week,
+                        COUNT(*) FILTER (WHERE created_at < NOW() - INTERVAL '7 days') as previous_week,
+                        COALESCE(SUM(sale_price) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days'), 0) as revenue,
+                        COALESCE(SUM(commission) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days'), 0) as commission
+                    FROM sales
+                    WHERE user_id = %s
+                      AND created_at >= NOW() - INTERVAL '14 days'
+                ) s
+                LEFT JOIN (
+                    SELECT source as top_portal, COUNT(*) as portal_leads,
+                           SUM(COUNT(*)) OVER () as leads
+                    FROM leads
+                    WHERE user_id = %s
+                      AND created_at >= NOW() - INTERVAL '7 days'
+                    GROUP BY source
+                    ORDER BY portal_leads DESC
+                    LIMIT 1
+                ) p ON TRUE
+                CROSS JOIN (
+                    SELECT COUNT(*) as new_offers
+                    FROM offers
+                    WHERE user_id = %s
+                      AND created_at >= NOW() - INTERVAL '7 days'
+                ) o
+            """
+            cursor.execute(query, (user_id, user_id, user_id, user_id))
+            return self._build_metrics(*cursor.fetchone())
+        except Exception as e:
+            logger.warning(f"Could not calculate combined metrics: {e}")
+            self.connection.rollback()
+            return {
+                "leads": "N/A",
+                "most_active_portal": "N/A",
+                "new_offers": "N/A",
+                "sales": "N/A",
+                "revenue": "N/A",
+                "commission": "N/A",
+                "sales_change": "N/A",
+                "active_listings": 0,
+                "avg_price": "N/A",
+                "sales_velocity": "N/A",
+            }
+    
+    def stream_cohort_insights(self, user_ids: Optional[List[str]] = None,
+                               itersize: Optional[int] = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Compute insights for a whole cohort in SQL and stream the results
+        
+        Uses a named (server-side) cursor so rows are fetched from Postgres
+        in chunks of ``itersize`` rather than materialised all at once.
+        
+        CUSTOMIZE THIS QUERY FOR YOUR DATABASE SCHEMA
+        
+        Args:
+            user_ids: Restrict the cohort to these user identifiers (all users if None)
+            itersize: Rows fetched per network round-trip
+                      (default: settings.insights_cursor_itersize)
+            
+        Yields:
+            (user_id, insights) pairs
+        """
+        cohort_filter = "AND user_id = ANY(%s)" if user_ids is not None else ""
+        query = f"""
+            WITH l AS (
+                SELECT user_id,
+                    COUNT(*) FILTER (WHERE status = 'active') as active_listings,
+                    AVG(price) FILTER (WHERE status = 'active') as avg_price,
+                    AVG(EXTRACT(DAY FROM (sold_date - listed_date)))
+                        FILTER (WHERE status = 'sold'
+                                AND sold_date >= NOW() - INTERVAL '90 days') as avg_days_to_sell
+                FROM listings
+                WHERE (status = 'active'
+                       OR (status = 'sold' AND sold_date >= NOW() - INTERVAL '90 days'))
+                  {cohort_filter}
+                GROUP BY user_id
+            ), s AS (
+                SELECT user_id,
+                    COUNT(*) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days') as current_week,
+                    COUNT(*) FILTER (WHERE created_at < NOW() - INTERVAL '7 days') as previous_week,
+                    SUM(sale_price) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days') as revenue,
+                    SUM(commission) FILTER (WHERE created_at >= NOW() - INTERVAL '7 days') as commission
+                FROM sales
+                WHERE created_at >= NOW() - INTERVAL '14 days'
+                  {cohort_filter}
+                GROUP BY user_id
+            ), p AS (
+                SELECT DISTINCT ON (user_id) user_id,
+                    source as top_portal, COUNT(*) as portal_leads,
+                    SUM(COUNT(*)) OVER (PARTITION BY user_id) as leads
+                FROM leads
+                WHERE created_at >= NOW() - INTERVAL '7 days'
+                  {cohort_filter}
+                GROUP BY user_id, source
+                ORDER BY user_id, portal_leads DESC
+            ), o AS (
+                SELECT user_id, COUNT(*) as new_offers
+                FROM offers
+                WHERE created_at >= NOW() - INTERVAL '7 days'
+                  {cohort_filter}
+                GROUP BY user_id
+            ), ids AS (
+                SELECT user_id FROM l UNION SELECT user_id FROM s
+                UNION SELECT user_id FROM p UNION SELECT user_id FROM o
+            )
+            SELECT ids.user_id,
+                   COALESCE(l.active_listings, 0), l.avg_price, l.avg_days_to_sell,
+                   COALESCE(s.current_week, 0), COALESCE(s.previous_week, 0),
+                   COALESCE(s.revenue, 0), COALESCE(s.commission, 0),
+                   COALESCE(p.leads, 0), p.top_portal, p.portal_leads, COALESCE(o.new_offers, 0)
+            FROM ids
+            LEFT JOIN l ON l.user_id = ids.user_id
+            LEFT JOIN s ON s.user_id = ids.user_id
+            LEFT JOIN p ON p.user_id = ids.user_id
+            LEFT JOIN o ON o.user_id = ids.user_id
+        """
+        params = (list(user_ids),) * 4 if user_ids is not None else None
+        remaining = set(user_ids) if user_ids is not None else set()
+        generated_at = datetime.now().isoformat()
+        count = 0
+        
+        # Named cursors live inside a transaction. End it however the stream ends,
+        # including a consumer that stops early (closing this generator) or a failed query.
+        completed = False
+        try:
+            with self.connection.cursor(name=f"cohort_insights_{uuid.uuid4().hex}") as cursor:
+                cursor.itersize = itersize or settings.insights_cursor_itersize
+                cursor.execute(query, params)
+                
+                for row in cursor:
+                    user_id = row[0]
+                    remaining.discard(user_id)
+                    insights = self._build_metrics(*row[1:])
+                    insights["generated_at"] = generated_at
+                    count += 1
+                    yield user_id, insights
+            completed = True
+        finally:
+            if completed:
+                self.connection.commit()
+            else:
+                try:
+                    self.connection.rollback()
+                except psycopg2.Error as e:
+                    logger.warning(f"Could not roll back cohort insights stream: {e}")
+        
+        # Users with no listings or sales produce no rows - report them as empty
+        for user_id in remaining:
+            insights = self._build_metrics(0, None, None, 0, 0, 0, 0, 0, None, None, 0)
+            insights["generated_at"] = generated_at
+            count += 1
+            yield user_id, insights
+        
+        logger.info(f"Streamed cohort insights for {count} users")
+    
+    def _build_metrics(self, active_listings: int, avg_price, avg_days_to_sell,
+                       current_week: int, previous_week: int, revenue, commission,
+                       leads: int, top_portal: Optional[str], portal_leads: Optional[int],
+                       new_offers: int) -> Dict:
+        """Turn raw aggregate values into the insights dictionary"""
+        return {
+            "leads": int(leads),
+            "most_active_portal": self._format_top_portal(top_portal, portal_leads, leads),
+            "new_offers": int(new_offers),
+            "sales": int(current_week),
+            # SUM() of numeric columns comes back as Decimal, which neither
+            # Firestore nor the JSON encoder accept
+            "revenue": float(revenue),
+            "commission": float(commission),
+            "sales_change": self._format_sales_change(current_week, previous_week),
+            "active_listings": active_listings,
+            "avg_price": self._format_average_price(avg_price),
+            "sales_velocity": self._format_sales_velocity(avg_days_to_sell),
+        }
+    
     def _calculate_sales_change(self, cursor, user_id: str) -> str:
         """
         Calculate sales change percentage
@@ -104,19 +320,59 @@ class InsightGenerator:
             cursor.execute(query, (user_id,))
             result = cursor.fetchone()
             
-            current, previous = result[0], result[1]
-            
-            if previous == 0:
-                return "+100%" if current > 0 else "No change"
-            
-            change = ((current - previous) / previous) * 100
-            sign = "+" if change > 0 else ""
-            return f"{sign}{change:.1f}%"
+            return self._format_sales_change(result[0], result[1])
             
         except Exception as e:
             logger.warning(f"Could not calculate sales change: {e}")
             return "N/A"
     
+    def _get_weekly_activity(self, cursor, user_id: str) -> Dict:
+        """
+        Get this week's leads, top portal, new offers, sales, revenue and commission
+        
+        CUSTOMIZE THIS QUERY FOR YOUR DATABASE SCHEMA
+        """
+        try:
+            query = """
+                SELECT
+                    (SELECT COUNT(*) FROM leads
+                     WHERE user_id = %s AND created_at >= NOW() - INTERVAL '7 days') as leads,
+                    p.top_portal, p.portal_leads,
+                    (SELECT COUNT(*) FROM offers
+                     WHERE user_id = %s AND created_at >= NOW() - INTERVAL '7 days') as new_offers,
+                    s.sales, s.revenue, s.commission
+                FROM (
+                    SELECT COUNT(*) as sales,
+                           COALESCE(SUM(sale_price), 0) as revenue,
+                           COALESCE(SUM(commission), 0) as commission
+                    FROM sales
+                    WHERE user_id = %s AND created_at >= NOW() - INTERVAL '7 days'
+                ) s
+                LEFT JOIN (
+                    SELECT source as top_portal, COUNT(*) as portal_leads
+                    FROM leads
+                    WHERE user_id = %s AND created_at >= NOW() - INTERVAL '7 days'
+                    GROUP BY source
+                    ORDER BY portal_leads DESC
+                    LIMIT 1
+                ) p ON TRUE
+            """
+            cursor.execute(query, (user_id, user_id, user_id, user_id))
+            leads, top_portal, portal_leads, new_offers, sales, revenue, commission = cursor.fetchone()
+            return {
+                "leads": leads,
+                "most_active_portal": self._format_top_portal(top_portal, portal_leads, leads),
+                "new_offers": new_offers,
+                "sales": sales,
+                "revenue": float(revenue),
+                "commission": float(commission),
+            }
+        except Exception as e:
+            logger.warning(f"Could not get weekly activity: {e}")
+            self.connection.rollback()
+            return {metric: "N/A" for metric in
+                    ("leads", "most_active_portal", "new_offers", "sales", "revenue", "commission")}
+    
     def _get_active_listings(self, cursor, user_id: str) -> int:
         """Get count of active listings"""
         try:
@@ -140,11 +396,7 @@ class InsightGenerator:
                 WHERE user_id = %s AND status = 'active'
             """
             cursor.execute(query, (user_id,))
-            avg = cursor.fetchone()[0]
-            
-            if avg:
-                return f"R{avg:,.0f}"
-            return "N/A"
+            return self._format_average_price(cursor.fetchone()[0])
         except Exception as e:
             logger.warning(f"Could not calculate average price: {e}")
             return "N/A"
@@ -160,33 +412,70 @@ class InsightGenerator:
                   AND sold_date >= NOW() - INTERVAL '90 days'
             """
             cursor.execute(query, (user_id,))
-            avg_days = cursor.fetchone()[0]
-            
-            if avg_days:
-                return f"{avg_days:.0f} days"
-            return "N/A"
+            return self._format_sales_velocity(cursor.fetchone()[0])
         except Exception as e:
             logger.warning(f"Could not calculate sales velocity: {e}")
             return "N/A"
     
+    @staticmethod
+    def _format_sales_change(current: int, previous: int) -> str:
+        """Format week-on-week sales counts as a percentage change"""
+        if previous == 0:
+            return "+100%" if current > 0 else "No change"
+        
+        change = ((current - previous) / previous) * 100
+        sign = "+" if change > 0 else ""
+        return f"{sign}{change:.1f}%"
+    
+    @staticmethod
+    def _format_top_portal(portal: Optional[str], portal_leads: Optional[int], leads: int) -> str:
+        """Format the portal that brought the most leads with its share, e.g. 'P24 - 60%'"""
+        if portal and leads:
+            return f"{portal} - {portal_leads * 100 / leads:.0f}%"
+        return "N/A"
+    
+    @staticmethod
+    def _format_average_price(avg) -> str:
+        """Format average listing price"""
+        if avg:
+            return f"R{avg:,.0f}"
+        return "N/A"
+    
+    @staticmethod
+    def _format_sales_velocity(avg_days) -> str:
+        """Format average days to sell"""
+        if avg_days:
+            return f"{avg_days:.0f} days"
+        return "N/A"
+    
     def generate_mock_insights(self) -> Dict:
         """
         Generate mock insights for testing without database
         
+        Same shape as generate_mock_insights_batch(), so single and batch
+        mock runs render (and fill the template) the same way.
+        
         Returns:
             Dictionary of mock insight data
         """
-        import random
+        from src.mock_insights import generate_mock_cohort, iter_mock_insights
         
-        sales_changes = ["+5%", "+12%", "-3%", "+8%", "+15%"]
+        return next(iter_mock_insights(generate_mock_cohort(1)))
+    
+    def generate_mock_insights_batch(self, n: int, seed: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Generate mock insights for many users at once (vectorized)
         
-        return {
-            "sales_change": random.choice(sales_changes),
-            "active_listings": random.randint(20, 100),
-            "avg_price": f"R{random.randint(300, 800)}K",
-            "sales_velocity": f"{random.randint(10, 30)} days",
-            "generated_at": datetime.now().isoformat()
-        }
+        Args:
+            n: Number of users
+            seed: Random seed for reproducible runs
+            
+        Yields:
+            One insights dictionary per user
+        """
+        from src.mock_insights import generate_mock_cohort, iter_mock_insights
+        
+        return iter_mock_insights(generate_mock_cohort(n, seed))
 
 
 if __name__ == "__main__":
@@ -194,7 +483,7 @@ if __name__ == "__main__":
     print("Testing Insight Generator...\n")
     
     # Test with mock data (no database required)
-    generator = InsightGenerator()
+    generator = InsightGenerator(connect=False)
     mock_insights = generator.generate_mock_insights()
     
     print("✅ Mock insights generated:")
@@ -0,0 +1,152 @@
+"""
+Disk cache of uploaded WhatsApp media IDs, keyed by content hash
+"""
+import atexit
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from loguru import logger
+
+from src.config import settings
+
+
+def content_digest(content: bytes) -> str:
+    """SHA-256 hex digest identifying a media asset by its bytes"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class MediaCache:
+    """
+    Remember which assets are already uploaded to Meta
+    
+    Media IDs returned by /{phone_number_id}/media stay valid for 30 days.
+    Entries are keyed by the SHA-256 of the file, so the same chart or PDF
+    is uploaded once per validity window no matter how many recipients send it.
+    
+    Processes may share the cache file: saves merge with what is on disk under
+    a file lock, and a miss re-reads the file if another process has written it
+    since. New entries are saved at most every
+    settings.media_cache_save_interval_seconds, and on flush() or exit.
+    """
+    
+    def __init__(self, path: Optional[str] = None, ttl_days: Optional[int] = None):
+        """
+        Load the cache from disk
+        
+        Args:
+            path: JSON cache file (default: settings.media_cache_path)
+            ttl_days: How long a media ID is reused (default: settings.media_cache_ttl_days)
+        """
+        self.path = path or settings.media_cache_path
+        self.ttl_seconds = (ttl_days or settings.media_cache_ttl_days) * 86400
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._disk_mtime: Optional[int] = None
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        
+        self._merge(self._read())
+        atexit.register(self.flush)
+    
+    def get(self, digest: str) -> Optional[str]:
+        """
+        Look up a live media ID
+        
+        Args:
+            digest: content_digest() of the asset
+        
+        Returns:
+            Media ID, or None if never uploaded or expired
+        """
+        with self._lock:
+            entry = self._entries.get(digest)
+            if not entry and self._mtime() != self._disk_mtime:
+                # Another process may have uploaded it since we last looked
+                self._merge(self._read())
+                entry = self._entries.get(digest)
+            if not entry:
+                return None
+            if entry['expires_at'] <= time.time():
+                del self._entries[digest]
+                return None
+            return entry['media_id']
+    
+    def put(self, digest: str, media_id: str, mime_type: str):
+        """
+        Record an upload, persisting it if the last save was long enough ago
+        
+        Args:
+            digest: content_digest() of the asset
+            media_id: ID returned by the media endpoint
+            mime_type: Asset MIME type
+        """
+        now = time.time()
+        with self._lock:
+            self._entries[digest] = {
+                "media_id": media_id,
+                "mime_type": mime_type,
+                "uploaded_at": now,
+                "expires_at": now + self.ttl_seconds,
+            }
+            self._dirty = True
+            if time.monotonic() - self._saved_at >= settings.media_cache_save_interval_seconds:
+                self._save()
+    
+    def flush(self):
+        """Persist entries not yet saved"""
+        with self._lock:
+            if self._dirty:
+                self._save()
+    
+    def _mtime(self) -> Optional[int]:
+        """Modification time of the cache file, or None if there is none"""
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+    
+    def _read(self) -> Dict[str, Dict]:
+        """Entries currently on disk (empty if missing or unreadable)"""
+        self._disk_mtime = self._mtime()
+        if self._disk_mtime is None:
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable media cache {self.path}: {e}")
+            return {}
+    
+    def _merge(self, entries: Dict[str, Dict]):
+        """Fold entries into ours, keeping the newest upload per digest and dropping expired ones"""
+        now = time.time()
+        for digest, entry in entries.items():
+            ours = self._entries.get(digest)
+            if not ours or entry['uploaded_at'] > ours['uploaded_at']:
+                self._entries[digest] = entry
+        # Drop expired entries so the file doesn't grow forever
+        self._entries = {k: v for k, v in self._entries.items() if v['expires_at'] > now}
+    
+    def _save(self):
+        """Merge with the file on disk and write it atomically (caller holds the lock)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # Serialize read-merge-write across processes; the tmp file + replace keeps readers safe
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            self._merge(self._read())
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._disk_mtime = self._mtime()
+        
+        self._dirty = False
+        self._saved_at = time.monotonic()
@@ -0,0 +1,194 @@
+"""
+Compact typed models for users, insights and outbound messages
+"""
+import sys
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Any, ClassVar, Dict, Optional, Tuple
+
+import orjson
+
+from src.utils import format_phone_number
+
+
+class _MappingAccess:
+    """
+    Read access by key, so models work where user/insight dicts are expected
+    
+    A field that is None counts as missing: get() returns the default, like
+    dict.get() on a document without that key.
+    """
+    
+    __slots__ = ()
+    
+    def __getitem__(self, key: str) -> Any:
+        value = getattr(self, key, None)
+        if value is None:
+            raise KeyError(key)
+        return value
+    
+    def __contains__(self, key: str) -> bool:
+        return getattr(self, key, None) is not None
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key, None)
+        return default if value is None else value
+
+
+@dataclass(slots=True)
+class User(_MappingAccess):
+    """
+    Delivery-relevant fields of a whatsapp_users document
+    
+    About half the memory of the equivalent dict (less still against full
+    documents with created_at and other fields), and only these fields are
+    read from Firestore when models are requested.
+    """
+    
+    id: str
+    phone: str
+    name: str
+    frequency: str = "weekly"
+    active: bool = True
+    timezone: Optional[str] = None
+    user_id: Optional[str] = None  # CRM user the insights are computed for
+    last_sent: Optional[datetime] = None
+    last_run_id: Optional[str] = None  # Delivery run that last_sent was recorded for
+    
+    FIRESTORE_FIELDS: ClassVar[Tuple[str, ...]] = (
+        "phone", "name", "frequency", "active", "timezone", "user_id", "last_sent", "last_run_id",
+    )
+    
+    @classmethod
+    def from_firestore(cls, doc_id: str, data: Dict) -> "User":
+        """
+        Build from a Firestore document
+        
+        Args:
+            doc_id: Document ID
+            data: Document fields (extra fields are ignored)
+        """
+        timezone = data.get('timezone')
+        return cls(
+            id=doc_id,
+            phone=data.get('phone', ''),
+            name=data.get('name', ''),
+            # Shared by thousands of users, so keep one copy of each string
+            frequency=sys.intern(data.get('frequency') or 'weekly'),
+            active=data.get('active', True),
+            timezone=sys.intern(timezone) if timezone else None,
+            user_id=data.get('user_id'),
+            last_sent=data.get('last_sent'),
+            last_run_id=data.get('last_run_id'),
+        )
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "User":
+        """Build from a user dictionary with an 'id' key (e.g. get_all_active_users())"""
+        return cls.from_firestore(data['id'], data)
+    
+    def to_firestore(self) -> Dict:
+        """Document fields, without the ID"""
+        return {name: getattr(self, name) for name in self.FIRESTORE_FIELDS}
+    
+    def to_dict(self) -> Dict:
+        """User dictionary in the get_all_active_users() shape"""
+        return {"id": self.id, **self.to_firestore()}
+
+
+@dataclass(slots=True)
+class Insights(_MappingAccess):
+    """
+    One user's insight metrics
+    
+    Metrics the database doesn't produce stay None and are left out of
+    to_dict(); unknown keys are kept in `extra` so conversion is lossless.
+    """
+    
+    leads: Optional[int] = None
+    most_active_portal: Optional[str] = None
+    new_offers: Optional[int] = None
+    sales: Optional[int] = None
+    revenue: Optional[float] = None
+    commission: Optional[float] = None
+    sales_change: Optional[str] = None
+    active_listings: Optional[int] = None
+    avg_price: Optional[str] = None
+    sales_velocity: Optional[str] = None
+    generated_at: Optional[str] = None
+    deltas: Optional[Dict[str, Dict]] = None
+    extra: Optional[Dict[str, Any]] = None
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Insights":
+        """
+        Build from an insights dictionary
+        
+        Args:
+            data: Output of InsightGenerator, or the 'data' of an insights document
+        """
+        known = {}
+        extra = {}
+        for key, value in data.items():
+            if key in _INSIGHT_FIELDS:
+                known[key] = value
+            else:
+                extra[key] = value
+        return cls(**known, extra=extra or None)
+    
+    def to_dict(self) -> Dict:
+        """Insights dictionary as stored in Firestore and passed to formatters"""
+        data = {}
+        for name in _INSIGHT_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+
+_INSIGHT_FIELDS = frozenset(field.name for field in fields(Insights)) - {"extra"}
+
+
+@dataclass(slots=True)
+class OutboundMessage:
+    """
+    A message to one recipient, convertible to a Graph API payload
+    
+    `content` is the type-specific object, e.g. {"body": "..."} for text or
+    {"id": media_id} for an image.
+    """
+    
+    to: str
+    type: str
+    content: Dict[str, Any]
+    
+    @classmethod
+    def text(cls, to: str, body: str, preview_url: bool = False) -> "OutboundMessage":
+        """Text message to a phone number (formatted to E.164)"""
+        return cls(format_phone_number(to), "text", {"preview_url": preview_url, "body": body})
+    
+    @classmethod
+    def media(cls, to: str, media_type: str, media: Dict[str, Any]) -> "OutboundMessage":
+        """Image or document message by uploaded media ID"""
+        return cls(format_phone_number(to), media_type, media)
+    
+    @classmethod
+    def from_graph(cls, payload: Dict) -> "OutboundMessage":
+        """Parse a Graph API message payload"""
+        return cls(payload['to'], payload['type'], payload[payload['type']])
+    
+    def to_graph(self) -> Dict:
+        """Graph API /messages payload"""
+        return {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": self.to,
+            "type": self.type,
+            self.type: self.content
+        }
+    
+    def encode(self) -> bytes:
+        """JSON request body"""
+        return orjson.dumps(self.to_graph())
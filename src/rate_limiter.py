@@ -0,0 +1,114 @@
+"""
+Per-sender inbound rate limiting and reply coalescing for the webhook servers
+"""
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from src.config import settings
+
+
+class SlidingWindowRateLimiter:
+    """
+    Allow at most N events per key within a sliding time window
+    
+    State is in-process, so each webhook worker enforces the limit on the
+    traffic it receives.
+    """
+    
+    # Drop idle keys after this many calls so memory stays bounded
+    PRUNE_EVERY = 1000
+    
+    def __init__(self, max_events: Optional[int] = None, window_seconds: Optional[float] = None):
+        """
+        Initialize limiter
+        
+        Args:
+            max_events: Events allowed per window (default: settings.inbound_rate_limit)
+            window_seconds: Window length (default: settings.inbound_rate_window_seconds)
+        """
+        self.max_events = max_events or settings.inbound_rate_limit
+        self.window_seconds = window_seconds or settings.inbound_rate_window_seconds
+        self._events: Dict[str, Deque[float]] = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+    
+    def allow(self, key: str, now: Optional[float] = None) -> bool:
+        """
+        Record an event for a key if it is within the limit
+        
+        Args:
+            key: Sender identifier (phone number)
+            now: Current monotonic time (default: time.monotonic())
+            
+        Returns:
+            True if the event is allowed, False if it should be dropped
+        """
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window_seconds
+        
+        with self._lock:
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                self._prune(cutoff)
+            
+            events = self._events.setdefault(key, deque())
+            while events and events[0] <= cutoff:
+                events.popleft()
+            
+            if len(events) >= self.max_events:
+                return False
+            
+            events.append(now)
+            return True
+    
+    def _prune(self, cutoff: float):
+        """Forget keys with no events inside the window (caller holds the lock)"""
+        for key in [k for k, events in self._events.items() if not events or events[-1] <= cutoff]:
+            del self._events[key]
+
+
+class ReplyCoalescer:
+    """
+    Collapse a burst of identical requests into a single reply
+    
+    The first request from a key claims the reply; further requests within
+    the coalescing window are dropped because that reply already answers them.
+    """
+    
+    def __init__(self, window_seconds: Optional[float] = None):
+        """
+        Initialize coalescer
+        
+        Args:
+            window_seconds: Coalescing window (default: settings.reply_coalesce_seconds)
+        """
+        self.window_seconds = window_seconds or settings.reply_coalesce_seconds
+        self._claimed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+    
+    def claim(self, key: str, now: Optional[float] = None) -> bool:
+        """
+        Claim the reply for a key
+        
+        Args:
+            key: Sender and request type (e.g. 'insights:27821234567')
+            now: Current monotonic time (default: time.monotonic())
+            
+        Returns:
+            True if the caller should reply, False if a reply is already covering it
+        """
+        now = time.monotonic() if now is None else now
+        
+        with self._lock:
+            last = self._claimed.get(key)
+            if last is not None and now - last < self.window_seconds:
+                return False
+            
+            if len(self._claimed) >= SlidingWindowRateLimiter.PRUNE_EVERY:
+                cutoff = now - self.window_seconds
+                self._claimed = {k: t for k, t in self._claimed.items() if t > cutoff}
+            
+            self._claimed[key] = now
+            return True
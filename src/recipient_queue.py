@@ -0,0 +1,136 @@
+"""
+Per-recipient pacing so one phone number is never messaged too quickly
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, Generic, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from src.config import settings
+
+T = TypeVar("T")
+
+
+class RecipientQueue(Generic[T]):
+    """
+    Hold messages to the same recipient at least `min_gap` seconds apart
+    
+    Each push reserves the recipient's next free slot:
+    ready_at = max(now, previous slot + min_gap). Items wait in a heap
+    ordered by ready_at, so a recipient with several queued messages only
+    delays its own messages - everyone else's flow straight through.
+    """
+    
+    def __init__(self, min_gap: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize queue
+        
+        Args:
+            min_gap: Minimum seconds between messages to one recipient
+                     (default: settings.recipient_min_gap_seconds)
+            clock: Time source (injectable for dry runs)
+        """
+        self.min_gap = settings.recipient_min_gap_seconds if min_gap is None else min_gap
+        self.clock = clock
+        self._last_slot: dict = {}
+        self._prune_at = 10000
+        self._heap: List[Tuple[float, int, T]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+    
+    def reserve(self, recipient: str, last_sent: Optional[float] = None,
+                not_before: Optional[float] = None) -> float:
+        """
+        Reserve the recipient's next send slot
+        
+        Args:
+            recipient: Phone number
+            last_sent: Clock time the recipient's previous message actually went
+                       out, if later than its slot (e.g. it queued for a sender)
+            not_before: Earliest clock time for the slot (e.g. a planned send time)
+        
+        Returns:
+            Clock time at which the message may be sent
+        """
+        with self._lock:
+            now = self.clock()
+            earliest = now if not_before is None else max(now, not_before)
+            previous = self._last_slot.get(recipient)
+            if last_sent is not None:
+                previous = last_sent if previous is None else max(previous, last_sent)
+            ready_at = earliest if previous is None else max(earliest, previous + self.min_gap)
+            self._last_slot[recipient] = ready_at
+            
+            # Forget recipients whose gap has passed so the map stays small. The
+            # threshold doubles with the live set, keeping pruning amortized O(1).
+            if len(self._last_slot) > self._prune_at:
+                cutoff = now - self.min_gap
+                self._last_slot = {k: v for k, v in self._last_slot.items() if v > cutoff}
+                self._prune_at = max(10000, 2 * len(self._last_slot))
+            return ready_at
+    
+    def push(self, recipient: str, item: T, last_sent: Optional[float] = None,
+             not_before: Optional[float] = None):
+        """
+        Queue an item for a recipient
+        
+        Args:
+            recipient: Phone number
+            item: Anything to hand back when the slot arrives
+            last_sent: See reserve()
+            not_before: See reserve()
+        """
+        ready_at = self.reserve(recipient, last_sent, not_before)
+        with self._lock:
+            heapq.heappush(self._heap, (ready_at, next(self._sequence), item))
+    
+    def pop_ready(self) -> List[T]:
+        """
+        Remove and return every item whose slot has arrived
+        
+        Returns:
+            Due items in slot order
+        """
+        now = self.clock()
+        ready = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                ready.append(heapq.heappop(self._heap)[2])
+        return ready
+    
+    def next_delay(self) -> float:
+        """Seconds until the earliest queued item is due (0 if one is due or queue is empty)"""
+        with self._lock:
+            if not self._heap:
+                return 0.0
+            return max(0.0, self._heap[0][0] - self.clock())
+    
+    def paced(self, source: Iterable[T], recipient_of: Callable[[T], str],
+              sleep: Callable[[float], None] = time.sleep) -> Iterator[T]:
+        """
+        Re-order a stream so no recipient is messaged within the gap
+        
+        Items are pulled from the source as fast as they are consumed; only
+        when every remaining item is waiting on its recipient does this sleep.
+        
+        Args:
+            source: Items to send, in preferred order
+            recipient_of: Extract the recipient phone from an item
+            sleep: Sleep function (injectable for dry runs)
+        
+        Yields:
+            Items once their recipient's slot has arrived
+        """
+        for item in source:
+            self.push(recipient_of(item), item)
+            yield from self.pop_ready()
+        
+        while self._heap:
+            delay = self.next_delay()
+            if delay > 0:
+                sleep(delay)
+            yield from self.pop_ready()
@@ -0,0 +1,115 @@
+"""
+Process-pool stage that renders and serializes messages off the main process
+"""
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.config import settings
+from src.models import OutboundMessage
+from src.template_dispatcher import WeeklyInsightsDispatcher
+from src.utils import format_insight_message
+
+# Per-process template skeleton, created once by _init_worker
+_builder = {}
+
+
+def _init_worker(delivery_mode: str):
+    """Build the template payload skeleton once per worker process"""
+    if delivery_mode == "template":
+        _builder["templates"] = WeeklyInsightsDispatcher()
+
+
+def _render_chunk(chunk: List[Tuple[str, str, str, Dict]]) -> List[Optional[bytes]]:
+    """
+    Render and encode a chunk of messages
+    
+    Args:
+        chunk: (name, phone, frequency, insights with deltas attached) per user
+    
+    Returns:
+        Request body, or None if rendering failed, per user in order
+    """
+    templates = _builder.get("templates")
+    rendered = []
+    for name, phone, frequency, insights in chunk:
+        try:
+            if templates:
+                body = templates.build_body(phone, templates.template_params(name, insights))
+            else:
+                body = OutboundMessage.text(phone, format_insight_message(insights, name, frequency)).encode()
+        except Exception:
+            # One bad record mustn't sink the chunk - the send thread renders it again and reports the error
+            body = None
+        rendered.append(body)
+    return rendered
+
+
+class RenderPool:
+    """
+    Render message bodies for a stream of users across all cores
+    
+    Formatting, payload building and JSON encoding are pure CPU work that
+    would otherwise run under the GIL next to the sender threads. Users are
+    sent to worker processes in chunks, a bounded number of chunks are in
+    flight at a time, and results come back in input order as ready-to-post
+    request bodies.
+    """
+    
+    def __init__(self, processes: Optional[int] = None, delivery_mode: str = "text",
+                 chunk_size: Optional[int] = None):
+        """
+        Start the worker processes
+        
+        Args:
+            processes: Worker processes (default: CPU count)
+            delivery_mode: 'text' or 'template' - decides the body format
+            chunk_size: Users per task (default: settings.render_chunk_size)
+        """
+        processes = processes or os.cpu_count() or 1
+        self.chunk_size = chunk_size or settings.render_chunk_size
+        self.pool = ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                        initargs=(delivery_mode,))
+        # Enough queued chunks to keep every worker busy, without reading the whole cohort ahead
+        self.max_pending = processes * 2
+    
+    def render(self, user_insights: Iterable[Tuple[Dict, Dict]]) -> Iterator[Tuple[Dict, Dict, Optional[bytes]]]:
+        """
+        Render bodies for (user, insights) pairs
+        
+        Args:
+            user_insights: (user, insights) pairs with deltas already attached
+                           (the scheduler computes them in vectorized blocks)
+        
+        Yields:
+            (user, insights, request body or None) in input order
+        """
+        pending: Deque[Tuple[List[Tuple[Dict, Dict]], Future]] = deque()
+        iterator = iter(user_insights)
+        
+        while True:
+            chunk = list(islice(iterator, self.chunk_size))
+            if not chunk:
+                break
+            
+            work = [(user.get('name'), user.get('phone'), user.get('frequency'), insights)
+                    for user, insights in chunk]
+            pending.append((chunk, self.pool.submit(_render_chunk, work)))
+            
+            if len(pending) >= self.max_pending:
+                yield from self._collect(*pending.popleft())
+        
+        while pending:
+            yield from self._collect(*pending.popleft())
+    
+    @staticmethod
+    def _collect(chunk: List[Tuple[Dict, Dict]], future: Future) -> Iterator[Tuple[Dict, Dict, Optional[bytes]]]:
+        """Wait for a chunk and pair its bodies with its users"""
+        for (user, insights), body in zip(chunk, future.result()):
+            yield user, insights, body
+    
+    def close(self):
+        """Shut down the worker processes"""
+        self.pool.shutdown()
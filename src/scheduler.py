@@ -1,130 +1,891 @@
 """
 Main scheduler for WhatsApp insights delivery
 """
-import schedule
+import heapq
+import random
+import threading
 import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from apscheduler.executors.pool import ThreadPoolExecutor as JobExecutor
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
 from loguru import logger
-from datetime import datetime
+from datetime import datetime, timedelta
+import pytz
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
 
+from src.circuit_breaker import CircuitOpenError
+from src.chart_renderer import ChartRenderer
+from src.cohort import Cohort
 from src.config import settings
-from src.firebase_manager import FirebaseManager
-from src.whatsapp_sender import WhatsAppSender
+from src.dispatch_planner import DispatchPlanner
+from src.firebase_manager import FIRESTORE_BREAKER, FirebaseManager, is_firestore_outage
+from src.whatsapp_sender import (
+    GRAPH_BREAKER,
+    WhatsAppSender,
+    is_graph_outage,
+    is_graph_throttle,
+    is_pair_rate_limited,
+)
 from src.insight_generator import InsightGenerator
-from src.utils import format_insight_message, setup_logging
+from src.insight_deltas import compute_deltas
+from src.models import Insights, User
+from src.recipient_queue import RecipientQueue
+from src.render_pool import RenderPool
+from src.sharding import ShardCoordinator, filter_shard
+from src.stage_timer import StageTimer
+from src.template_dispatcher import WeeklyInsightsDispatcher
+from src.template_registry import TemplateRegistry
+from src.utils import format_insight_message, get_current_time_in_timezone, period_key, setup_logging
+
+
+# Minimum time between two reports for each user frequency
+FREQUENCY_INTERVALS = {
+    "daily": timedelta(days=1),
+    "weekly": timedelta(weeks=1),
+    "monthly": timedelta(days=28),
+}
+
+# Slack so a run that starts slightly earlier than last time still finds users due
+DUE_GRACE_PERIOD = timedelta(hours=6)
+
+
+@dataclass(slots=True)
+class Delivery:
+    """
+    One user's report on its way through the send pipeline
+    
+    `done` holds the steps already completed (persist, chart, send), so a
+    delivery that was parked, or is waiting for its recipient's next slot,
+    resumes where it stopped instead of repeating a send. `send_at` is the
+    planned send time (recipient queue clock) in spread mode.
+    """
+    
+    user: Dict
+    insights: Optional[Dict] = None
+    previous: Optional[Dict] = None
+    body: Optional[bytes] = None
+    chart: Optional[bytes] = None
+    done: FrozenSet[str] = frozenset()
+    send_at: Optional[float] = None
 
 
 class InsightsScheduler:
     """Orchestrate the insight generation and delivery process"""
     
-    def __init__(self, use_mock_data: bool = False):
+    def __init__(self, use_mock_data: bool = False, shard: Optional[Tuple[int, int]] = None,
+                 spread: Optional[bool] = None, mock_seed: Optional[int] = None,
+                 dry_run: bool = False, synthetic_users: Optional[int] = None,
+                 delivery_mode: Optional[str] = None, charts: bool = False,
+                 render_workers: Optional[int] = None):
         """
         Initialize scheduler with all components
         
         Args:
             use_mock_data: If True, use mock insights instead of querying database
+            shard: Optional (shard_index, num_shards) - only deliver to users in this shard
+            spread: Spread sends across each user's local delivery window
+                    (default: settings.delivery_spread)
+            mock_seed: Random seed for reproducible mock insights
+            dry_run: Run the full pipeline but build payloads instead of sending them
+                     and skip all Firebase writes
+            synthetic_users: In dry-run mode, use this many generated users instead
+                             of reading Firebase
+            delivery_mode: 'text' for free-form messages or 'template' for the approved
+                           weekly_insights template (default: settings.insights_delivery_mode)
+            charts: Also send each user a PNG chart of their metrics (text mode only)
+            render_workers: Processes that render and encode message bodies
+                            (default: settings.render_workers; 0 renders in the send threads)
         """
         setup_logging(settings.log_level)
         
         self.use_mock_data = use_mock_data
-        self.firebase = FirebaseManager()
-        self.whatsapp = WhatsAppSender()
-        self.insights_gen = InsightGenerator()
+        self.mock_seed = mock_seed
+        self.shard = shard
+        self.spread = settings.delivery_spread if spread is None else spread
+        self.planner = DispatchPlanner() if self.spread else None
+        # Constructor arguments, for the extra schedulers spread mode runs per frequency
+        self._options = dict(use_mock_data=use_mock_data, shard=shard, spread=spread, mock_seed=mock_seed,
+                             delivery_mode=delivery_mode, charts=charts, render_workers=render_workers)
+        self._frequency_schedulers: List["InsightsScheduler"] = []
+        self.dry_run = dry_run
+        self.timer = StageTimer()
+        # Users whose delivery hit an outage, retried at the end of the run:
+        # (user, insights, previous snapshot, delivery steps already done)
+        self.parked: List[Tuple[User, Optional[Insights], Optional[Dict], FrozenSet[str]]] = []
+        # Whether any of them were parked by rate limiting, which no breaker tracks
+        self.parked_throttled = False
+        self._counts_lock = threading.Lock()
+        # Shard lease bookkeeping; once lost, another worker owns the shard
+        self._lease_lock = threading.Lock()
+        self._lease_renewed_at = 0.0
+        self.lease_lost = False
+        # Keeps repeat messages to one phone (chart then text, duplicates, retries) apart
+        self.recipients = RecipientQueue()
+        # Sender threads; the adaptive limiter decides how many are sending at once.
+        # Dry runs stay sequential so the timing breakdown is per user.
+        self.send_workers = 1 if dry_run else settings.send_concurrency_max
+        self.delivery_mode = delivery_mode or settings.insights_delivery_mode
+        if self.delivery_mode not in ("text", "template"):
+            raise ValueError(f"Unknown delivery mode: {self.delivery_mode}")
+        if charts and self.delivery_mode == "template":
+            raise ValueError("Charts are sent as image messages, which need text delivery mode")
+        # Rendered in worker processes so image generation never holds up sending
+        self.charts = ChartRenderer() if charts else None
+        render_workers = settings.render_workers if render_workers is None else render_workers
+        if render_workers and self.spread:
+            # Batching renders would hold planned sends back; at the planned rate the
+            # send threads render without becoming the bottleneck
+            logger.info("Spread delivery renders in the send threads, not the render pool")
+            render_workers = 0
+        self.render_pool = RenderPool(render_workers, self.delivery_mode) if render_workers else None
+        
+        if dry_run:
+            from src.dry_run import (
+                RecordingFirebaseManager,
+                RecordingTemplateDispatcher,
+                RecordingWhatsAppSender,
+            )
+            from src.mock_insights import generate_mock_users
+            
+            # Shard leases are not taken so a dry run never blocks a real one
+            self.coordinator = None
+            if synthetic_users:
+                self.firebase = RecordingFirebaseManager(users=generate_mock_users(synthetic_users, mock_seed))
+            else:
+                self.firebase = RecordingFirebaseManager(source=FirebaseManager())
+            self.whatsapp = RecordingWhatsAppSender()
+            self.templates = RecordingTemplateDispatcher() if self.delivery_mode == "template" else None
+        else:
+            self.coordinator = ShardCoordinator() if shard else None
+            self.firebase = FirebaseManager()
+            self.whatsapp = WhatsAppSender()
+            self.templates = (
+                WeeklyInsightsDispatcher(registry=TemplateRegistry())
+                if self.delivery_mode == "template" else None
+            )
+        # Mock runs need no database connection
+        self.insights_gen = InsightGenerator(connect=not use_mock_data)
+        # Spread sends generate insights in the send threads, over one connection
+        self._db_lock = threading.Lock()
         
         logger.info("Insights Scheduler initialized")
     
-    def send_insights_to_all_users(self):
+    def send_insights_to_all_users(self, run_id: Optional[str] = None,
+                                   frequency: Optional[str] = None) -> Dict:
         """
         Main job: Generate and send insights to all active users
+        
+        Args:
+            run_id: Delivery run identifier used for shard leases
+                    (default: current period for the frequency, so a run is sent at most once)
+            frequency: Only send to users on this frequency whose report is due
+                       (default: every active user)
+        
+        Returns:
+            Dictionary with 'success' and 'fail' counts
         """
         logger.info("=" * 60)
-        logger.info(f"Starting insights delivery job at {datetime.now()}")
+        logger.info(f"Starting {frequency or 'full'} insights delivery job at {datetime.now()}")
         logger.info("=" * 60)
         
+        run_id = run_id or self.current_run_id(frequency or "weekly")
+        self.timer = StageTimer()
+        self.parked = []
+        self.parked_throttled = False
+        self.recipients = RecipientQueue()
+        self.lease_lost = False
+        
+        if self.templates:
+            # The registry refreshes past its TTL, so this sees template changes since startup
+            self.templates.check_template()
+        
+        if self.coordinator:
+            shard_index, num_shards = self.shard
+            if not self.coordinator.acquire(run_id, shard_index, num_shards):
+                logger.info(f"Skipping shard {shard_index}/{num_shards} for run {run_id}")
+                return {"success": 0, "fail": 0}
+            self._lease_renewed_at = time.monotonic()
+        
         try:
-            # Get all active users
-            users = self.firebase.get_all_active_users()
-            logger.info(f"Found {len(users)} active users")
-            
-            success_count = 0
-            fail_count = 0
-            
-            for user in users:
-                try:
-                    # Generate insights
-                    if self.use_mock_data:
-                        insights = self.insights_gen.generate_mock_insights()
-                    else:
-                        insights = self.insights_gen.generate_insights_for_user(user.get('user_id', 'default'))
-                    
-                    # Save insights to Firebase
-                    self.firebase.save_insights(user['id'], insights)
-                    
-                    # Format message
-                    message = format_insight_message(insights, user['name'])
-                    
-                    # Send via WhatsApp
-                    self.whatsapp.send_text_message(user['phone'], message)
-                    
-                    # Update last_sent timestamp
-                    self.firebase.update_user_last_sent(user['id'])
-                    
-                    success_count += 1
-                    logger.success(f"✅ Sent insights to {user['name']} ({user['phone']})")
-                    
-                    # Small delay to avoid rate limiting
-                    time.sleep(1)
-                    
-                except Exception as e:
-                    fail_count += 1
-                    logger.error(f"❌ Failed to send to {user.get('name', 'Unknown')}: {e}")
-                    continue
+            with self.timer.stage("user_fetch"):
+                if frequency:
+                    # Only users on this frequency whose last report is old enough
+                    sent_before = datetime.now() - FREQUENCY_INTERVALS[frequency] + DUE_GRACE_PERIOD
+                    users = self.firebase.get_due_users(frequency, sent_before, as_models=True)
+                    logger.info(f"Found {len(users)} {frequency} users due for insights")
+                else:
+                    # Get all active users
+                    users = self.firebase.get_all_active_users(as_models=True)
+                    logger.info(f"Found {len(users)} active users")
+                
+                if self.shard:
+                    users = filter_shard(users, *self.shard)
+                    logger.info(f"Shard {self.shard[0]}/{self.shard[1]}: {len(users)} users assigned")
+                
+                # A shard taken over after its lease expired is run again; skip users
+                # the previous owner already recorded as sent in this run
+                pending = [user for user in users if user.get('last_run_id') != run_id]
+                if len(pending) < len(users):
+                    logger.info(f"Skipping {len(users) - len(pending)} users already sent in run {run_id}")
+                    users = pending
+            
+            # Previous reports' snapshots, read in bulk, for change-since-last-period deltas
+            with self.timer.stage("previous_snapshots"):
+                previous = self._previous_snapshots(users)
+            
+            counts = {"success": 0, "fail": 0}
+            
+            if self.spread:
+                # Insights are generated at send time so database load is spread too
+                plan = self.planner.plan(users)
+                self._deliver_concurrently(self._planned_deliveries(plan, previous), counts, run_id)
+                logger.info(self.planner.lag_summary())
+            else:
+                user_insights = self.timer.timed_iter("insights", self._iter_user_insights(users))
+                # Deltas are attached here in vectorized blocks, so later stages get no snapshots
+                # (except users left to per-user generation, which diff their own)
+                user_insights = self._with_block_deltas(user_insights, previous)
+                if self.render_pool:
+                    # Bodies arrive prebuilt; the send threads only do network work
+                    rendered = self.timer.timed_iter("render_pool", self.render_pool.render(user_insights))
+                    deliveries = (Delivery(user, insights, body=body,
+                                           previous=previous.get(user['id']) if insights is None else None)
+                                  for user, insights, body in rendered)
+                else:
+                    deliveries = (Delivery(user, insights,
+                                           previous=previous.get(user['id']) if insights is None else None)
+                                  for user, insights in user_insights)
+                if self.charts:
+                    deliveries = self._with_block_charts(deliveries)
+                self._deliver_concurrently(deliveries, counts, run_id)
+            
+            self._retry_parked(counts, run_id)
+            
+            success_count, fail_count = counts["success"], counts["fail"]
             
             logger.info("=" * 60)
             logger.info(f"Insights delivery complete: {success_count} sent, {fail_count} failed")
             logger.info("=" * 60)
+            if self.dry_run:
+                self.firebase.log_summary()
+                sink = self.templates or self.whatsapp
+                logger.info(f"Dry run built {sink.messages_built} payloads "
+                            f"({sink.bytes_built:,} bytes), nothing was sent")
+            else:
+                for line in self.timer.report(success_count + fail_count):
+                    logger.info(line)
+            
+            if self.lease_lost:
+                # The new owner re-runs the shard and records its totals
+                logger.error(f"Stopped shard {self.shard[0]}/{self.shard[1]} early after losing its lease")
+            elif self.coordinator:
+                self.coordinator.complete(run_id, self.shard[0], success_count, fail_count)
+            
+            return {"success": success_count, "fail": fail_count}
             
         except Exception as e:
             logger.error(f"Critical error in insights delivery: {e}")
             raise
     
-    def run_once(self):
+    def _previous_snapshots(self, users: List[User]) -> Dict[str, Dict]:
+        """
+        Load each user's previous report, if it was sent one period ago
+        
+        Users are grouped by frequency so a daily user is compared with
+        yesterday's report and a monthly user with last month's; snapshots
+        from any other time get no deltas.
+        
+        Args:
+            users: Users about to receive insights
+            
+        Returns:
+            User ID -> previous report's insights
+        """
+        by_frequency: Dict[str, List[str]] = {}
+        for user in users:
+            by_frequency.setdefault(user.get('frequency') or 'weekly', []).append(user['id'])
+        
+        previous = {}
+        for frequency, user_ids in by_frequency.items():
+            period = FREQUENCY_INTERVALS.get(frequency, FREQUENCY_INTERVALS['weekly'])
+            previous.update(self.firebase.get_insights_bulk(user_ids, period=period))
+        return previous
+    
+    def _with_block_deltas(self, user_insights: Iterator[Tuple[Dict, Dict]],
+                           previous: Dict[str, Dict]) -> Iterator[Tuple[Dict, Dict]]:
+        """
+        Attach change-since-last-period deltas, computed a block of users at a time on columns
+        
+        Insights still stream from the cursor; each block of cohort_block_size
+        users is turned into a Cohort and diffed against the snapshots as
+        whole arrays instead of metric by metric, user by user.
+        
+        Args:
+            user_insights: (user, insights) pairs
+            previous: User ID -> previously saved insights
+            
+        Yields:
+            (user, insights) pairs with 'deltas' set where there is a previous snapshot
+        """
+        iterator = iter(user_insights)
+        while True:
+            block = list(islice(iterator, settings.cohort_block_size))
+            if not block:
+                return
+            
+            with self.timer.stage("deltas"):
+                cohort = Cohort([user for user, _ in block])
+                cohort.set_metrics([insights for _, insights in block])
+                cohort.set_previous(previous)
+                delta_rows = cohort.delta_rows()
+            
+            for (user, insights), deltas in zip(block, delta_rows):
+                if deltas:
+                    insights["deltas"] = deltas
+                yield user, insights
+    
+    def _planned_deliveries(self, plan: List[Tuple[datetime, int, Dict]],
+                            previous: Dict[str, Dict]) -> Iterator[Delivery]:
+        """
+        Turn a dispatch plan into deliveries that wait for their send time
+        
+        The recipient queue holds each one until its planned time, so spread
+        sends share the send threads, concurrency limit and recipient pacing
+        with every other run. Dry runs replay the plan without waiting.
+        
+        Args:
+            plan: Heap returned by DispatchPlanner.plan()
+            previous: User ID -> previously saved insights
+            
+        Yields:
+            Deliveries in planned order
+        """
+        now_utc, now = datetime.now(pytz.utc), self.recipients.clock()
+        while plan:
+            send_at, _, user = heapq.heappop(plan)
+            planned = None if self.dry_run else now + (send_at - now_utc).total_seconds()
+            yield Delivery(user, previous=previous.get(user['id']), send_at=planned)
+    
+    def _with_block_charts(self, deliveries: Iterator[Delivery]) -> Iterator[Delivery]:
+        """
+        Render charts a block of users at a time across the renderer's processes
+        
+        Args:
+            deliveries: Deliveries with their insights (and deltas)
+            
+        Yields:
+            The same deliveries, with their chart PNG attached where insights are known
+        """
+        iterator = iter(deliveries)
+        while True:
+            block = list(islice(iterator, settings.cohort_block_size))
+            if not block:
+                return
+            
+            # Users still to be generated get their chart rendered by the send thread
+            ready = [delivery for delivery in block if delivery.insights is not None]
+            with self.timer.stage("chart"):
+                charts = self.charts.render_many([delivery.insights for delivery in ready])
+            
+            for delivery, png in zip(ready, charts):
+                delivery.chart = png
+            yield from block
+    
+    def _messages_left(self, done: FrozenSet[str]) -> bool:
+        """Whether a delivery still has a WhatsApp message to send"""
+        if "send" not in done:
+            return True
+        return self.charts is not None and "chart" not in done
+    
+    def _deliver_concurrently(self, deliveries: Iterable[Delivery], counts: Dict, run_id: str):
+        """
+        Deliver to users from a pool of sender threads
+        
+        Insights are still produced in order on this thread (the cursor isn't
+        shared); only a bounded number of deliveries are in flight at a time,
+        so memory stays flat for large cohorts. Throughput is governed by the
+        Graph API's adaptive concurrency limit rather than a fixed delay.
+        
+        Every message waits in the recipient queue for its phone's next slot,
+        so a second message to the same number (a chart's follow-up text, a
+        duplicate user, a retry) keeps the pair-rate gap without holding up
+        anyone else. Planned (spread) deliveries also wait there for their
+        send time; how late each one starts is reported to the planner.
+        
+        Args:
+            deliveries: Deliveries in preferred order
+            counts: Running 'success'/'fail' totals, updated in place
+            run_id: Delivery run identifier
+        """
+        source = iter(deliveries)
+        exhausted = False
+        pending = set()
+        max_pending = self.send_workers * 2
+        
+        with ThreadPoolExecutor(max_workers=self.send_workers, thread_name_prefix="send") as pool:
+            def submit(delivery: Delivery):
+                if delivery.send_at is not None:
+                    self.planner.record_lag(self.recipients.clock() - delivery.send_at)
+                if self.send_workers <= 1:
+                    # Dry runs deliver inline, so the timing breakdown is per user
+                    future = Future()
+                    future.set_result(self._deliver(delivery, counts, run_id))
+                else:
+                    future = pool.submit(self._deliver, delivery, counts, run_id)
+                pending.add(future)
+            
+            def enqueue(delivery: Delivery, last_sent: Optional[float] = None):
+                if self._messages_left(delivery.done):
+                    self.recipients.push(delivery.user['phone'], delivery, last_sent, delivery.send_at)
+                else:
+                    # Nothing left to send (e.g. only last_sent after a retry) - no slot needed
+                    submit(delivery)
+            
+            while True:
+                if self.lease_lost:
+                    # Queued and unread deliveries now belong to the shard's new owner
+                    wait(pending)
+                    return
+                
+                while not exhausted and len(pending) < max_pending:
+                    delivery = next(source, None)
+                    if delivery is None:
+                        exhausted = True
+                    else:
+                        enqueue(delivery)
+                    for ready in self.recipients.pop_ready():
+                        submit(ready)
+                
+                if not pending:
+                    if exhausted and not len(self.recipients):
+                        return
+                    # Everything left is waiting on its recipient's gap or planned time
+                    self._sleep_holding_lease(self.recipients.next_delay(), run_id)
+                    for ready in self.recipients.pop_ready():
+                        submit(ready)
+                    continue
+                
+                timeout = self.recipients.next_delay() if len(self.recipients) else None
+                finished, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                pending -= finished
+                for future in finished:
+                    follow_up = future.result()
+                    if follow_up:
+                        # The gap runs from when the first message actually went out
+                        enqueue(follow_up, last_sent=self.recipients.clock())
+                for ready in self.recipients.pop_ready():
+                    submit(ready)
+    
+    def _deliver(self, delivery: Delivery, counts: Dict, run_id: str) -> Optional[Delivery]:
+        """
+        Save, format and send one user's insights
+        
+        Delivery is a sequence of steps - persist, chart, send, mark_sent.
+        Graph API sends are not idempotent, so a user parked part-way through
+        remembers the steps already done and a retry only runs the rest. At
+        most one message is sent per call: after a chart, the text is handed
+        back to wait for the recipient's next slot.
+        
+        Args:
+            delivery: User, insights (None to generate them now), previous
+                      snapshot for deltas, prebuilt body and chart, steps done
+            counts: Running 'success'/'fail' totals, updated in place
+            run_id: Delivery run identifier (for shard lease renewal)
+            
+        Returns:
+            The delivery to queue again for its recipient's next slot, or None
+            once it has been sent, failed or parked
+        """
+        if self.lease_lost:
+            return None
+        
+        user, insights, body = delivery.user, delivery.insights, delivery.body
+        done = set(delivery.done)
+        try:
+            if insights is None:
+                with self.timer.stage("insights"):
+                    insights = self._generate_insights(user)
+            
+            if body is None:
+                with self.timer.stage("deltas"):
+                    deltas = compute_deltas(insights, delivery.previous)
+                    if deltas:
+                        insights["deltas"] = deltas
+            
+            # Save insights to Firebase
+            if "persist" not in done:
+                with self.timer.stage("persist"):
+                    self.firebase.save_insights(user['id'], insights, user.get('frequency'))
+                done.add("persist")
+            
+            if self.templates:
+                # Approved template: only the seven parameters are encoded per user
+                if "send" not in done:
+                    if body is None:
+                        with self.timer.stage("render"):
+                            params = self.templates.template_params(user['name'], insights)
+                            body = self.templates.build_body(user['phone'], params)
+                    
+                    with self.timer.stage("send"):
+                        self.templates.send_body(body)
+                    done.add("send")
+            else:
+                if self.charts and "chart" not in done:
+                    png = delivery.chart
+                    if png is None:
+                        # Retries and spread sends weren't rendered in a batch
+                        with self.timer.stage("chart"):
+                            png = self.charts.render(insights)
+                    
+                    # Charts are unique per user, so they skip the media cache
+                    with self.timer.stage("chart_send"):
+                        media_id = self.whatsapp.upload_media(png, "image/png", "weekly_insights.png",
+                                                              cache=False)
+                        self.whatsapp.send_image_message(user['phone'], media_id)
+                    done.add("chart")
+                    
+                    # The text waits for the recipient's next slot; deltas are already attached
+                    return Delivery(user, insights, body=body, done=frozenset(done))
+                
+                if "send" not in done:
+                    if body is None:
+                        # Format message
+                        with self.timer.stage("render"):
+                            message = format_insight_message(insights, user['name'], user.get('frequency'))
+                        
+                        # Send via WhatsApp (payload build only in dry runs)
+                        with self.timer.stage("send"):
+                            self.whatsapp.send_text_message(user['phone'], message)
+                    else:
+                        with self.timer.stage("send"):
+                            self.whatsapp.send_prebuilt(body)
+                    done.add("send")
+            
+            # Update last_sent timestamp
+            with self.timer.stage("mark_sent"):
+                self.firebase.update_user_last_sent(user['id'], run_id)
+            
+            with self._counts_lock:
+                counts["success"] += 1
+            logger.success(f"✅ Sent insights to {user['name']} ({user['phone']})")
+            
+        except Exception as e:
+            throttled = is_graph_throttle(e) or is_pair_rate_limited(e)
+            if throttled or isinstance(e, CircuitOpenError) or is_graph_outage(e) or is_firestore_outage(e):
+                # Retried later from the first step not yet done.
+                # Insights are parked compact - a long outage can park the whole cohort.
+                parked_insights = Insights.from_dict(insights) if insights is not None else None
+                with self._counts_lock:
+                    self.parked.append((user, parked_insights, delivery.previous, frozenset(done)))
+                    self.parked_throttled = self.parked_throttled or throttled
+                logger.warning(f"Parked {user.get('name', 'Unknown')} "
+                               f"({', '.join(sorted(done)) or 'nothing'} done): {e}")
+                return None
+            with self._counts_lock:
+                counts["fail"] += 1
+            logger.error(f"❌ Failed to send to {user.get('name', 'Unknown')}: {e}")
+        finally:
+            # Keep the shard lease alive during long runs
+            self._hold_lease(run_id)
+        return None
+    
+    def _retry_parked(self, counts: Dict, run_id: str):
+        """
+        Retry users parked during an outage once the circuits allow calls again
+        
+        Each round waits for the open circuits' recovery timeout, so a long
+        outage costs a few probes rather than a failed call per user. Rate
+        limiting trips no breaker, so a round that follows throttled sends
+        also waits out an exponential, jittered backoff.
+        
+        Args:
+            counts: Running 'success'/'fail' totals, updated in place
+            run_id: Delivery run identifier (for shard lease renewal)
+        """
+        for attempt in range(1, settings.parked_retry_rounds + 1):
+            if not self.parked or self.lease_lost:
+                return
+            
+            parked, self.parked = self.parked, []
+            throttled, self.parked_throttled = self.parked_throttled, False
+            delay = max(GRAPH_BREAKER.retry_after, FIRESTORE_BREAKER.retry_after,
+                        self._throttle_backoff(attempt) if throttled else 0.0)
+            logger.info(f"Retrying {len(parked)} parked users in {delay:.0f}s "
+                        f"(round {attempt}/{settings.parked_retry_rounds})")
+            if delay and not self.dry_run:
+                self._sleep_holding_lease(delay, run_id)
+            
+            self._deliver_concurrently(
+                (Delivery(user, insights.to_dict() if insights is not None else None, previous, done=done)
+                 for user, insights, previous, done in parked),
+                counts, run_id
+            )
+        
+        if self.parked:
+            logger.error(f"Giving up on {len(self.parked)} users still parked after "
+                         f"{settings.parked_retry_rounds} retry rounds")
+            for user, _, _, done in self.parked:
+                if "send" in done:
+                    # The report went out; only last_sent is missing, so count it as sent
+                    logger.warning(f"Sent to {user['name']} but could not record last_sent")
+                    counts["success"] += 1
+                else:
+                    counts["fail"] += 1
+            self.parked = []
+    
+    @staticmethod
+    def _throttle_backoff(attempt: int) -> float:
+        """
+        Wait before retry round `attempt` after rate limiting
+        
+        Doubles every round from settings.parked_throttle_backoff_seconds (never
+        less than the recipient gap, so pair-limited users are clear), with up
+        to 50% jitter so parallel shards don't all return at once.
+        """
+        base = max(settings.parked_throttle_backoff_seconds, settings.recipient_min_gap_seconds)
+        return base * 2 ** (attempt - 1) * random.uniform(1.0, 1.5)
+    
+    def _hold_lease(self, run_id: str) -> bool:
+        """
+        Renew the shard lease once a third of it has elapsed
+        
+        Args:
+            run_id: Delivery run identifier
+            
+        Returns:
+            False once the lease is lost (it expired and another worker took
+            the shard over); delivery then stops so users aren't sent twice
+        """
+        if not self.coordinator:
+            return True
+        
+        with self._lease_lock:
+            if self.lease_lost:
+                return False
+            if time.monotonic() - self._lease_renewed_at < self.coordinator.lease_seconds / 3:
+                return True
+            if self.coordinator.renew(run_id, self.shard[0]):
+                self._lease_renewed_at = time.monotonic()
+                return True
+            self.lease_lost = True
+        
+        logger.error(f"Lost the lease on shard {self.shard[0]}/{self.shard[1]} for run {run_id}; "
+                     f"stopping delivery")
+        return False
+    
+    def _sleep_holding_lease(self, seconds: float, run_id: str):
+        """Sleep until planned sends or retries are due, renewing the shard lease so it can't expire"""
+        if not self.coordinator:
+            time.sleep(seconds)
+            return
+        
+        interval = self.coordinator.lease_seconds / 3
+        while seconds > 0 and self._hold_lease(run_id):
+            time.sleep(min(seconds, interval))
+            seconds -= interval
+    
+    def _generate_insights(self, user: Dict) -> Dict:
+        """Generate insights for a single user"""
+        if self.use_mock_data:
+            return self.insights_gen.generate_mock_insights()
+        with self._db_lock:
+            return self.insights_gen.generate_insights_for_user(user.get('user_id', 'default'))
+    
+    @staticmethod
+    def current_run_id(frequency: str = "weekly") -> str:
+        """
+        Default run identifier: the current period in the configured timezone
+        
+        Examples:
+            daily -> '2026-10-19', weekly -> '2026-W43', monthly -> '2026-10'
+        """
+        return period_key(get_current_time_in_timezone(settings.timezone), frequency)
+    
+    def _iter_user_insights(self, users: List[Dict]) -> Iterator[Tuple[Dict, Dict]]:
+        """
+        Pair each user with their insights
+        
+        Real insights are computed for the whole cohort in one query and
+        consumed incrementally from a server-side cursor. If the stream
+        fails part-way, the users it hadn't reached are yielded with None
+        insights, so each is generated (and can fail) on its own at send time.
+        
+        Args:
+            users: Active user dictionaries from Firebase
+            
+        Yields:
+            (user, insights or None) pairs
+        """
+        if self.use_mock_data:
+            # Whole cohort generated at once as arrays
+            yield from zip(users, self.insights_gen.generate_mock_insights_batch(len(users), self.mock_seed))
+            return
+        
+        # Several Firebase users may share one CRM user id
+        users_by_crm_id = {}
+        for user in users:
+            users_by_crm_id.setdefault(user.get('user_id', 'default'), []).append(user)
+        
+        stream = self.insights_gen.stream_cohort_insights(list(users_by_crm_id))
+        try:
+            for crm_id, insights in stream:
+                for user in users_by_crm_id.pop(crm_id, []):
+                    yield user, dict(insights)
+        except Exception as e:
+            # One bad query or dropped connection mustn't sink the whole run
+            logger.error(f"Cohort insights stream failed; generating the remaining "
+                         f"{sum(map(len, users_by_crm_id.values()))} users one by one: {e}")
+        finally:
+            # Ends the cursor's transaction even if delivery stopped early
+            stream.close()
+        
+        for users_left in users_by_crm_id.values():
+            for user in users_left:
+                yield user, None
+    
+    def run_once(self, run_id: Optional[str] = None, frequency: Optional[str] = None) -> Dict:
         """Run the job once (for testing)"""
         logger.info("Running job once (manual trigger)")
-        self.send_insights_to_all_users()
+        return self.send_insights_to_all_users(run_id, frequency)
+    
+    @staticmethod
+    def frequency_schedules() -> Dict[str, str]:
+        """Cron expression for each user frequency"""
+        return {
+            "daily": settings.insights_daily_schedule,
+            "weekly": settings.insights_schedule,
+            "monthly": settings.insights_monthly_schedule,
+        }
     
     def start_scheduled_job(self):
-        """Start the scheduled job based on cron schedule"""
-        logger.info(f"Scheduling insights delivery: {settings.insights_schedule}")
+        """Start one cron-scheduled job per user frequency"""
+        # BlockingScheduler sleeps until the next fire time - no polling loop.
+        # A single executor thread runs jobs that fire together one after another,
+        # since they share the database connection.
+        schedules = self.frequency_schedules()
+        executors = {"default": JobExecutor(max_workers=1)}
+        if self.spread:
+            # A spread run lasts the whole delivery window, so each frequency gets its
+            # own thread (and scheduler, with its own connection) instead of queueing
+            # behind another frequency's window
+            executors["spread"] = JobExecutor(max_workers=len(schedules))
+        scheduler = BlockingScheduler(timezone=settings.timezone, executors=executors)
         
-        # Parse cron schedule (simplified - using weekly for now)
-        # For production, use APScheduler with full cron support
-        schedule.every().monday.at("09:00").do(self.send_insights_to_all_users)
+        for i, (frequency, cron_expression) in enumerate(schedules.items()):
+            logger.info(f"Scheduling {frequency} insights delivery: {cron_expression}")
+            runner = self
+            if self.spread and i:
+                runner = InsightsScheduler(**self._options)
+                self._frequency_schedulers.append(runner)
+            scheduler.add_job(
+                runner.send_insights_to_all_users,
+                CronTrigger.from_crontab(cron_expression, timezone=settings.timezone),
+                kwargs={"frequency": frequency},
+                id=f"insights_{frequency}",
+                executor="spread" if self.spread else "default",
+                max_instances=1,
+                coalesce=True,
+                misfire_grace_time=3600
+            )
         
         logger.info("Scheduler started. Waiting for scheduled time...")
         logger.info("Press Ctrl+C to stop")
         
         try:
-            while True:
-                schedule.run_pending()
-                time.sleep(60)  # Check every minute
-        except KeyboardInterrupt:
+            scheduler.start()
+        except (KeyboardInterrupt, SystemExit):
             logger.info("Scheduler stopped by user")
-            self.insights_gen.close()
+        finally:
+            self.close()
+    
+    def close(self):
+        """Release the database connection and worker processes"""
+        for runner in self._frequency_schedulers:
+            runner.close()
+        self.insights_gen.close()
+        if self.charts:
+            self.charts.close()
+        if self.render_pool:
+            self.render_pool.close()
 
 
 def main():
     """Main entry point"""
-    import sys
+    import argparse
+    from src.sharding import parse_shard
+    
+    parser = argparse.ArgumentParser(description="PE WhatsApp Insights Scheduler")
+    parser.add_argument('--once', action='store_true', help="Run once immediately")
+    parser.add_argument('--mock', '--test', dest='mock', action='store_true', help="Use mock insights")
+    parser.add_argument('--template', dest='delivery_mode', action='store_const', const='template',
+                        help="Deliver with the approved weekly_insights template")
+    parser.add_argument('--workers', type=int, metavar='N',
+                        help="Render and encode message bodies in N processes (0 to disable)")
+    parser.add_argument('--charts', action='store_true',
+                        help="Also send each user a PNG chart of their metrics")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="Run the full pipeline without sending or writing; print stage timings")
+    parser.add_argument('--users', type=int, metavar='N',
+                        help="With --dry-run, use N synthetic users instead of reading Firebase")
+    parser.add_argument('--seed', type=int, help="Random seed for reproducible mock insights")
+    parser.add_argument('--shard', type=parse_shard, metavar='i/N',
+                        help="Only deliver to shard i of N (zero-based)")
+    parser.add_argument('--frequency', choices=sorted(FREQUENCY_INTERVALS),
+                        help="Only send to due users on this frequency (default: all active users)")
+    parser.add_argument('--spread', action='store_true', default=None,
+                        help="Spread sends across each user's local delivery window")
+    parser.add_argument('--run-id', help="Delivery run identifier (default: current period)")
+    parser.add_argument('--report', action='store_true',
+                        help="Print aggregated shard totals for the run and exit")
+    parser.add_argument('--delivery-stats', type=int, metavar='DAYS', nargs='?', const=7,
+                        help="Print delivery/read rates from status callbacks over the last DAYS and exit")
+    args = parser.parse_args()
+    
+    if args.delivery_stats:
+        stats = FirebaseManager().get_delivery_stats(datetime.now() - timedelta(days=args.delivery_stats))
+        print(f"Delivery stats for the last {args.delivery_stats} days:")
+        for state in ('sent', 'delivered', 'read', 'failed'):
+            print(f"  {state.capitalize():<10} {stats[state]}")
+        print(f"  Delivery rate: {stats['delivery_rate']:.1%}")
+        print(f"  Read rate:     {stats['read_rate']:.1%}")
+        return
+    
+    if args.report:
+        run_id = args.run_id or InsightsScheduler.current_run_id(args.frequency or "weekly")
+        totals = ShardCoordinator().aggregate(run_id)
+        print(f"Run {totals['run_id']}: {totals['shards_done']}/{totals['num_shards']} shards done")
+        print(f"  Sent:   {totals['success']}")
+        print(f"  Failed: {totals['fail']}")
+        if totals['shards_pending']:
+            print(f"  Pending shards: {', '.join(map(str, totals['shards_pending']))}")
+        return
+    
+    if args.users and not args.dry_run:
+        parser.error("--users requires --dry-run")
     
-    # Check if running in test mode
-    use_mock = '--mock' in sys.argv or '--test' in sys.argv
-    run_once = '--once' in sys.argv
+    scheduler = InsightsScheduler(use_mock_data=args.mock, shard=args.shard, spread=args.spread,
+                                  mock_seed=args.seed, dry_run=args.dry_run, synthetic_users=args.users,
+                                  delivery_mode=args.delivery_mode, charts=args.charts,
+                                  render_workers=args.workers)
     
-    scheduler = InsightsScheduler(use_mock_data=use_mock)
+    if args.dry_run:
+        # A dry run always runs once and reports its timing breakdown
+        result = scheduler.run_once(args.run_id, args.frequency)
+        print()
+        print("Dry run timing breakdown")
+        print("=" * 62)
+        for line in scheduler.timer.report(result["success"] + result["fail"]):
+            print(line)
+        scheduler.close()
+        return
     
-    if run_once:
+    if args.once:
         # Run immediately once
-        scheduler.run_once()
+        scheduler.run_once(args.run_id, args.frequency)
+        scheduler.close()
     else:
         # Start scheduled job
         scheduler.start_scheduled_job()
@@ -136,9 +897,16 @@ if __name__ == "__main__":
     ==============================
     
     Usage:
-      python -m src.scheduler              # Start scheduled job
+      python -m src.scheduler              # Start cron-scheduled jobs
+      python -m src.scheduler --once --frequency daily  # Send to due daily users now
       python -m src.scheduler --once       # Run once immediately
       python -m src.scheduler --once --mock  # Run once with mock data
+      python -m src.scheduler --once --spread  # Spread sends over local delivery windows
+      python -m src.scheduler --once --charts  # Include a PNG chart of each user's metrics
+      python -m src.scheduler --once --shard 0/4  # Deliver shard 0 of 4
+      python -m src.scheduler --report       # Aggregate shard totals for this week
+      python -m src.scheduler --dry-run --mock --users 100000  # Offline capacity benchmark
+      python -m src.scheduler --dry-run --mock --users 100000 --workers 8  # ...rendering on 8 cores
     
     """)
     
@@ -0,0 +1,248 @@
+"""
+Sharding support for running the scheduler across multiple processes or nodes
+"""
+import hashlib
+import os
+import socket
+import sqlite3
+import time
+from contextlib import closing
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from src.config import settings
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Parse a shard specification
+
+    Examples:
+        '0/4' -> (0, 4)
+        '3/4' -> (3, 4)
+
+    Args:
+        spec: Shard in 'i/N' form (zero-based index)
+
+    Returns:
+        Tuple of (shard_index, num_shards)
+    """
+    try:
+        index_str, total_str = spec.split('/')
+        shard_index, num_shards = int(index_str), int(total_str)
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}', expected 'i/N' (e.g. 0/4)")
+
+    if num_shards < 1 or not 0 <= shard_index < num_shards:
+        raise ValueError(f"Invalid shard '{spec}', index must be in 0..{num_shards - 1}")
+
+    return shard_index, num_shards
+
+
+def shard_for(key: str, num_shards: int) -> int:
+    """
+    Map a key to a shard using a stable hash
+
+    Python's built-in hash() is salted per process, so a keyed digest is used
+    instead - every worker on every node agrees on the assignment.
+
+    Args:
+        key: Stable identifier (Firebase user document ID)
+        num_shards: Total number of shards
+
+    Returns:
+        Zero-based shard index
+    """
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % num_shards
+
+
+def filter_shard(users: List[Dict], shard_index: int, num_shards: int) -> List[Dict]:
+    """
+    Keep only the users that belong to a shard
+
+    Args:
+        users: User dictionaries with an 'id' key
+        shard_index: Shard owned by this worker
+        num_shards: Total number of shards
+
+    Returns:
+        Users assigned to the shard
+    """
+    return [user for user in users if shard_for(user['id'], num_shards) == shard_index]
+
+
+class ShardCoordinator:
+    """
+    Track shard ownership and totals for a delivery run in SQLite
+
+    Each (run_id, shard) pair is leased to one worker at a time. A shard that
+    has completed for a run is never handed out again, so re-running a worker
+    for a finished run cannot double-send. If a worker dies its lease expires
+    and another worker may take the shard over; it skips users already
+    recorded as sent in the run (last_run_id), so only a user whose message
+    went out but wasn't recorded before the worker died can get it twice -
+    delivery is at-least-once for that window.
+    """
+
+    def __init__(self, path: Optional[str] = None, lease_seconds: Optional[int] = None):
+        """
+        Open (or create) the coordinator database
+
+        Args:
+            path: SQLite file shared by all workers (default: settings.shard_coordinator_path)
+            lease_seconds: How long a lease is valid without renewal
+        """
+        self.path = path or settings.shard_coordinator_path
+        self.lease_seconds = lease_seconds or settings.shard_lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS shard_runs (
+                    run_id TEXT NOT NULL,
+                    shard_index INTEGER NOT NULL,
+                    num_shards INTEGER NOT NULL,
+                    owner TEXT,
+                    status TEXT NOT NULL,
+                    lease_expires REAL,
+                    success INTEGER NOT NULL DEFAULT 0,
+                    fail INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL,
+                    PRIMARY KEY (run_id, shard_index)
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open a connection that waits for other workers' locks
+
+        Autocommit mode; callers close it (sqlite3's own context manager only commits).
+        """
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def acquire(self, run_id: str, shard_index: int, num_shards: int) -> bool:
+        """
+        Try to take the lease for a shard
+
+        Args:
+            run_id: Delivery run identifier (e.g. ISO week '2026-W42')
+            shard_index: Shard to acquire
+            num_shards: Total number of shards
+
+        Returns:
+            True if this worker now owns the shard
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT owner, status, lease_expires, num_shards FROM shard_runs "
+                "WHERE run_id = ? AND shard_index = ?",
+                (run_id, shard_index)
+            ).fetchone()
+
+            if row:
+                owner, status, lease_expires, recorded_shards = row
+                if recorded_shards != num_shards:
+                    conn.execute("ROLLBACK")
+                    raise ValueError(
+                        f"Run {run_id} was started with {recorded_shards} shards, not {num_shards}"
+                    )
+                if status == 'done':
+                    conn.execute("ROLLBACK")
+                    logger.info(f"Shard {shard_index}/{num_shards} already completed for run {run_id}")
+                    return False
+                if owner != self.owner and lease_expires and lease_expires > now:
+                    conn.execute("ROLLBACK")
+                    logger.info(f"Shard {shard_index}/{num_shards} is leased by {owner}")
+                    return False
+
+            conn.execute(
+                "INSERT INTO shard_runs (run_id, shard_index, num_shards, owner, status, lease_expires, updated_at) "
+                "VALUES (?, ?, ?, ?, 'running', ?, ?) "
+                "ON CONFLICT (run_id, shard_index) DO UPDATE SET "
+                "owner = excluded.owner, status = 'running', "
+                "lease_expires = excluded.lease_expires, updated_at = excluded.updated_at",
+                (run_id, shard_index, num_shards, self.owner, now + self.lease_seconds, now)
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+        logger.info(f"Acquired shard {shard_index}/{num_shards} for run {run_id}")
+        return True
+
+    def renew(self, run_id: str, shard_index: int) -> bool:
+        """
+        Extend the lease on a shard this worker owns
+
+        Args:
+            run_id: Delivery run identifier
+            shard_index: Shard being processed
+
+        Returns:
+            False if the lease expired and another worker took the shard over -
+            this worker must stop sending to it
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            cursor = conn.execute(
+                "UPDATE shard_runs SET lease_expires = ?, updated_at = ? "
+                "WHERE run_id = ? AND shard_index = ? AND owner = ? AND status = 'running'",
+                (now + self.lease_seconds, now, run_id, shard_index, self.owner)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, run_id: str, shard_index: int, success: int, fail: int):
+        """
+        Record a shard's totals and mark it done
+
+        Args:
+            run_id: Delivery run identifier
+            shard_index: Shard that finished
+            success: Messages sent
+            fail: Messages that failed
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE shard_runs SET status = 'done', success = ?, fail = ?, "
+                "lease_expires = NULL, updated_at = ? "
+                "WHERE run_id = ? AND shard_index = ? AND owner = ?",
+                (success, fail, time.time(), run_id, shard_index, self.owner)
+            )
+        logger.info(f"Shard {shard_index} of run {run_id} complete: {success} sent, {fail} failed")
+
+    def aggregate(self, run_id: str) -> Dict:
+        """
+        Sum the per-shard totals for a run
+
+        Args:
+            run_id: Delivery run identifier
+
+        Returns:
+            Dictionary with success/fail totals and shard progress
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT shard_index, num_shards, status, success, fail FROM shard_runs WHERE run_id = ?",
+                (run_id,)
+            ).fetchall()
+
+        num_shards = rows[0][1] if rows else 0
+        done = [row for row in rows if row[2] == 'done']
+
+        return {
+            "run_id": run_id,
+            "num_shards": num_shards,
+            "shards_done": len(done),
+            "shards_pending": sorted(set(range(num_shards)) - {row[0] for row in done}),
+            "success": sum(row[3] for row in done),
+            "fail": sum(row[4] for row in done),
+        }
@@ -0,0 +1,96 @@
+"""
+Per-stage wall-clock timing for pipeline runs
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+class StageTimer:
+    """
+    Accumulate time spent in each named stage of a run
+    
+    Safe to share between worker threads; stage totals are then summed
+    across threads and may exceed the wall clock.
+    """
+    
+    def __init__(self):
+        """Start timing a run"""
+        self.started = time.perf_counter()
+        self.totals: Dict[str, float] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    @contextmanager
+    def stage(self, name: str):
+        """
+        Time a block of work
+        
+        Example:
+            with timer.stage("render"):
+                message = format_insight_message(insights, name)
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+    
+    def _record(self, name: str, elapsed: float, calls: int = 1):
+        """Add time (and calls) to a stage's totals"""
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + elapsed
+            self.calls[name] = self.calls.get(name, 0) + calls
+    
+    def timed_iter(self, name: str, iterable: Iterable[T]) -> Iterator[T]:
+        """
+        Time how long each item takes to produce, e.g. rows streamed from a cursor
+        
+        Args:
+            name: Stage name
+            iterable: Source of items
+            
+        Yields:
+            Items from the iterable
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                # Time spent finding the end still counts, but isn't an item
+                self._record(name, time.perf_counter() - start, calls=0)
+                return
+            self._record(name, time.perf_counter() - start)
+            yield item
+    
+    @property
+    def elapsed(self) -> float:
+        """Wall-clock seconds since the run started"""
+        return time.perf_counter() - self.started
+    
+    def report(self, items: int) -> List[str]:
+        """
+        Format the timing breakdown
+        
+        Args:
+            items: Number of users processed (for throughput)
+            
+        Returns:
+            Report lines
+        """
+        elapsed = self.elapsed
+        lines = [f"{'Stage':<20}{'Total (s)':>12}{'Calls':>10}{'Mean (ms)':>12}{'Share':>8}"]
+        for name, total in self.totals.items():
+            calls = self.calls.get(name, 0)
+            mean_ms = (total / calls * 1000) if calls else 0.0
+            share = total / elapsed if elapsed else 0.0
+            lines.append(f"{name:<20}{total:>12.3f}{calls:>10}{mean_ms:>12.3f}{share:>8.1%}")
+        lines.append(f"{'wall clock':<20}{elapsed:>12.3f}")
+        throughput = items / elapsed if elapsed else 0.0
+        lines.append(f"Throughput: {throughput:,.1f} users/s ({items} users)")
+        return lines
@@ -0,0 +1,136 @@
+"""
+Coalescing buffer for WhatsApp message status callbacks
+"""
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from src.config import settings
+
+
+# Later stages supersede earlier ones when callbacks for a message are coalesced
+STATUS_RANK = {"sent": 1, "delivered": 2, "read": 3, "failed": 4}
+
+
+class StatusBuffer:
+    """
+    Collect sent/delivered/read/failed callbacks in memory, keyed by message ID
+    
+    Several callbacks for the same wamid collapse into one record, so a flush
+    writes one Firestore document per message rather than one per event.
+    Each stage is stored as its own timestamp field (sent_at, delivered_at...),
+    which makes merged writes safe even when callbacks arrive out of order or
+    span several flushes.
+    """
+    
+    def __init__(self, max_pending: Optional[int] = None, max_age_seconds: Optional[float] = None):
+        """
+        Initialize buffer
+        
+        Args:
+            max_pending: Flush once this many messages are buffered
+                         (default: settings.status_flush_size)
+            max_age_seconds: Flush once the oldest buffered event is this old
+                             (default: settings.status_flush_interval_seconds)
+        """
+        self.max_pending = max_pending or settings.status_flush_size
+        self.max_age_seconds = max_age_seconds or settings.status_flush_interval_seconds
+        self._pending: Dict[str, Dict] = {}
+        self._oldest: Optional[float] = None
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._pending)
+    
+    def add(self, status: Dict) -> bool:
+        """
+        Buffer one status callback from a webhook's value.statuses
+        
+        Args:
+            status: Status object from Meta ({'id', 'status', 'timestamp', 'recipient_id', ...})
+            
+        Returns:
+            True if the buffer should now be flushed
+        """
+        message_id = status.get('id')
+        state = status.get('status')
+        if not message_id or state not in STATUS_RANK:
+            return False
+        
+        with self._lock:
+            record = self._pending.get(message_id)
+            if record is None:
+                record = self._pending[message_id] = {"message_id": message_id}
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+            
+            self._merge(record, status)
+            return self._flush_due_locked()
+    
+    @staticmethod
+    def _merge(record: Dict, status: Dict):
+        """Fold one callback into a message's coalesced record"""
+        state = status['status']
+        
+        if STATUS_RANK[state] >= STATUS_RANK.get(record.get('status'), 0):
+            record['status'] = state
+        
+        try:
+            record[f"{state}_at"] = datetime.fromtimestamp(int(status.get('timestamp')), tz=timezone.utc)
+        except (TypeError, ValueError):
+            record[f"{state}_at"] = datetime.now(timezone.utc)
+        
+        if status.get('recipient_id'):
+            record['recipient_id'] = status['recipient_id']
+        if status.get('errors'):
+            record['errors'] = status['errors']
+        if status.get('pricing', {}).get('category'):
+            record['pricing_category'] = status['pricing']['category']
+    
+    def _flush_due_locked(self) -> bool:
+        """Check flush thresholds (caller holds the lock)"""
+        if not self._pending:
+            return False
+        if len(self._pending) >= self.max_pending:
+            return True
+        return time.monotonic() - self._oldest >= self.max_age_seconds
+    
+    def flush_due(self) -> bool:
+        """Whether the size or age threshold has been reached"""
+        with self._lock:
+            return self._flush_due_locked()
+    
+    def drain(self) -> List[Dict]:
+        """
+        Take all buffered records, leaving the buffer empty
+        
+        Returns:
+            One record per message ID
+        """
+        with self._lock:
+            records = list(self._pending.values())
+            self._pending = {}
+            self._oldest = None
+        return records
+    
+    def requeue(self, records: List[Dict]):
+        """
+        Put drained records back after a failed flush
+        
+        Args:
+            records: Records returned by drain()
+        """
+        with self._lock:
+            for record in records:
+                existing = self._pending.get(record['message_id'])
+                if existing is None:
+                    self._pending[record['message_id']] = record
+                    continue
+                # Newer callbacks arrived meanwhile - keep the furthest stage
+                for key, value in record.items():
+                    existing.setdefault(key, value)
+                if STATUS_RANK[record['status']] > STATUS_RANK[existing['status']]:
+                    existing['status'] = record['status']
+            if self._pending and self._oldest is None:
+                self._oldest = time.monotonic()
@@ -0,0 +1,212 @@
+"""
+Bulk delivery of the weekly_insights template with a prebuilt payload skeleton
+"""
+from typing import Dict, List, Optional
+
+import orjson
+import requests
+from loguru import logger
+
+from src.config import settings
+from src.template_registry import TemplateRegistry, TemplateValidationError
+from src.utils import format_phone_number
+from src.whatsapp_sender import graph_post
+
+
+# Placeholders swapped out of the pre-encoded skeleton
+_TO_SENTINEL = "__TO__"
+_PARAMS_SENTINEL = "__PARAMS__"
+
+
+class WeeklyInsightsDispatcher:
+    """
+    Send the approved 'weekly_insights' template to many users at full speed
+    
+    Templates can be delivered outside the 24-hour customer service window,
+    unlike free-form text. The payload skeleton is encoded to JSON once; each
+    send only encodes the recipient and the seven body parameters and splices
+    them in. The URL, headers and HTTP connection pool are set up once too.
+    """
+    
+    TEMPLATE_NAME = "weekly_insights"
+    PARAM_COUNT = 7
+    # Insight metrics behind the parameters that follow the user's name
+    REQUIRED_METRICS = ("leads", "most_active_portal", "new_offers", "sales", "revenue", "commission")
+    
+    def __init__(self, template_name: Optional[str] = None, language_code: str = "en",
+                 registry: Optional[TemplateRegistry] = None):
+        """
+        Initialize dispatcher
+        
+        Args:
+            template_name: Approved template name (default: 'weekly_insights')
+            language_code: Template language
+            registry: Template registry - if given, the template's approval and
+                      parameter count are checked once here rather than per send
+        
+        Raises:
+            TemplateValidationError: If the registry rejects the template
+        """
+        self.template_name = template_name or self.TEMPLATE_NAME
+        self.language_code = language_code
+        self.registry = registry
+        self.check_template()
+        self.url = f"{settings.meta_graph_api_url}/{settings.whatsapp_phone_number_id}/messages"
+        
+        # Pool sized so every concurrent sender thread keeps its connection alive
+        self.session = requests.Session()
+        self.session.mount("https://", requests.adapters.HTTPAdapter(pool_maxsize=settings.send_concurrency_max))
+        self.session.headers.update({
+            "Authorization": f"Bearer {settings.whatsapp_access_token}",
+            "Content-Type": "application/json"
+        })
+        
+        skeleton = orjson.dumps({
+            "messaging_product": "whatsapp",
+            "to": _TO_SENTINEL,
+            "type": "template",
+            "template": {
+                "name": self.template_name,
+                "language": {"code": language_code},
+                "components": [
+                    {"type": "body", "parameters": _PARAMS_SENTINEL}
+                ]
+            }
+        })
+        head, tail = skeleton.split(orjson.dumps(_TO_SENTINEL))
+        middle, suffix = tail.split(orjson.dumps(_PARAMS_SENTINEL))
+        self._segments = (head, middle, suffix)
+        
+        logger.info(f"Template dispatcher initialized for '{self.template_name}'")
+    
+    def check_template(self):
+        """
+        Check the template is still approved with the expected parameters
+        
+        Called once at startup and again before each delivery run, so a
+        template paused or edited in the meantime stops the run up front
+        rather than failing every send. A no-op without a registry.
+        
+        Raises:
+            TemplateValidationError: If the registry rejects the template
+        """
+        if self.registry:
+            self.registry.validate(self.template_name, self.language_code,
+                                   body_params=[""] * self.PARAM_COUNT)
+    
+    @classmethod
+    def template_params(cls, user_name: str, insights: Dict) -> List[str]:
+        """
+        Map a user's insights onto the template's seven body parameters
+        
+        Order: name, leads, top portal, new offers, sales, revenue, commission
+        
+        Args:
+            user_name: User's name
+            insights: Insight data
+            
+        Returns:
+            List of seven parameter strings
+            
+        Raises:
+            TemplateValidationError: If the name is empty or a metric is missing -
+                                     the template is never filled with made-up numbers
+        """
+        if not (user_name or "").strip():
+            raise TemplateValidationError(f"'{cls.TEMPLATE_NAME}' needs the user's name")
+        missing = [metric for metric in cls.REQUIRED_METRICS if insights.get(metric) in (None, "")]
+        if missing:
+            raise TemplateValidationError(f"Insights have no {', '.join(missing)} for '{cls.TEMPLATE_NAME}'")
+        
+        def amount(value) -> str:
+            try:
+                return f"R{float(value):,.0f}"
+            except (TypeError, ValueError):
+                return str(value)
+        
+        return [
+            user_name.strip(),
+            str(insights["leads"]),
+            str(insights["most_active_portal"]),
+            str(insights["new_offers"]),
+            str(insights["sales"]),
+            amount(insights["revenue"]),
+            amount(insights["commission"]),
+        ]
+    
+    def build_body(self, to: str, params: List[str]) -> bytes:
+        """
+        Build the encoded request body for one recipient
+        
+        Args:
+            to: Recipient phone number
+            params: Body parameters (exactly PARAM_COUNT)
+            
+        Returns:
+            JSON request body
+            
+        Raises:
+            ValueError: If the parameter count is wrong or a parameter is empty
+        """
+        if len(params) != self.PARAM_COUNT:
+            raise ValueError(f"'{self.template_name}' takes {self.PARAM_COUNT} parameters, got {len(params)}")
+        # Meta rejects the whole message if any parameter is empty
+        if any(not str(param).strip() for param in params):
+            raise TemplateValidationError(f"'{self.template_name}' parameters must not be empty")
+        
+        head, middle, suffix = self._segments
+        return b"".join((
+            head,
+            orjson.dumps(format_phone_number(to)),
+            middle,
+            orjson.dumps([{"type": "text", "text": param} for param in params]),
+            suffix,
+        ))
+    
+    def send_body(self, body: bytes) -> Dict:
+        """
+        Post a prebuilt request body
+        
+        Args:
+            body: Output of build_body()
+            
+        Returns:
+            API response dictionary
+        """
+        try:
+            response = graph_post(self.url, session=self.session, data=body)
+            return orjson.loads(response.content)
+            
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Failed to send template: {e}")
+            logger.error(f"Response: {e.response.text}")
+            raise
+    
+    def send_params(self, to: str, params: List[str]) -> Dict:
+        """
+        Send the template with explicit parameters
+        
+        Args:
+            to: Recipient phone number
+            params: Body parameters
+            
+        Returns:
+            API response dictionary
+        """
+        result = self.send_body(self.build_body(to, params))
+        logger.success(f"{self.template_name} template sent to {format_phone_number(to)}")
+        return result
+    
+    def send(self, to: str, user_name: str, insights: Dict) -> Dict:
+        """
+        Send a user's weekly insights as the template
+        
+        Args:
+            to: Recipient phone number
+            user_name: User's name
+            insights: Insight data
+            
+        Returns:
+            API response dictionary
+        """
+        return self.send_params(to, self.template_params(user_name, insights))
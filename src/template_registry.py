@@ -0,0 +1,270 @@
+"""
+Cached registry of WhatsApp message templates from the Graph API
+"""
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from loguru import logger
+
+from src.config import settings
+
+
+# Matches {{1}} style and {{name}} style placeholders
+PLACEHOLDER_PATTERN = re.compile(r"\{\{\s*([^{}]+?)\s*\}\}")
+
+
+class TemplateValidationError(ValueError):
+    """Raised when a template send would be rejected by Meta"""
+
+
+class TemplateRegistry:
+    """
+    Know which templates are approved and how many parameters they take
+    
+    Templates are fetched from /{waba_id}/message_templates once and cached
+    to disk. Lookups revalidate the cache with the stored ETag once it is
+    older than the TTL, so a long-lived registry notices templates being
+    paused or edited, and an unchanged template list costs a 304 instead of
+    a full download. Parameter counts are precomputed, so validating a send
+    is a dict lookup.
+    """
+    
+    # Wait between attempts while the Graph API is failing and the stale cache is served
+    RETRY_SECONDS = 60
+    
+    def __init__(self, cache_path: Optional[str] = None, ttl_seconds: Optional[int] = None):
+        """
+        Initialize registry from the disk cache (fetching if missing or stale)
+        
+        A failed fetch only raises when there is no cache to fall back on.
+        
+        Args:
+            cache_path: JSON cache file (default: settings.template_cache_path)
+            ttl_seconds: Cache lifetime before revalidation (default: settings.template_cache_ttl_seconds)
+        """
+        self.cache_path = cache_path or settings.template_cache_path
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.template_cache_ttl_seconds
+        self.url = f"{settings.meta_graph_api_url}/{settings.whatsapp_business_account_id}/message_templates"
+        self.headers = {"Authorization": f"Bearer {settings.whatsapp_access_token}"}
+        
+        self.etag: Optional[str] = None
+        self.fetched_at = 0.0
+        self._failed_at = 0.0
+        self._templates: Dict[Tuple[str, str], Dict] = {}
+        self._param_counts: Dict[Tuple[str, str], Dict[str, int]] = {}
+        
+        self._load_cache()
+        self.refresh()
+    
+    # CACHE
+    
+    def _load_cache(self):
+        """Load templates from the disk cache if present"""
+        if not os.path.exists(self.cache_path):
+            return
+        
+        try:
+            with open(self.cache_path, encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable template cache {self.cache_path}: {e}")
+            return
+        
+        self.etag = cache.get('etag')
+        self.fetched_at = cache.get('fetched_at', 0.0)
+        self._index(cache.get('templates', []))
+    
+    def _save_cache(self):
+        """Write templates to the disk cache"""
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "etag": self.etag,
+                "fetched_at": self.fetched_at,
+                "templates": list(self._templates.values())
+            }, f)
+        os.replace(tmp_path, self.cache_path)
+    
+    def _index(self, templates: List[Dict]):
+        """Index templates by (name, language) and precompute parameter counts"""
+        self._templates = {}
+        self._param_counts = {}
+        for template in templates:
+            key = (template.get('name'), template.get('language'))
+            self._templates[key] = template
+            self._param_counts[key] = self._count_parameters(template)
+    
+    @staticmethod
+    def _count_parameters(template: Dict) -> Dict[str, int]:
+        """Count distinct placeholders in each component"""
+        counts = {"header": 0, "body": 0, "buttons": 0}
+        for component in template.get('components', []):
+            comp_type = component.get('type', '').upper()
+            if comp_type == 'HEADER' and component.get('format', 'TEXT') == 'TEXT':
+                counts["header"] = len(set(PLACEHOLDER_PATTERN.findall(component.get('text', ''))))
+            elif comp_type == 'HEADER':
+                # Media headers take one media parameter
+                counts["header"] = 1
+            elif comp_type == 'BODY':
+                counts["body"] = len(set(PLACEHOLDER_PATTERN.findall(component.get('text', ''))))
+            elif comp_type == 'BUTTONS':
+                counts["buttons"] = sum(
+                    len(set(PLACEHOLDER_PATTERN.findall(button.get('url', ''))))
+                    for button in component.get('buttons', [])
+                )
+        return counts
+    
+    # FETCHING
+    
+    @property
+    def is_stale(self) -> bool:
+        """Whether the cache is older than its TTL"""
+        return time.time() - self.fetched_at >= self.ttl_seconds
+    
+    def refresh(self, force: bool = False):
+        """
+        Revalidate the cache against the Graph API if it is stale
+        
+        If the Graph API can't be reached (or errors) and templates are
+        cached, the stale cache keeps being served and refreshes are skipped
+        for RETRY_SECONDS, so lookups don't each wait on a failing request.
+        
+        Args:
+            force: Refresh even if the cache is fresh
+        
+        Raises:
+            requests.RequestException: If the fetch fails and nothing is cached
+        """
+        if not force and self._templates and (
+                not self.is_stale or time.time() - self._failed_at < self.RETRY_SECONDS):
+            return
+        
+        try:
+            self._fetch()
+        except requests.RequestException as e:
+            if not self._templates:
+                raise
+            self._failed_at = time.time()
+            logger.warning(f"Template refresh failed, serving {len(self._templates)} cached templates: {e}")
+    
+    def _fetch(self):
+        """Download the template list (or confirm it is unchanged) and update the cache"""
+        headers = dict(self.headers)
+        if self.etag and self._templates:
+            headers["If-None-Match"] = self.etag
+        
+        response = requests.get(self.url, headers=headers, params={"limit": 100},
+                                timeout=settings.graph_timeout_seconds)
+        
+        if response.status_code == 304:
+            logger.debug("Template list unchanged")
+            self.fetched_at = time.time()
+            self._save_cache()
+            return
+        
+        response.raise_for_status()
+        etag = response.headers.get('ETag')
+        
+        page = response.json()
+        templates = page.get('data', [])
+        while page.get('paging', {}).get('next'):
+            next_response = requests.get(page['paging']['next'], headers=self.headers,
+                                         timeout=settings.graph_timeout_seconds)
+            next_response.raise_for_status()
+            page = next_response.json()
+            templates.extend(page.get('data', []))
+        
+        # Only replace the cache once every page has arrived
+        self.etag = etag
+        self.fetched_at = time.time()
+        self._index(templates)
+        self._save_cache()
+        logger.info(f"Template registry refreshed: {len(templates)} templates")
+    
+    # LOOKUP AND VALIDATION
+    
+    def get(self, name: str, language: str = "en") -> Optional[Dict]:
+        """
+        Get a template definition
+        
+        Args:
+            name: Template name
+            language: Template language code
+        
+        Returns:
+            Template dictionary from the Graph API, or None if unknown
+        """
+        self.refresh()
+        return self._templates.get((name, language))
+    
+    def is_approved(self, name: str, language: str = "en") -> bool:
+        """Whether a template exists and is approved"""
+        template = self.get(name, language)
+        return bool(template) and template.get('status') == 'APPROVED'
+    
+    def parameter_counts(self, name: str, language: str = "en") -> Dict[str, int]:
+        """
+        Number of parameters each component expects
+        
+        Returns:
+            Dictionary with 'header', 'body' and 'buttons' counts
+        """
+        self.refresh()
+        counts = self._param_counts.get((name, language))
+        if counts is None:
+            raise TemplateValidationError(f"Unknown template '{name}' ({language})")
+        return counts
+    
+    def validate(self, name: str, language: str = "en",
+                 body_params: Optional[List[str]] = None,
+                 header_params: Optional[List[str]] = None):
+        """
+        Check a send locally before it costs a Graph API round-trip
+        
+        Args:
+            name: Template name
+            language: Template language code
+            body_params: Body parameters to be sent
+            header_params: Header parameters to be sent
+        
+        Raises:
+            TemplateValidationError: If the template is unknown, not approved,
+                                     or the parameter counts don't match
+        """
+        counts = self.parameter_counts(name, language)
+        
+        status = self._templates[(name, language)].get('status')
+        if status != 'APPROVED':
+            raise TemplateValidationError(f"Template '{name}' ({language}) is {status}, not APPROVED")
+        
+        if len(body_params or []) != counts["body"]:
+            raise TemplateValidationError(
+                f"Template '{name}' body takes {counts['body']} parameters, got {len(body_params or [])}"
+            )
+        if len(header_params or []) != counts["header"]:
+            raise TemplateValidationError(
+                f"Template '{name}' header takes {counts['header']} parameters, got {len(header_params or [])}"
+            )
+    
+    def list_templates(self) -> List[Dict]:
+        """All cached templates"""
+        self.refresh()
+        return list(self._templates.values())
+
+
+if __name__ == "__main__":
+    # Show the cached template list (refreshing if stale)
+    registry = TemplateRegistry()
+    
+    for template in registry.list_templates():
+        counts = registry.parameter_counts(template['name'], template['language'])
+        print(f"{template['name']} ({template['language']}) - {template.get('status')}")
+        print(f"  Parameters: header={counts['header']} body={counts['body']} buttons={counts['buttons']}")
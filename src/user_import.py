@@ -0,0 +1,175 @@
+"""
+Bulk user import from CSV or JSONL
+
+Usage:
+  python -m src.user_import agents.csv
+  python -m src.user_import agents.jsonl --dry-run
+
+CSV files need a header row. Recognised columns: name, phone, frequency,
+timezone, user_id (CRM identifier), active.
+"""
+import csv
+import json
+import os
+from typing import Dict, Iterator, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from loguru import logger
+
+from src.utils import format_phone_number, validate_whatsapp_number
+
+
+VALID_FREQUENCIES = ("daily", "weekly", "monthly")
+
+
+def read_records(path: str) -> Iterator[Dict]:
+    """
+    Stream raw records from a CSV or JSONL file
+    
+    Args:
+        path: File path (.csv, .jsonl or .ndjson)
+        
+    Yields:
+        One value per row - normally a dictionary, None for a JSONL line that
+        isn't valid JSON (normalize_record() rejects both None and non-dicts)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    
+    with open(path, newline='', encoding='utf-8') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension in ('.jsonl', '.ndjson'):
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    logger.warning(f"Malformed JSON on line {line_no}: {e}")
+                    yield None
+        else:
+            raise ValueError(f"Unsupported import format: {extension} (use .csv or .jsonl)")
+
+
+def is_valid_timezone(name: str) -> bool:
+    """Whether a name is an IANA time zone the dispatch planner can localize to"""
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return False
+    return True
+
+
+def normalize_record(record) -> Optional[Dict]:
+    """
+    Clean up one imported record
+    
+    Args:
+        record: Raw record from read_records()
+        
+    Returns:
+        User dictionary ready for FirebaseManager.bulk_add_users, or None if invalid
+    """
+    if not isinstance(record, dict):
+        return None
+    
+    name = str(record.get('name') or '').strip()
+    phone = format_phone_number(str(record.get('phone') or ''))
+    
+    if not name or not validate_whatsapp_number(phone):
+        return None
+    
+    user = {"name": name, "phone": phone}
+    
+    frequency = str(record.get('frequency') or '').strip().lower()
+    if frequency:
+        if frequency not in VALID_FREQUENCIES:
+            return None
+        user["frequency"] = frequency
+    
+    for field in ("timezone", "user_id"):
+        value = str(record.get(field) or '').strip()
+        if value:
+            user[field] = value
+    
+    if "timezone" in user and not is_valid_timezone(user["timezone"]):
+        return None
+    
+    active = record.get('active')
+    if active not in (None, ''):
+        user["active"] = active if isinstance(active, bool) else str(active).strip().lower() in ('1', 'true', 'yes', 'y')
+    
+    return user
+
+
+def import_users(path: str, batch_size: int = 500, dry_run: bool = False) -> Dict:
+    """
+    Import users from a file into Firebase
+    
+    Args:
+        path: CSV or JSONL file of agents
+        batch_size: Writes per Firestore commit
+        dry_run: Validate and dedupe only, without writing
+        
+    Returns:
+        Dictionary with 'read', 'invalid', 'added' and 'duplicates' counts
+    """
+    from src.firebase_manager import FirebaseManager
+    
+    counts = {"read": 0, "invalid": 0}
+    
+    def valid_users():
+        for line_no, record in enumerate(read_records(path), start=1):
+            counts["read"] += 1
+            try:
+                user = normalize_record(record)
+            except Exception as e:
+                # One odd record mustn't abort the whole import
+                logger.warning(f"Could not read record {line_no}: {e}")
+                user = None
+            if user is None:
+                counts["invalid"] += 1
+                logger.warning(f"Skipping invalid record {line_no}: {record}")
+                continue
+            yield user
+    
+    fm = FirebaseManager()
+    phone_index = fm.get_phone_index()
+    
+    if dry_run:
+        seen = set(phone_index)
+        added = duplicates = 0
+        for user in valid_users():
+            if user['phone'] in seen:
+                duplicates += 1
+            else:
+                seen.add(user['phone'])
+                added += 1
+        result = {"added": added, "duplicates": duplicates}
+    else:
+        result = fm.bulk_add_users(valid_users(), batch_size=batch_size, phone_index=phone_index)
+    
+    return {**counts, **result}
+
+
+def main():
+    """Command-line entry point"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Bulk import WhatsApp users from CSV or JSONL")
+    parser.add_argument('path', help="CSV (with header) or JSONL file of agents")
+    parser.add_argument('--batch-size', type=int, default=500, help="Writes per Firestore commit (max 500)")
+    parser.add_argument('--dry-run', action='store_true', help="Validate and dedupe without writing")
+    args = parser.parse_args()
+    
+    summary = import_users(args.path, batch_size=args.batch_size, dry_run=args.dry_run)
+    
+    print()
+    print(f"{'Dry run' if args.dry_run else 'Import'} complete:")
+    print(f"  {'Records read:':<20}{summary['read']}")
+    print(f"  {'Invalid:':<20}{summary['invalid']}")
+    print(f"  {'Duplicates skipped:':<20}{summary['duplicates']}")
+    print(f"  {('Would add:' if args.dry_run else 'Added:'):<20}{summary['added']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -66,40 +66,101 @@ def get_current_time_in_timezone(timezone: str = "Africa/Johannesburg") -> datet
     return datetime.now(tz)
 
 
-def format_insight_message(insights: dict, user_name: str) -> str:
+# Shape of period_key() labels per frequency, for telling them apart in stored history
+PERIOD_KEY_PATTERNS = {
+    "daily": re.compile(r"^\d{4}-\d{2}-\d{2}$"),
+    "weekly": re.compile(r"^\d{4}-W\d{2}$"),
+    "monthly": re.compile(r"^\d{4}-\d{2}$"),
+}
+
+
+def period_key(when: datetime, frequency: Optional[str] = None) -> str:
+    """
+    Label of the report period a time falls in
+    
+    Args:
+        when: Time to label (already in the reporting timezone)
+        frequency: daily, weekly or monthly (anything else, including None, is weekly)
+        
+    Returns:
+        e.g. daily -> '2026-10-19', weekly -> '2026-W43', monthly -> '2026-10'
+    """
+    if frequency == "daily":
+        return when.strftime("%Y-%m-%d")
+    if frequency == "monthly":
+        return when.strftime("%Y-%m")
+    year, week, _ = when.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def format_delta(insights: dict, metric: str, currency: bool = False) -> str:
+    """
+    Change-since-the-previous-report suffix for a metric line
+    
+    Args:
+        insights: Insight data, optionally with a 'deltas' entry (see src.insight_deltas)
+        metric: Metric name
+        currency: Format the change as Rands
+        
+    Returns:
+        Suffix such as ' (▲ +12, +5.5%)', or '' if there is no delta
+    """
+    delta = insights.get("deltas", {}).get(metric)
+    if not delta:
+        return ""
+    
+    change = delta["change"]
+    if change == 0:
+        return " (no change)"
+    
+    arrow = "▲" if change > 0 else "▼"
+    sign = "+" if change > 0 else "-"
+    amount = f"R{abs(change):,.2f}" if currency else f"{abs(change):,g}"
+    percent = f", {delta['percent']:+.1f}%" if delta.get("percent") is not None else ""
+    return f" ({arrow} {sign}{amount}{percent})"
+
+
+def format_insight_message(insights: dict, user_name: str, frequency: Optional[str] = None) -> str:
     """
     Format insights into a WhatsApp message
     
     Args:
         insights: Dictionary of insight data
         user_name: Name of the user
+        frequency: User's report frequency (daily, weekly, monthly; default weekly),
+                   which names the report and the period changes are measured over
         
     Returns:
         Formatted message string
     """
+    frequency = frequency or "weekly"
+    
     # Customize your header here
-    message = f"🏡 *Your Weekly Property Report*\n"
+    message = f"🏡 *Your {frequency.title()} Property Report*\n"
     message += f"Hello {user_name}! 👋\n\n"
-    message += f"Here's your performance summary:\n\n"
+    if insights.get("deltas"):
+        message += f"Here's your performance summary (changes since your previous {frequency} report):\n\n"
+    else:
+        message += f"Here's your performance summary:\n\n"
     
     # Add insights dynamically based on your metrics
     if "leads" in insights:
-        message += f"📈 *New Leads:* {insights['leads']}\n"
+        message += f"📈 *New Leads:* {insights['leads']}{format_delta(insights, 'leads')}\n"
     
     if "most_active_portal" in insights:
         message += f"🌐 *Top Portal:* {insights['most_active_portal']}\n"
     
     if "new_offers" in insights:
-        message += f"💼 *New Offers:* {insights['new_offers']}\n"
+        message += f"💼 *New Offers:* {insights['new_offers']}{format_delta(insights, 'new_offers')}\n"
     
     if "sales" in insights:
-        message += f"🏠 *Sales Closed:* {insights['sales']}\n"
+        message += f"🏠 *Sales Closed:* {insights['sales']}{format_delta(insights, 'sales')}\n"
     
     if "revenue" in insights:
         try:
             # Try to format as currency if it's a number
             revenue_val = float(insights['revenue'])
-            message += f"💰 *Revenue:* R{revenue_val:,.2f}\n"
+            message += f"💰 *Revenue:* R{revenue_val:,.2f}{format_delta(insights, 'revenue', currency=True)}\n"
         except (ValueError, TypeError):
             # If not a number, just display as-is
             message += f"💰 *Revenue:* {insights['revenue']}\n"
@@ -108,7 +169,7 @@ def format_insight_message(insights: dict, user_name: str) -> str:
         try:
             # Try to format as currency if it's a number
             commission_val = float(insights['commission'])
-            message += f"🎯 *Commission:* R{commission_val:,.2f}\n"
+            message += f"🎯 *Commission:* R{commission_val:,.2f}{format_delta(insights, 'commission', currency=True)}\n"
         except (ValueError, TypeError):
             # If not a number, just display as-is
             message += f"🎯 *Commission:* {insights['commission']}\n"
@@ -119,19 +180,19 @@ def format_insight_message(insights: dict, user_name: str) -> str:
         message += f"{emoji} *Sales Change:* {insights['sales_change']}\n"
     
     if "active_listings" in insights:
-        message += f"🏘️ *Active Listings:* {insights['active_listings']}\n"
+        message += f"🏘️ *Active Listings:* {insights['active_listings']}{format_delta(insights, 'active_listings')}\n"
     
     if "avg_price" in insights:
         try:
             # Try to format as currency if it's a number
             price_val = float(insights['avg_price'])
-            message += f"💵 *Average Price:* R{price_val:,.2f}\n"
+            message += f"💵 *Average Price:* R{price_val:,.2f}{format_delta(insights, 'avg_price', currency=True)}\n"
         except (ValueError, TypeError):
             # If not a number, just display as-is
-            message += f"💵 *Average Price:* {insights['avg_price']}\n"
+            message += f"💵 *Average Price:* {insights['avg_price']}{format_delta(insights, 'avg_price', currency=True)}\n"
     
     if "sales_velocity" in insights:
-        message += f"⚡ *Sales Velocity:* {insights['sales_velocity']}\n"
+        message += f"⚡ *Sales Velocity:* {insights['sales_velocity']}{format_delta(insights, 'sales_velocity')}\n"
     
     # Add footer
     message += f"\n━━━━━━━━━━━━━━━━━\n"
@@ -141,6 +202,57 @@ def format_insight_message(insights: dict, user_name: str) -> str:
     return message
 
 
+SIGNUP_MESSAGE = """
+📊 *Welcome to Property Insights!*
+
+To complete your signup, please provide:
+1. Your full name
+2. Your company name (if applicable)
+
+Reply with your details and we'll get you set up!
+
+Example: "John Smith, ABC Properties"
+""".strip()
+
+INSIGHTS_ERROR_MESSAGE = "Sorry, there was an error retrieving your insights. Please try again later."
+
+
+def format_no_insights_message(user_name: str) -> str:
+    """Reply for a registered user with no saved insights yet"""
+    return f"Hi {user_name}! 👋\n\nNo insights available yet. We'll send your first report soon!"
+
+
+def format_unsubscribe_message(user_name: str) -> str:
+    """Confirmation sent after a user unsubscribes"""
+    return (
+        f"Sorry to see you go, {user_name}! 👋\n\n"
+        f"You've been unsubscribed from weekly insights.\n\n"
+        f"Reply *SIGNUP* anytime to re-subscribe."
+    )
+
+
+def format_resubscribe_message(user_name: str) -> str:
+    """Confirmation sent after an unsubscribed user signs up again"""
+    return f"Welcome back, {user_name}! 🎉\n\nYou'll receive your insights again from the next report."
+
+
+def format_help_message(user_name: Optional[str] = None) -> str:
+    """List of available commands"""
+    greeting = f"Hi {user_name}!" if user_name else "Hi there!"
+    
+    return f"""
+{greeting} 👋
+
+*Available Commands:*
+
+📊 *insights* - Get your latest insights
+❓ *help* - Show this message
+🛑 *stop* - Unsubscribe from insights
+
+Just send me a message anytime and I'll send your latest insights!
+    """.strip()
+
+
 def setup_logging(log_level: str = "INFO"):
     """
     Setup loguru logger configuration
@@ -0,0 +1,78 @@
+"""
+Webhook request authentication for Meta's X-Hub-Signature-256 header
+"""
+import hashlib
+import hmac
+from typing import Optional
+from loguru import logger
+
+from src.config import settings
+
+
+class SignatureVerifier:
+    """
+    Verify that webhook payloads were signed by Meta with our app secret
+    
+    The HMAC key schedule is computed once at startup; each request only
+    copies the keyed state and hashes the raw body, so forged or junk
+    requests are rejected before any JSON parsing or Firestore/Graph work.
+    
+    Without an app secret, requests are only accepted unsigned in the
+    development environment; anywhere else every request is rejected, so a
+    missing META_APP_SECRET can't silently switch the check off.
+    """
+    
+    HEADER = "X-Hub-Signature-256"
+    PREFIX = "sha256="
+    
+    def __init__(self, app_secret: Optional[str] = None, environment: Optional[str] = None):
+        """
+        Initialize verifier
+        
+        Args:
+            app_secret: Meta app secret (default: settings.meta_app_secret)
+            environment: Deployment environment (default: settings.environment)
+        """
+        secret = app_secret if app_secret is not None else settings.meta_app_secret
+        environment = environment or settings.environment
+        self.allow_unsigned = False
+        
+        if secret:
+            self._keyed_mac = hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+        elif environment == "development":
+            self._keyed_mac = None
+            self.allow_unsigned = True
+            logger.warning("META_APP_SECRET not set - webhook signatures will NOT be verified (development)")
+        else:
+            self._keyed_mac = None
+            logger.error(f"META_APP_SECRET not set in {environment} - rejecting every webhook POST")
+    
+    @property
+    def enabled(self) -> bool:
+        """Whether signatures are being checked"""
+        return self._keyed_mac is not None
+    
+    def verify(self, body: bytes, signature_header: Optional[str]) -> bool:
+        """
+        Check a request's signature against its raw body
+        
+        Args:
+            body: Raw request body bytes, exactly as received
+            signature_header: Value of the X-Hub-Signature-256 header
+            
+        Returns:
+            True if the signature is valid (or unsigned requests are allowed in development)
+        """
+        if self._keyed_mac is None:
+            return self.allow_unsigned
+        
+        if not signature_header or not signature_header.startswith(self.PREFIX):
+            return False
+        
+        mac = self._keyed_mac.copy()
+        mac.update(body)
+        expected = mac.hexdigest().encode('ascii')
+        received = signature_header[len(self.PREFIX):].encode('utf-8', 'replace')
+        
+        # Constant-time compare so the signature can't be guessed byte by byte
+        return hmac.compare_digest(expected, received)
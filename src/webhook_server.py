@@ -2,18 +2,47 @@
 WhatsApp Webhook Handler
 Receives incoming messages and responds with insights
 """
+import atexit
+import json
+import threading
+import time
 from flask import Flask, request, jsonify
 from loguru import logger
-import hmac
-import hashlib
 
+from src.circuit_breaker import CircuitOpenError
+from src.command_router import build_command_router
 from src.config import settings
 from src.firebase_manager import FirebaseManager
+from src.rate_limiter import ReplyCoalescer, SlidingWindowRateLimiter
+from src.status_tracker import StatusBuffer
+from src.webhook_security import SignatureVerifier
 from src.whatsapp_sender import WhatsAppSender
-from src.utils import format_insight_message
+from src.utils import (
+    INSIGHTS_ERROR_MESSAGE,
+    SIGNUP_MESSAGE,
+    format_help_message,
+    format_insight_message,
+    format_no_insights_message,
+    format_resubscribe_message,
+    format_unsubscribe_message,
+)
 
 app = Flask(__name__)
 
+# Keyed once at startup and checked against the raw body of every POST
+signature_verifier = SignatureVerifier()
+
+# Built once - classifying a message is a single regex pass
+command_router = build_command_router()
+
+# Chatty senders are throttled and repeated requests collapsed before any I/O
+inbound_limiter = SlidingWindowRateLimiter()
+reply_coalescer = ReplyCoalescer()
+
+# Delivery status callbacks are coalesced here and written in batches
+status_buffer = StatusBuffer()
+status_flusher = None
+
 # Don't initialize services on startup - lazy load when needed
 firebase = None
 whatsapp = None
@@ -35,6 +64,37 @@ def get_whatsapp():
     return whatsapp
 
 
+def flush_statuses():
+    """Write buffered status records to Firestore, requeueing them on failure"""
+    records = status_buffer.drain()
+    if not records:
+        return
+    
+    try:
+        get_firebase().save_message_statuses(records)
+    except Exception as e:
+        logger.error(f"Failed to flush {len(records)} message statuses: {e}")
+        status_buffer.requeue(records)
+
+
+def start_status_flusher():
+    """Start the background thread that flushes statuses during quiet periods"""
+    global status_flusher
+    if status_flusher is not None:
+        return
+    
+    def run():
+        while True:
+            time.sleep(status_buffer.max_age_seconds)
+            if status_buffer.flush_due():
+                flush_statuses()
+    
+    # Started lazily so each gunicorn worker gets its own thread after fork
+    status_flusher = threading.Thread(target=run, name="status-flusher", daemon=True)
+    status_flusher.start()
+    atexit.register(flush_statuses)
+
+
 @app.route('/webhook', methods=['GET'])
 def verify_webhook():
     """
@@ -60,19 +120,34 @@ def handle_webhook():
     """
     Handle incoming WhatsApp messages
     """
+    # Authenticate the raw bytes before paying for a JSON parse
+    body = request.get_data()
+    if not signature_verifier.verify(body, request.headers.get(SignatureVerifier.HEADER)):
+        logger.warning(f"Rejected webhook with invalid signature from {request.remote_addr}")
+        return 'Forbidden', 403
+    
     try:
-        data = request.get_json()
+        data = json.loads(body)
         logger.info(f"Received webhook: {data}")
         
         # Extract message data
         if not data.get('entry'):
             return jsonify({'status': 'ok'}), 200
         
+        flush_needed = False
         for entry in data['entry']:
             for change in entry.get('changes', []):
-                if change.get('value', {}).get('messages'):
-                    for message in change['value']['messages']:
-                        handle_incoming_message(message, change['value'])
+                value = change.get('value', {})
+                if value.get('messages'):
+                    for message in value['messages']:
+                        handle_incoming_message(message, value)
+                for status in value.get('statuses', []):
+                    flush_needed = status_buffer.add(status) or flush_needed
+        
+        if len(status_buffer):
+            start_status_flusher()
+        if flush_needed:
+            flush_statuses()
         
         return jsonify({'status': 'ok'}), 200
         
@@ -103,22 +178,32 @@ def handle_incoming_message(message: dict, value: dict):
         
         logger.info(f"Message from {from_number}: {text}")
         
+        if not inbound_limiter.allow(from_number):
+            logger.warning(f"Rate limit exceeded for {from_number}, dropping message")
+            return
+        
+        command = command_router.match(text)
+        
+        if command and not reply_coalescer.claim(f"{command}:{from_number}"):
+            logger.info(f"Coalescing repeated {command} request from {from_number}")
+            return
+        
         # Look up user in Firebase
         fb = get_firebase()
         user = fb.get_user_by_phone(from_number)
         
         if not user:
-            handle_unregistered_user(from_number, text)
+            handle_unregistered_user(from_number, text, command)
             return
         
         # User exists - handle their request
-        handle_registered_user(user, text, from_number)
+        handle_registered_user(user, text, from_number, command)
         
     except Exception as e:
         logger.error(f"Error handling message: {e}")
 
 
-def handle_registered_user(user: dict, text: str, phone: str):
+def handle_registered_user(user: dict, text: str, phone: str, command: str = None):
     """
     Handle message from registered user
     
@@ -126,13 +211,19 @@ def handle_registered_user(user: dict, text: str, phone: str):
         user: User document from Firebase
         text: Message text (lowercase)
         phone: User's phone number
+        command: Command matched by the router, if any
     """
-    # ONLY respond to insights requests - ignore everything else
-    if 'insight' in text or 'report' in text or 'stats' in text:
+    if command == 'insights':
         send_user_insights(user, phone)
+    elif command == 'help':
+        send_help_message(phone, user['name'])
+    elif command == 'stop':
+        handle_unsubscribe(user, phone)
+    elif command == 'signup':
+        handle_resubscribe(user, phone)
     else:
         # Log but don't respond to any other messages
-        logger.info(f"Ignoring non-insights message from {user['name']}: {text}")
+        logger.info(f"Ignoring non-command message from {user['name']}: {text}")
 
 
 def send_user_insights(user: dict, phone: str):
@@ -146,38 +237,40 @@ def send_user_insights(user: dict, phone: str):
         
         if not insights_doc or not insights_doc.get('data'):
             wa = get_whatsapp()
-            wa.send_text_message(
-                phone,
-                f"Hi {user['name']}! 👋\n\nNo insights available yet. We'll send your first report soon!"
-            )
+            wa.send_text_message(phone, format_no_insights_message(user['name']))
             return
         
         # Format and send insights
         insights = insights_doc['data']
-        message = format_insight_message(insights, user['name'])
+        message = format_insight_message(insights, user['name'], user.get('frequency'))
         
         wa = get_whatsapp()
         wa.send_text_message(phone, message)
         logger.success(f"Sent insights to {user['name']} ({phone})")
         
+    except CircuitOpenError as e:
+        # The apology would fail the same way - don't spend a second call on it
+        logger.warning(f"Not replying to {phone}: {e}")
     except Exception as e:
         logger.error(f"Failed to send insights: {e}")
         wa = get_whatsapp()
-        wa.send_text_message(
-            phone,
-            "Sorry, there was an error retrieving your insights. Please try again later."
-        )
+        wa.send_text_message(phone, INSIGHTS_ERROR_MESSAGE)
 
 
-def handle_unregistered_user(phone: str, text: str):
+def handle_unregistered_user(phone: str, text: str, command: str = None):
     """
     Handle message from unregistered user
     
     Args:
         phone: User's phone number
         text: Message text (lowercase)
+        command: Command matched by the router, if any
     """
-    # Ignore all messages from unregistered users
+    if command == 'signup':
+        send_signup_message(phone)
+        return
+    
+    # Ignore everything else from unregistered users
     logger.info(f"Ignoring message from unregistered user {phone}: {text}")
 
 
@@ -185,19 +278,7 @@ def send_signup_message(phone: str):
     """
     Send signup instructions
     """
-    message = """
-📊 *Welcome to Property Insights!*
-
-To complete your signup, please provide:
-1. Your full name
-2. Your company name (if applicable)
-
-Reply with your details and we'll get you set up!
-
-Example: "John Smith, ABC Properties"
-    """.strip()
-    
-    whatsapp.send_text_message(phone, message)
+    get_whatsapp().send_text_message(phone, SIGNUP_MESSAGE)
 
 
 def handle_unsubscribe(user: dict, phone: str):
@@ -206,12 +287,9 @@ def handle_unsubscribe(user: dict, phone: str):
     """
     try:
         # Deactivate user
-        firebase.delete_user(user['id'])
+        get_firebase().delete_user(user['id'])
         
-        whatsapp.send_text_message(
-            phone,
-            f"Sorry to see you go, {user['name']}! 👋\n\nYou've been unsubscribed from weekly insights.\n\nReply *SIGNUP* anytime to re-subscribe."
-        )
+        get_whatsapp().send_text_message(phone, format_unsubscribe_message(user['name']))
         
         logger.info(f"Unsubscribed user: {user['name']} ({phone})")
         
@@ -219,25 +297,30 @@ def handle_unsubscribe(user: dict, phone: str):
         logger.error(f"Failed to unsubscribe user: {e}")
 
 
-def send_help_message(phone: str, name: str = None):
+def handle_resubscribe(user: dict, phone: str):
     """
-    Send help/commands list
+    Handle signup request from an existing (possibly unsubscribed) user
     """
-    greeting = f"Hi {name}!" if name else "Hi there!"
+    if user.get('active', True):
+        send_help_message(phone, user['name'])
+        return
     
-    message = f"""
-{greeting} 👋
-
-*Available Commands:*
+    try:
+        get_firebase().reactivate_user(user['id'])
+        
+        get_whatsapp().send_text_message(phone, format_resubscribe_message(user['name']))
+        
+        logger.info(f"Resubscribed user: {user['name']} ({phone})")
+        
+    except Exception as e:
+        logger.error(f"Failed to resubscribe user: {e}")
 
-📊 *insights* - Get your latest insights
-❓ *help* - Show this message
-🛑 *stop* - Unsubscribe from insights
 
-Just send me a message anytime and I'll send your latest insights!
-    """.strip()
-    
-    whatsapp.send_text_message(phone, message)
+def send_help_message(phone: str, name: str = None):
+    """
+    Send help/commands list
+    """
+    get_whatsapp().send_text_message(phone, format_help_message(name))
 
 
 if __name__ == '__main__':
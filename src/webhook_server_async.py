@@ -0,0 +1,305 @@
+"""
+WhatsApp Webhook Handler (ASGI)
+Async variant of webhook_server with the same /webhook contract.
+A single worker keeps many webhooks in flight while they wait on Graph API
+and Firestore I/O.
+
+Run: uvicorn src.webhook_server_async:app --host 0.0.0.0 --port 8080
+"""
+import asyncio
+import json
+from quart import Quart, request, jsonify
+from loguru import logger
+
+from src.circuit_breaker import CircuitOpenError
+from src.command_router import build_command_router
+from src.config import settings
+from src.async_firebase_manager import AsyncFirebaseManager
+from src.async_whatsapp_sender import AsyncWhatsAppSender
+from src.rate_limiter import ReplyCoalescer, SlidingWindowRateLimiter
+from src.status_tracker import StatusBuffer
+from src.webhook_security import SignatureVerifier
+from src.utils import (
+    INSIGHTS_ERROR_MESSAGE,
+    SIGNUP_MESSAGE,
+    format_help_message,
+    format_insight_message,
+    format_no_insights_message,
+    format_resubscribe_message,
+    format_unsubscribe_message,
+)
+
+app = Quart(__name__)
+
+# Keyed once at startup and checked against the raw body of every POST
+signature_verifier = SignatureVerifier()
+
+# Built once - classifying a message is a single regex pass
+command_router = build_command_router()
+
+# Chatty senders are throttled and repeated requests collapsed before any I/O
+inbound_limiter = SlidingWindowRateLimiter()
+reply_coalescer = ReplyCoalescer()
+
+# Delivery status callbacks are coalesced here and written in batches
+status_buffer = StatusBuffer()
+
+# Don't initialize services on startup - lazy load when needed
+firebase = None
+whatsapp = None
+
+
+def get_firebase() -> AsyncFirebaseManager:
+    """Lazy load Firebase"""
+    global firebase
+    if firebase is None:
+        firebase = AsyncFirebaseManager()
+    return firebase
+
+
+def get_whatsapp() -> AsyncWhatsAppSender:
+    """Lazy load WhatsApp sender"""
+    global whatsapp
+    if whatsapp is None:
+        whatsapp = AsyncWhatsAppSender()
+    return whatsapp
+
+
+async def flush_statuses():
+    """Write buffered status records to Firestore, requeueing them on failure"""
+    records = status_buffer.drain()
+    if not records:
+        return
+    
+    try:
+        await get_firebase().save_message_statuses(records)
+    except Exception as e:
+        logger.error(f"Failed to flush {len(records)} message statuses: {e}")
+        status_buffer.requeue(records)
+
+
+async def flush_statuses_periodically():
+    """Flush statuses that have waited too long during quiet periods"""
+    while True:
+        await asyncio.sleep(status_buffer.max_age_seconds)
+        if status_buffer.flush_due():
+            await flush_statuses()
+
+
+@app.before_serving
+async def start_background_tasks():
+    """Start the periodic status flusher"""
+    app.add_background_task(flush_statuses_periodically)
+
+
+@app.after_serving
+async def close_clients():
+    """Flush remaining statuses and release pooled HTTP connections on shutdown"""
+    await flush_statuses()
+    if whatsapp is not None:
+        await whatsapp.close()
+
+
+@app.route('/webhook', methods=['GET'])
+async def verify_webhook():
+    """
+    Webhook verification for Meta
+    Meta sends a GET request to verify your webhook
+    """
+    mode = request.args.get('hub.mode')
+    token = request.args.get('hub.verify_token')
+    challenge = request.args.get('hub.challenge')
+    
+    logger.info(f"Webhook verification attempt - mode: {mode}, token received: {token is not None}")
+    
+    if mode == 'subscribe' and token == settings.webhook_verify_token:
+        logger.info("Webhook verified successfully")
+        return challenge, 200
+    else:
+        logger.warning("Webhook verification failed - verify token mismatch")
+        return 'Forbidden', 403
+
+
+@app.route('/webhook', methods=['POST'])
+async def handle_webhook():
+    """
+    Handle incoming WhatsApp messages
+    """
+    # Authenticate the raw bytes before paying for a JSON parse
+    body = await request.get_data()
+    if not signature_verifier.verify(body, request.headers.get(SignatureVerifier.HEADER)):
+        logger.warning(f"Rejected webhook with invalid signature from {request.remote_addr}")
+        return 'Forbidden', 403
+    
+    try:
+        data = json.loads(body)
+        logger.info(f"Received webhook: {data}")
+        
+        # Extract message data
+        if not data.get('entry'):
+            return jsonify({'status': 'ok'}), 200
+        
+        values = [change.get('value', {}) for entry in data['entry'] for change in entry.get('changes', [])]
+        
+        flush_needed = False
+        for value in values:
+            for status in value.get('statuses', []):
+                flush_needed = status_buffer.add(status) or flush_needed
+        
+        # Messages in one delivery are independent - handle them concurrently
+        await asyncio.gather(*(
+            handle_incoming_message(message, value)
+            for value in values
+            for message in value.get('messages', [])
+        ))
+        
+        if flush_needed:
+            await flush_statuses()
+        
+        return jsonify({'status': 'ok'}), 200
+        
+    except Exception as e:
+        logger.error(f"Webhook error: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+
+async def handle_incoming_message(message: dict, value: dict):
+    """
+    Process a single incoming message
+    
+    Args:
+        message: Message object from webhook
+        value: Value object containing metadata
+    """
+    try:
+        # Extract details
+        from_number = message.get('from')
+        message_type = message.get('type')
+        
+        # Only handle text messages for now
+        if message_type != 'text':
+            logger.info(f"Ignoring non-text message type: {message_type}")
+            return
+        
+        text = message.get('text', {}).get('body', '').strip().lower()
+        
+        logger.info(f"Message from {from_number}: {text}")
+        
+        if not inbound_limiter.allow(from_number):
+            logger.warning(f"Rate limit exceeded for {from_number}, dropping message")
+            return
+        
+        command = command_router.match(text)
+        
+        if command and not reply_coalescer.claim(f"{command}:{from_number}"):
+            logger.info(f"Coalescing repeated {command} request from {from_number}")
+            return
+        
+        # Look up user in Firebase
+        user = await get_firebase().get_user_by_phone(from_number)
+        
+        if not user:
+            if command == 'signup':
+                await get_whatsapp().send_text_message(from_number, SIGNUP_MESSAGE)
+            else:
+                logger.info(f"Ignoring message from unregistered user {from_number}: {text}")
+            return
+        
+        # User exists - handle their request
+        await handle_registered_user(user, text, from_number, command)
+        
+    except Exception as e:
+        logger.error(f"Error handling message: {e}")
+
+
+async def handle_registered_user(user: dict, text: str, phone: str, command: str = None):
+    """
+    Handle message from registered user
+    
+    Args:
+        user: User document from Firebase
+        text: Message text (lowercase)
+        phone: User's phone number
+        command: Command matched by the router, if any
+    """
+    if command == 'insights':
+        await send_user_insights(user, phone)
+    elif command == 'help':
+        await get_whatsapp().send_text_message(phone, format_help_message(user['name']))
+    elif command == 'stop':
+        await handle_unsubscribe(user, phone)
+    elif command == 'signup':
+        await handle_resubscribe(user, phone)
+    else:
+        # Log but don't respond to any other messages
+        logger.info(f"Ignoring non-command message from {user['name']}: {text}")
+
+
+async def send_user_insights(user: dict, phone: str):
+    """
+    Send insights to registered user
+    """
+    wa = get_whatsapp()
+    try:
+        # Get saved insights from Firebase
+        insights_doc = await get_firebase().get_insights(user['id'])
+        
+        if not insights_doc or not insights_doc.get('data'):
+            await wa.send_text_message(phone, format_no_insights_message(user['name']))
+            return
+        
+        # Format and send insights
+        message = format_insight_message(insights_doc['data'], user['name'], user.get('frequency'))
+        await wa.send_text_message(phone, message)
+        logger.success(f"Sent insights to {user['name']} ({phone})")
+        
+    except CircuitOpenError as e:
+        # The apology would fail the same way - don't spend a second call on it
+        logger.warning(f"Not replying to {phone}: {e}")
+    except Exception as e:
+        logger.error(f"Failed to send insights: {e}")
+        await wa.send_text_message(phone, INSIGHTS_ERROR_MESSAGE)
+
+
+async def handle_unsubscribe(user: dict, phone: str):
+    """
+    Handle unsubscribe request
+    """
+    try:
+        await get_firebase().delete_user(user['id'])
+        await get_whatsapp().send_text_message(phone, format_unsubscribe_message(user['name']))
+        logger.info(f"Unsubscribed user: {user['name']} ({phone})")
+    except Exception as e:
+        logger.error(f"Failed to unsubscribe user: {e}")
+
+
+async def handle_resubscribe(user: dict, phone: str):
+    """
+    Handle signup request from an existing (possibly unsubscribed) user
+    """
+    if user.get('active', True):
+        await get_whatsapp().send_text_message(phone, format_help_message(user['name']))
+        return
+    
+    try:
+        await get_firebase().reactivate_user(user['id'])
+        await get_whatsapp().send_text_message(phone, format_resubscribe_message(user['name']))
+        logger.info(f"Resubscribed user: {user['name']} ({phone})")
+    except Exception as e:
+        logger.error(f"Failed to resubscribe user: {e}")
+
+
+if __name__ == '__main__':
+    import os
+    import uvicorn
+    
+    port = int(os.environ.get('PORT', 8080))
+    
+    print("=" * 70)
+    print("WhatsApp Webhook Server (ASGI)")
+    print("=" * 70)
+    print()
+    print(f"Starting server on port {port}...")
+    print()
+    
+    uvicorn.run(app, host='0.0.0.0', port=port)
@@ -3,11 +3,19 @@ WhatsApp weekly_insights Template Support
 Once approved, use this to send your insights!
 """
 from typing import Dict
-import requests
-from loguru import logger
 
-from src.config import settings
-from src.utils import format_phone_number
+from src.template_dispatcher import WeeklyInsightsDispatcher
+
+
+_dispatcher = None
+
+
+def _get_dispatcher() -> WeeklyInsightsDispatcher:
+    """Lazy load the shared dispatcher (payload skeleton and HTTP session)"""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = WeeklyInsightsDispatcher()
+    return _dispatcher
 
 
 def send_weekly_insights_template(
@@ -36,52 +44,9 @@ def send_weekly_insights_template(
     Returns:
         API response dictionary
     """
-    formatted_phone = format_phone_number(to)
-    
-    url = f"{settings.meta_graph_api_url}/{settings.whatsapp_phone_number_id}/messages"
-    headers = {
-        "Authorization": f"Bearer {settings.whatsapp_access_token}",
-        "Content-Type": "application/json"
-    }
-    
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": formatted_phone,
-        "type": "template",
-        "template": {
-            "name": "weekly_insights",
-            "language": {
-                "code": "en"
-            },
-            "components": [
-                {
-                    "type": "body",
-                    "parameters": [
-                        {"type": "text", "text": name},
-                        {"type": "text", "text": str(leads)},
-                        {"type": "text", "text": portal},
-                        {"type": "text", "text": str(offer)},
-                        {"type": "text", "text": str(sale)},
-                        {"type": "text", "text": revenue},
-                        {"type": "text", "text": commission}
-                    ]
-                }
-            ]
-        }
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        result = response.json()
-        logger.success(f"weekly_insights template sent to {formatted_phone}")
-        return result
-        
-    except requests.exceptions.HTTPError as e:
-        logger.error(f"Failed to send template: {e}")
-        logger.error(f"Response: {e.response.text}")
-        raise
+    return _get_dispatcher().send_params(
+        to, [name, str(leads), portal, str(offer), str(sale), revenue, commission]
+    )
 
 
 if __name__ == "__main__":
@@ -1,22 +1,116 @@
 """
 WhatsApp sender using Meta's WhatsApp Business API
 """
+import mimetypes
+import os
+import threading
 import requests
 from typing import Optional, Dict, List
 from loguru import logger
 
+from src.adaptive_concurrency import AdaptiveConcurrencyLimiter
+from src.circuit_breaker import CircuitBreaker
 from src.config import settings
+from src.media_cache import MediaCache, content_digest
+from src.models import OutboundMessage
 from src.utils import format_phone_number
 
 
+def is_graph_outage(error: Exception) -> bool:
+    """
+    Whether an error means the Graph API itself is unhealthy
+    
+    Connection errors, timeouts and 5xx responses count; 4xx responses
+    (bad number, expired window, invalid template) are the request's fault.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500
+    return False
+
+
+# Graph error codes meaning the business number is sending too fast overall
+# (131056, the per-recipient pair rate limit, says nothing about global throughput)
+THROTTLE_ERROR_CODES = {4, 80007, 130429}
+PAIR_RATE_LIMIT_CODE = 131056
+
+
+def graph_error_code(error: Exception) -> Optional[int]:
+    """Extract the Graph API error code from an HTTPError, if any"""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return response.json().get('error', {}).get('code')
+    except ValueError:
+        return None
+
+
+def is_graph_throttle(error: Exception) -> bool:
+    """Whether an error is a global rate-limit response"""
+    if not isinstance(error, requests.exceptions.HTTPError) or error.response is None:
+        return False
+    return error.response.status_code == 429 or graph_error_code(error) in THROTTLE_ERROR_CODES
+
+
+def is_pair_rate_limited(error: Exception) -> bool:
+    """Whether an error says this recipient was messaged too recently"""
+    return isinstance(error, requests.exceptions.HTTPError) and graph_error_code(error) == PAIR_RATE_LIMIT_CODE
+
+
+# One breaker per process for every call to graph.facebook.com
+GRAPH_BREAKER = CircuitBreaker("graph_api", is_failure=is_graph_outage)
+
+# Shared in-flight limit for sends, tuned by throttling and latency feedback
+GRAPH_CONCURRENCY = AdaptiveConcurrencyLimiter(is_throttle=is_graph_throttle)
+
+
+def graph_post(url: str, session=None, **kwargs) -> requests.Response:
+    """
+    POST to the Graph API through the circuit breaker and concurrency limit
+    
+    Blocks while the adaptive concurrency limit is reached.
+    
+    Args:
+        url: Graph API endpoint
+        session: requests.Session to post with (default: a one-off request)
+        **kwargs: Passed to post() (headers, json, data, ...)
+        
+    Returns:
+        Successful response
+        
+    Raises:
+        CircuitOpenError: If the Graph API circuit is open - no request is made
+        requests.exceptions.HTTPError: On an error response
+    """
+    def post() -> requests.Response:
+        with GRAPH_CONCURRENCY.slot():
+            response = (session or requests).post(url, timeout=settings.graph_timeout_seconds, **kwargs)
+            response.raise_for_status()
+            return response
+    
+    return GRAPH_BREAKER.call(post)
+
+
 class WhatsAppSender:
     """Send WhatsApp messages via Meta's Business API"""
     
-    def __init__(self):
-        """Initialize WhatsApp sender with Meta credentials"""
+    def __init__(self, media_cache: Optional[MediaCache] = None):
+        """
+        Initialize WhatsApp sender with Meta credentials
+        
+        Args:
+            media_cache: Cache of uploaded media IDs (default: a MediaCache on
+                         settings.media_cache_path, opened on the first cached upload)
+        """
         self.access_token = settings.whatsapp_access_token
         self.phone_number_id = settings.whatsapp_phone_number_id
         self.base_url = f"{settings.meta_graph_api_url}/{self.phone_number_id}/messages"
+        self.media_url = f"{settings.meta_graph_api_url}/{self.phone_number_id}/media"
+        # Text-only senders never read the cache file or register its exit flush
+        self._media_cache = media_cache
+        self._media_cache_lock = threading.Lock()
         
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
@@ -25,6 +119,38 @@ class WhatsAppSender:
         
         logger.info(f"WhatsApp sender initialized with phone ID: {self.phone_number_id}")
     
+    @property
+    def media_cache(self) -> MediaCache:
+        """Cache of uploaded media IDs, created on first use"""
+        if self._media_cache is None:
+            with self._media_cache_lock:
+                if self._media_cache is None:
+                    self._media_cache = MediaCache()
+        return self._media_cache
+    
+    def _post(self, payload: Dict) -> Dict:
+        """
+        Post a message payload and return the parsed response
+        
+        Raises:
+            CircuitOpenError: If the Graph API circuit is open
+            requests.exceptions.HTTPError: On an error response
+        """
+        return graph_post(self.base_url, headers=self.headers, json=payload).json()
+    
+    def build_text_payload(self, to: str, message: str) -> Dict:
+        """
+        Build the Graph API payload for a text message
+        
+        Args:
+            to: Recipient phone number (will be formatted to E.164)
+            message: Message text to send
+            
+        Returns:
+            Payload dictionary
+        """
+        return OutboundMessage.text(to, message).to_graph()
+    
     def send_text_message(self, to: str, message: str) -> Dict:
         """
         Send a text message via WhatsApp
@@ -36,24 +162,11 @@ class WhatsAppSender:
         Returns:
             API response dictionary
         """
-        formatted_phone = format_phone_number(to)
-        
-        payload = {
-            "messaging_product": "whatsapp",
-            "recipient_type": "individual",
-            "to": formatted_phone,
-            "type": "text",
-            "text": {
-                "preview_url": False,
-                "body": message
-            }
-        }
+        payload = self.build_text_payload(to, message)
+        formatted_phone = payload["to"]
         
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
+            result = self._post(payload)
             logger.success(f"Message sent to {formatted_phone}: {result.get('messages', [{}])[0].get('id', 'unknown')}")
             return result
             
@@ -65,6 +178,132 @@ class WhatsAppSender:
             logger.error(f"Unexpected error sending message: {e}")
             raise
 
+    def send_prebuilt(self, body: bytes) -> Dict:
+        """
+        Post a request body that was rendered and encoded elsewhere
+        
+        Args:
+            body: JSON message payload, e.g. from src.render_pool
+            
+        Returns:
+            API response dictionary
+        """
+        try:
+            return graph_post(self.base_url, headers=self.headers, data=body).json()
+            
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Failed to send prebuilt message: {e}")
+            logger.error(f"Response: {e.response.text}")
+            raise
+    
+    # MEDIA
+    
+    def upload_media(self, content: bytes, mime_type: str, filename: str = "file",
+                     cache: bool = True) -> str:
+        """
+        Upload media once and reuse its ID while it is valid
+        
+        Args:
+            content: File bytes
+            mime_type: MIME type, e.g. 'image/png' or 'application/pdf'
+            filename: Name sent with the upload
+            cache: Look up and record the upload in the media cache. Pass False
+                   for one-off assets (per-user charts) that would only grow it.
+            
+        Returns:
+            Media ID for use in image/document messages and template headers
+        """
+        if cache:
+            digest = content_digest(content)
+            media_id = self.media_cache.get(digest)
+            if media_id:
+                logger.debug(f"Reusing media {media_id} for {filename}")
+                return media_id
+        
+        try:
+            response = graph_post(
+                self.media_url,
+                headers={"Authorization": f"Bearer {self.access_token}"},
+                data={"messaging_product": "whatsapp", "type": mime_type},
+                files={"file": (filename, content, mime_type)}
+            )
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Failed to upload {filename}: {e}")
+            logger.error(f"Response: {e.response.text}")
+            raise
+        
+        media_id = response.json()['id']
+        if cache:
+            self.media_cache.put(digest, media_id, mime_type)
+        logger.info(f"Uploaded {filename} ({len(content):,} bytes) as media {media_id}")
+        return media_id
+    
+    def upload_media_file(self, path: str, mime_type: Optional[str] = None) -> str:
+        """
+        Upload a file from disk (see upload_media)
+        
+        Args:
+            path: File path
+            mime_type: MIME type (default: guessed from the extension)
+            
+        Returns:
+            Media ID
+        """
+        mime_type = mime_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        with open(path, 'rb') as f:
+            return self.upload_media(f.read(), mime_type, os.path.basename(path))
+    
+    def send_image_message(self, to: str, media_id: str, caption: Optional[str] = None) -> Dict:
+        """
+        Send an uploaded image
+        
+        Args:
+            to: Recipient phone number
+            media_id: ID from upload_media()
+            caption: Optional caption
+            
+        Returns:
+            API response dictionary
+        """
+        image = {"id": media_id}
+        if caption:
+            image["caption"] = caption
+        return self._send_media(to, "image", image)
+    
+    def send_document_message(self, to: str, media_id: str, filename: str,
+                              caption: Optional[str] = None) -> Dict:
+        """
+        Send an uploaded document (e.g. a PDF report)
+        
+        Args:
+            to: Recipient phone number
+            media_id: ID from upload_media()
+            filename: File name shown to the recipient
+            caption: Optional caption
+            
+        Returns:
+            API response dictionary
+        """
+        document = {"id": media_id, "filename": filename}
+        if caption:
+            document["caption"] = caption
+        return self._send_media(to, "document", document)
+    
+    def _send_media(self, to: str, media_type: str, media: Dict) -> Dict:
+        """Send a media message by ID"""
+        message = OutboundMessage.media(to, media_type, media)
+        formatted_phone = message.to
+        
+        try:
+            result = self._post(message.to_graph())
+            logger.success(f"{media_type.capitalize()} sent to {formatted_phone}")
+            return result
+            
+        except requests.exceptions.HTTPError as e:
+            logger.error(f"Failed to send {media_type}: {e}")
+            logger.error(f"Response: {e.response.text}")
+            raise
+    
     def send_interactive_button_message(self, to: str, body_text: str, 
                                        buttons: List[Dict]) -> Dict:
         """
@@ -107,10 +346,7 @@ class WhatsAppSender:
         }
         
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
+            result = self._post(payload)
             logger.success(f"Interactive message sent to {formatted_phone}")
             return result
             
@@ -152,10 +388,7 @@ class WhatsAppSender:
         }
         
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=payload)
-            response.raise_for_status()
-            
-            result = response.json()
+            result = self._post(payload)
             logger.success(f"List message sent to {formatted_phone}")
             return result
             
@@ -174,7 +407,7 @@ class WhatsAppSender:
         try:
             # Try to get phone number info
             url = f"{settings.meta_graph_api_url}/{self.phone_number_id}"
-            response = requests.get(url, headers=self.headers)
+            response = requests.get(url, headers=self.headers, timeout=settings.graph_timeout_seconds)
             response.raise_for_status()
             
             info = response.json()
@@ -6,14 +6,25 @@ from typing import Optional, Dict, List
 from loguru import logger
 
 from src.config import settings
+from src.template_registry import TemplateRegistry
 from src.utils import format_phone_number
+from src.whatsapp_sender import WhatsAppSender, graph_post
 
 
 class WhatsAppTemplateManager:
     """Send WhatsApp template messages (no 24-hour window needed!)"""
     
-    def __init__(self):
-        """Initialize template manager with Meta credentials"""
+    def __init__(self, registry: Optional[TemplateRegistry] = None,
+                 sender: Optional[WhatsAppSender] = None):
+        """
+        Initialize template manager with Meta credentials
+        
+        Args:
+            registry: Template registry used to validate sends locally (optional)
+            sender: Sender whose media upload (and media ID cache) is used for headers
+        """
+        self.registry = registry
+        self.sender = sender or WhatsAppSender()
         self.access_token = settings.whatsapp_access_token
         self.phone_number_id = settings.whatsapp_phone_number_id
         self.base_url = f"{settings.meta_graph_api_url}/{self.phone_number_id}/messages"
@@ -45,6 +56,9 @@ class WhatsAppTemplateManager:
         """
         formatted_phone = format_phone_number(to)
         
+        if self.registry:
+            self.registry.validate("insights_dashboard", "en", body_params=[name])
+        
         payload = {
             "messaging_product": "whatsapp",
             "to": formatted_phone,
@@ -80,8 +94,7 @@ class WhatsAppTemplateManager:
         }
         
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=payload)
-            response.raise_for_status()
+            response = graph_post(self.base_url, headers=self.headers, json=payload)
             
             result = response.json()
             logger.success(f"Template message sent to {formatted_phone}")
@@ -95,7 +108,8 @@ class WhatsAppTemplateManager:
     def send_generic_template(self, to: str, template_name: str, 
                              language_code: str = "en",
                              body_params: Optional[List[str]] = None,
-                             header_params: Optional[List[str]] = None) -> Dict:
+                             header_params: Optional[List[str]] = None,
+                             header_media: Optional[Dict] = None) -> Dict:
         """
         Send any template message (generic version)
         
@@ -105,16 +119,36 @@ class WhatsAppTemplateManager:
             language_code: Template language (en, es, etc.)
             body_params: List of parameters for body {{1}}, {{2}}, etc.
             header_params: List of parameters for header
+            header_media: Media header instead of text, e.g. {"type": "image", "id": media_id}
+                          (see upload_header_media)
             
         Returns:
             API response dictionary
+            
+        Raises:
+            TemplateValidationError: If a registry is set and the send would be rejected
         """
         formatted_phone = format_phone_number(to)
         
+        # Fail locally instead of paying for a Graph round-trip and a 400
+        if self.registry:
+            self.registry.validate(template_name, language_code, body_params,
+                                   [header_media] if header_media else header_params)
+        
         components = []
         
+        # Media header: referenced by uploaded ID so Meta never refetches a link
+        if header_media:
+            media_type = header_media["type"]
+            components.append({
+                "type": "header",
+                "parameters": [
+                    {"type": media_type, media_type: {"id": header_media["id"]}}
+                ]
+            })
+        
         # Add header parameters if provided
-        if header_params:
+        elif header_params:
             components.append({
                 "type": "header",
                 "parameters": [
@@ -145,8 +179,7 @@ class WhatsAppTemplateManager:
         }
         
         try:
-            response = requests.post(self.base_url, headers=self.headers, json=payload)
-            response.raise_for_status()
+            response = graph_post(self.base_url, headers=self.headers, json=payload)
             
             result = response.json()
             logger.success(f"Template '{template_name}' sent to {formatted_phone}")
@@ -156,6 +189,21 @@ class WhatsAppTemplateManager:
             logger.error(f"Failed to send template: {e}")
             logger.error(f"Response: {e.response.text}")
             raise
+    
+    def upload_header_media(self, content: bytes, mime_type: str, filename: str = "file") -> Dict:
+        """
+        Upload (or reuse) a header image or document
+        
+        Args:
+            content: File bytes
+            mime_type: MIME type, e.g. 'image/png' or 'application/pdf'
+            filename: Name sent with the upload
+            
+        Returns:
+            header_media dictionary for send_generic_template
+        """
+        media_type = "image" if mime_type.startswith("image/") else "document"
+        return {"type": media_type, "id": self.sender.upload_media(content, mime_type, filename)}
 
 
 if __name__ == "__main__":
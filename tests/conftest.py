@@ -0,0 +1,21 @@
+"""
+Shared pytest setup: placeholder credentials and an isolated working directory
+"""
+import os
+
+import pytest
+
+# Settings are loaded at import time and every credential is required
+for _name in ("WHATSAPP_ACCESS_TOKEN", "WHATSAPP_PHONE_NUMBER_ID", "WHATSAPP_BUSINESS_ACCOUNT_ID",
+              "WEBHOOK_VERIFY_TOKEN", "FIREBASE_PROJECT_ID", "FIREBASE_PRIVATE_KEY",
+              "FIREBASE_CLIENT_EMAIL", "DATABASE_HOST", "DATABASE_NAME", "DATABASE_USER",
+              "DATABASE_PASSWORD"):
+    os.environ.setdefault(_name, "test")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+
+@pytest.fixture(autouse=True)
+def isolated_cwd(tmp_path, monkeypatch):
+    """Keep data/ caches and logs/ written by the code under test out of the repo"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,118 @@
+"""
+AIMD concurrency limit: increase, decrease and slot bookkeeping
+"""
+import threading
+
+import pytest
+
+from src.adaptive_concurrency import AdaptiveConcurrencyLimiter
+
+
+class Throttled(Exception):
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr("src.adaptive_concurrency.time.monotonic", lambda: now[0])
+    return now
+
+
+def make_limiter(initial=4):
+    return AdaptiveConcurrencyLimiter(min_limit=1, max_limit=8, initial_limit=initial,
+                                      target_latency=1.0,
+                                      is_throttle=lambda e: isinstance(e, Throttled))
+
+
+def test_limit_rises_by_one_per_round_of_healthy_responses():
+    limiter = make_limiter(initial=4)
+    
+    # +1/limit per response: a round of ~limit responses adds one
+    for _ in range(4):
+        limiter.on_success(0.1)
+    assert limiter.limit == 4
+    
+    limiter.on_success(0.1)
+    assert limiter.limit == 5
+
+
+def test_limit_never_exceeds_the_maximum():
+    limiter = make_limiter(initial=8)
+    
+    for _ in range(50):
+        limiter.on_success(0.1)
+    
+    assert limiter.limit == 8
+
+
+def test_throttle_halves_the_limit_down_to_the_minimum(clock):
+    limiter = make_limiter(initial=8)
+    
+    limiter.on_throttle()
+    assert limiter.limit == 4
+    
+    for _ in range(3):
+        clock[0] += 1.0
+        limiter.on_throttle()
+    assert limiter.limit == 1
+
+
+def test_throttles_within_the_cooldown_cut_only_once(clock):
+    limiter = make_limiter(initial=8)
+    
+    limiter.on_throttle()
+    clock[0] += 0.5
+    limiter.on_throttle()
+    
+    assert limiter.limit == 4
+
+
+def test_slow_responses_trim_the_limit(clock):
+    limiter = make_limiter(initial=8)
+    
+    limiter.on_success(2.0)
+    
+    assert limiter.limit == 7
+
+
+def test_slot_releases_and_cuts_on_a_throttle_error(clock):
+    limiter = make_limiter(initial=4)
+    
+    with pytest.raises(Throttled):
+        with limiter.slot():
+            assert limiter.in_flight == 1
+            raise Throttled()
+    
+    assert limiter.in_flight == 0
+    assert limiter.limit == 2
+
+
+def test_slot_releases_on_other_errors_without_cutting(clock):
+    limiter = make_limiter(initial=4)
+    
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError("bad phone number")
+    
+    assert limiter.in_flight == 0
+    assert limiter.limit == 4
+
+
+def test_acquire_blocks_at_the_limit_until_a_slot_is_released():
+    limiter = make_limiter(initial=1)
+    limiter.acquire()
+    acquired = threading.Event()
+    
+    def worker():
+        limiter.acquire()
+        acquired.set()
+    
+    thread = threading.Thread(target=worker)
+    thread.start()
+    assert not acquired.wait(0.1)
+    
+    limiter.release()
+    assert acquired.wait(1)
+    thread.join()
+    assert limiter.in_flight == 1
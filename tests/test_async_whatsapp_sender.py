@@ -0,0 +1,84 @@
+"""
+Async Graph API sends behind the circuit breaker
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from src import async_whatsapp_sender, webhook_server_async
+from src.async_whatsapp_sender import AsyncWhatsAppSender, is_async_graph_outage
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.utils import INSIGHTS_ERROR_MESSAGE
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """Fresh breaker that opens after two outage errors"""
+    breaker = CircuitBreaker("graph_api", failure_threshold=2, recovery_timeout=60,
+                             is_failure=is_async_graph_outage)
+    monkeypatch.setattr(async_whatsapp_sender, "ASYNC_GRAPH_BREAKER", breaker)
+    return breaker
+
+
+def sender_returning(status: int, requests_made: list) -> AsyncWhatsAppSender:
+    def handler(request):
+        requests_made.append(request)
+        return httpx.Response(status, json={"messages": [{"id": "wamid.1"}]})
+    
+    sender = AsyncWhatsAppSender()
+    sender.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return sender
+
+
+def test_outage_opens_the_circuit(breaker):
+    requests_made = []
+    sender = sender_returning(503, requests_made)
+    
+    async def send_three():
+        for _ in range(2):
+            with pytest.raises(httpx.HTTPStatusError):
+                await sender.send_text_message("27821234567", "hi")
+        with pytest.raises(CircuitOpenError):
+            await sender.send_text_message("27821234567", "hi")
+        await sender.close()
+    
+    asyncio.run(send_three())
+    assert len(requests_made) == 2
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_client_errors_leave_the_circuit_closed(breaker):
+    requests_made = []
+    sender = sender_returning(400, requests_made)
+    
+    async def send_three():
+        for _ in range(3):
+            with pytest.raises(httpx.HTTPStatusError):
+                await sender.send_text_message("27821234567", "hi")
+        await sender.close()
+    
+    asyncio.run(send_three())
+    assert len(requests_made) == 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_no_apology_while_the_circuit_is_open(monkeypatch):
+    sent = []
+    
+    class Firebase:
+        async def get_insights(self, user_id):
+            return {"data": {"leads": 3}}
+    
+    class WhatsApp:
+        async def send_text_message(self, phone, message):
+            sent.append(message)
+            raise CircuitOpenError("graph_api", 30)
+    
+    monkeypatch.setattr(webhook_server_async, "get_firebase", Firebase)
+    monkeypatch.setattr(webhook_server_async, "get_whatsapp", WhatsApp)
+    
+    asyncio.run(webhook_server_async.send_user_insights({"id": "u1", "name": "Agent"}, "27821234567"))
+    
+    assert len(sent) == 1
+    assert INSIGHTS_ERROR_MESSAGE not in sent
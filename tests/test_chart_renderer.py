@@ -0,0 +1,28 @@
+"""
+Chart rendering and the on-disk render cache
+"""
+import os
+import time
+
+from src.chart_renderer import ChartRenderer, chart_inputs, render_chart
+
+
+def test_render_chart_is_png():
+    png = render_chart(chart_inputs({"active_listings": 42, "deltas": {"active_listings": {"previous": 40}}}))
+    
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
+
+
+def test_old_charts_are_pruned(tmp_path):
+    old = tmp_path / "old.png"
+    fresh = tmp_path / "fresh.png"
+    old.write_bytes(b"old")
+    fresh.write_bytes(b"fresh")
+    month_ago = time.time() - 30 * 86400
+    os.utime(old, (month_ago, month_ago))
+    
+    renderer = ChartRenderer(cache_dir=str(tmp_path), processes=1, max_age_days=14)
+    renderer.close()
+    
+    assert not old.exists()
+    assert fresh.exists()
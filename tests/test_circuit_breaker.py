@@ -0,0 +1,149 @@
+"""
+Circuit breaker state transitions and the guarded decorator
+"""
+import pytest
+
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError, guarded
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000.0
+    
+    def __call__(self):
+        return self.now
+
+
+class Unhealthy(Exception):
+    pass
+
+
+class ClientError(Exception):
+    pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("src.circuit_breaker.time.monotonic", clock)
+    return clock
+
+
+def make_breaker():
+    return CircuitBreaker("graph", failure_threshold=3, recovery_timeout=30,
+                          is_failure=lambda e: isinstance(e, Unhealthy))
+
+
+def fail(breaker, times=1):
+    for _ in range(times):
+        with pytest.raises(Unhealthy):
+            breaker.call(_raise, Unhealthy())
+
+
+def _raise(error):
+    raise error
+
+
+def test_closed_opens_after_consecutive_failures(clock):
+    breaker = make_breaker()
+    
+    fail(breaker, 2)
+    assert breaker.state == CircuitBreaker.CLOSED
+    fail(breaker)
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.call(lambda: "never called")
+    assert error.value.retry_after == pytest.approx(30)
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = make_breaker()
+    
+    fail(breaker, 2)
+    assert breaker.call(lambda: "ok") == "ok"
+    fail(breaker, 2)
+    
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_open_moves_to_half_open_after_the_timeout_and_closes_on_success(clock):
+    breaker = make_breaker()
+    fail(breaker, 3)
+    
+    clock.now += 29
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after == pytest.approx(1)
+    
+    clock.now += 1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_probe_reopens_for_another_timeout(clock):
+    breaker = make_breaker()
+    fail(breaker, 3)
+    clock.now += 30
+    
+    fail(breaker)
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.retry_after == pytest.approx(30)
+
+
+def test_half_open_lets_only_one_probe_through(clock):
+    breaker = make_breaker()
+    fail(breaker, 3)
+    clock.now += 30
+    
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_do_not_trip_and_close_a_half_open_circuit(clock):
+    breaker = make_breaker()
+    for _ in range(5):
+        with pytest.raises(ClientError):
+            breaker.call(_raise, ClientError())
+    assert breaker.state == CircuitBreaker.CLOSED
+    
+    fail(breaker, 3)
+    clock.now += 30
+    with pytest.raises(ClientError):
+        breaker.call(_raise, ClientError())
+    
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_guarded_routes_calls_through_the_breaker(clock):
+    breaker = make_breaker()
+    calls = []
+    
+    @guarded(breaker)
+    def fetch(value, fail_with=None):
+        """Fetch something"""
+        calls.append(value)
+        if fail_with:
+            raise fail_with
+        return value * 2
+    
+    assert fetch.__name__ == "fetch"
+    assert fetch.__doc__ == "Fetch something"
+    assert fetch(2) == 4
+    
+    for _ in range(3):
+        with pytest.raises(Unhealthy):
+            fetch(1, fail_with=Unhealthy())
+    with pytest.raises(CircuitOpenError):
+        fetch(3)
+    
+    assert calls == [2, 1, 1, 1]
+    
+    clock.now += 30
+    assert fetch(5) == 10
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,119 @@
+"""
+Columnar cohort: selection, sharding, deltas and aggregates
+"""
+import math
+
+import numpy as np
+
+from src.cohort import Cohort
+from src.insight_deltas import compute_deltas
+from src.models import User
+from src.sharding import filter_shard
+
+
+USERS = [
+    {"id": "u1", "phone": "0821111111", "name": "Ann", "timezone": "Africa/Johannesburg"},
+    {"id": "u2", "phone": "0822222222", "name": "Bob"},
+    {"id": "u3", "phone": "0823333333", "name": "Cat", "timezone": "Europe/London"},
+    {"id": "u4", "phone": "0824444444", "name": "Dan"},
+]
+
+INSIGHTS = [
+    {"leads": 10, "sales": 2, "revenue": 5_000_000, "avg_price": "R1,250,000"},
+    {"leads": 0, "sales": 0, "revenue": 0},
+    {"leads": 7, "sales": "N/A"},
+    None,
+]
+
+PREVIOUS = {
+    "u1": {"leads": 8, "sales": 2, "revenue": 4_000_000, "avg_price": "R1,000,000"},
+    "u2": {"leads": 0, "sales": 1},
+    "u3": {"leads": 7},
+}
+
+
+def make_cohort():
+    cohort = Cohort(USERS)
+    cohort.set_metrics(INSIGHTS)
+    cohort.set_previous(PREVIOUS)
+    return cohort
+
+
+def test_identity_columns_and_missing_metrics():
+    cohort = make_cohort()
+    
+    assert cohort.ids.tolist() == ["u1", "u2", "u3", "u4"]
+    assert cohort.timezones.tolist() == ["Africa/Johannesburg", "", "Europe/London", ""]
+    assert cohort.metrics["leads"][:3].tolist() == [10, 0, 7]
+    assert np.isnan(cohort.metrics["sales"][2])  # 'N/A' is not a number
+    assert np.isnan(cohort.metrics["leads"][3])  # no insights at all
+
+
+def test_take_keeps_rows_and_columns_aligned():
+    cohort = make_cohort()
+    
+    subset = cohort.take(np.array([2, 0]))
+    
+    assert [user["id"] for user in subset] == ["u3", "u1"]
+    assert subset.names.tolist() == ["Cat", "Ann"]
+    assert subset.metrics["leads"].tolist() == [7, 10]
+    assert subset.previous["leads"].tolist() == [7, 8]
+
+
+def test_filter_by_metric_mask():
+    cohort = make_cohort()
+    
+    with np.errstate(invalid="ignore"):
+        selling = cohort.filter(cohort.metrics["sales"] > 0)
+    
+    assert selling.ids.tolist() == ["u1"]
+    assert len(cohort.filter(np.zeros(len(cohort), dtype=bool))) == 0
+
+
+def test_sort_by_puts_missing_values_last():
+    cohort = make_cohort()
+    
+    assert cohort.sort_by("leads", descending=True).ids.tolist() == ["u1", "u3", "u2", "u4"]
+    assert cohort.sort_by("leads").ids.tolist() == ["u2", "u3", "u1", "u4"]
+    assert cohort.sort_by("names", descending=True).names.tolist() == ["Dan", "Cat", "Bob", "Ann"]
+
+
+def test_shard_matches_filter_shard():
+    users = [User.from_dict({"id": f"user-{i}", "phone": "", "name": ""}) for i in range(200)]
+    cohort = Cohort(users)
+    
+    shards = [cohort.shard(index, 3) for index in range(3)]
+    
+    for index, shard in enumerate(shards):
+        assert shard.rows == filter_shard(users, index, 3)
+    assert sum(len(shard) for shard in shards) == len(users)
+
+
+def test_delta_rows_match_compute_deltas():
+    cohort = make_cohort()
+    
+    rows = cohort.delta_rows()
+    
+    for i, user in enumerate(USERS):
+        expected = compute_deltas(INSIGHTS[i] or {}, PREVIOUS.get(user["id"]))
+        assert rows[i] == (expected or {})
+    assert rows[0]["leads"] == {"previous": 8, "change": 2, "percent": 25.0}
+    assert rows[1]["sales"] == {"previous": 1, "change": -1, "percent": -100.0}
+    assert rows[1]["leads"]["percent"] is None  # previous value was zero
+    assert rows[3] == {}
+    assert type(rows[0]["revenue"]["change"]) is int
+
+
+def test_deltas_columns_mark_rows_with_both_values():
+    deltas = make_cohort().deltas()
+    
+    assert deltas["leads"]["valid"].tolist() == [True, True, True, False]
+    assert deltas["sales"]["valid"].tolist() == [True, True, False, False]
+
+
+def test_aggregate_ignores_missing_values():
+    stats = make_cohort().aggregate()
+    
+    assert stats["leads"] == {"count": 3, "total": 17.0, "mean": 17 / 3, "median": 7.0}
+    assert stats["commission"] == {"count": 0, "total": 0.0, "mean": 0.0, "median": 0.0}
+    assert math.isclose(stats["revenue"]["mean"], 2_500_000)
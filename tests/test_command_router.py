@@ -0,0 +1,53 @@
+"""
+Inbound message classification
+"""
+import pytest
+
+from src.command_router import CommandRouter, build_command_router
+
+router = build_command_router()
+
+
+@pytest.mark.parametrize("text", ["stop", "STOP", "  Stop  ", "unsubscribe", "stop!", "Unsubscribe."])
+def test_stop_when_the_message_is_just_the_keyword(text):
+    assert router.match(text) == "stop"
+
+
+@pytest.mark.parametrize("text", [
+    "please don't stop the reports",
+    "stop sending me the daily one, weekly is fine",
+    "can I unsubscribe later?",
+    "nonstop",
+])
+def test_stop_keyword_inside_a_sentence_is_not_a_command(text):
+    assert router.match(text) != "stop"
+
+
+@pytest.mark.parametrize("text, command", [
+    ("send my insights", "insights"),
+    ("weekly report please", "insights"),
+    ("help", "help"),
+    ("show me the menu", "help"),
+    ("sign up", "signup"),
+    ("I want to join", "signup"),
+    ("hello there", None),
+])
+def test_commands(text, command):
+    assert router.match(text) == command
+
+
+def test_unsubscribe_is_not_read_as_subscribe():
+    assert router.match("unsubscribe") == "stop"
+    assert router.match("please unsubscribe me") is None
+
+
+def test_earliest_keyword_wins():
+    assert router.match("help me with my report") == "help"
+
+
+def test_prefix_keywords():
+    custom = CommandRouter().register("insights", ["insight"], whole_word=False)
+    assert custom.match("insights?") == "insights"
+    
+    words = CommandRouter().register("help", ["help"])
+    assert words.match("helpful") is None
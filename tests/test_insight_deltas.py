@@ -0,0 +1,51 @@
+"""
+Deltas against the previous report
+"""
+from datetime import datetime, timedelta, timezone
+
+from src.firebase_manager import FirebaseManager
+from src.insight_deltas import compute_deltas, numeric_value
+from src.utils import format_insight_message
+
+
+def test_generator_display_strings_are_numeric():
+    assert numeric_value("R1,250,000") == 1250000
+    assert numeric_value("R450K") == 450000
+    assert numeric_value("R8mil") == 8000000
+    assert numeric_value("21 days") == 21
+    assert numeric_value("N/A") is None
+    assert numeric_value("Property24") is None
+
+
+def test_price_and_velocity_get_deltas():
+    deltas = compute_deltas(
+        {"active_listings": 12, "avg_price": "R1,300,000", "sales_velocity": "18 days"},
+        {"active_listings": 10, "avg_price": "R1,250,000", "sales_velocity": "21 days"},
+    )
+    
+    assert deltas["avg_price"]["change"] == 50000
+    assert deltas["sales_velocity"]["change"] == -3
+    assert deltas["active_listings"]["change"] == 2
+
+
+def test_only_last_period_snapshot_is_compared():
+    week = timedelta(weeks=1)
+    now = datetime.now(timezone.utc)
+    
+    assert FirebaseManager._from_previous_period(now - timedelta(days=7), week)
+    # A skipped week, or a re-run earlier today, is not "last week"
+    assert not FirebaseManager._from_previous_period(now - timedelta(days=14), week)
+    assert not FirebaseManager._from_previous_period(now - timedelta(hours=2), week)
+    assert not FirebaseManager._from_previous_period(None, week)
+    # Daily users compare with yesterday
+    assert FirebaseManager._from_previous_period(datetime.now() - timedelta(days=1), timedelta(days=1))
+
+
+def test_message_names_the_users_period():
+    insights = {"leads": 5, "deltas": {"leads": {"previous": 4, "change": 1, "percent": 25.0}}}
+    
+    message = format_insight_message(insights, "Agent", "daily")
+    
+    assert "Your Daily Property Report" in message
+    assert "since your previous daily report" in message
+    assert "▲ +1, +25.0%" in message
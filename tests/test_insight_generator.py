@@ -0,0 +1,84 @@
+"""
+Server-side cursor stream of cohort insights
+"""
+from decimal import Decimal
+
+from src.insight_generator import InsightGenerator
+from src.template_dispatcher import WeeklyInsightsDispatcher
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.itersize = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def execute(self, query, params):
+        pass
+    
+    def __iter__(self):
+        return iter(self.rows)
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.ended = []
+    
+    def cursor(self, name=None):
+        return FakeCursor(self.rows)
+    
+    def commit(self):
+        self.ended.append("commit")
+    
+    def rollback(self):
+        self.ended.append("rollback")
+
+
+def generator_with(rows) -> InsightGenerator:
+    generator = InsightGenerator(connect=False)
+    generator.connection = FakeConnection(rows)
+    return generator
+
+
+def test_complete_stream_commits():
+    generator = generator_with([("crm-1", 3, 1_000_000.0, 20.0, 2, 1, 0, 0, 0, None, None, 0)])
+    
+    results = dict(generator.stream_cohort_insights(["crm-1", "crm-2"]))
+    
+    assert results["crm-1"]["active_listings"] == 3
+    assert results["crm-2"]["active_listings"] == 0
+    assert generator.connection.ended == ["commit"]
+
+
+def test_consumer_stopping_early_rolls_back():
+    generator = generator_with([("crm-1", 3, None, None, 0, 0, 0, 0, 0, None, None, 0),
+                                ("crm-2", 1, None, None, 0, 0, 0, 0, 0, None, None, 0)])
+    
+    stream = generator.stream_cohort_insights(["crm-1", "crm-2"])
+    next(stream)
+    stream.close()
+    
+    assert generator.connection.ended == ["rollback"]
+
+
+def test_streamed_insights_fill_the_weekly_template():
+    row = ("crm-1", 3, Decimal("1250000"), Decimal("21"), 2, 1,
+           Decimal("5600000.00"), Decimal("168000.00"), Decimal("40"), "P24", 24, 5)
+    generator = generator_with([row])
+    
+    insights = dict(generator.stream_cohort_insights(["crm-1", "crm-2"]))
+    
+    assert set(InsightGenerator.METRICS) <= set(insights["crm-1"])
+    assert WeeklyInsightsDispatcher.template_params("Thandi", insights["crm-1"]) == [
+        "Thandi", "40", "P24 - 60%", "5", "2", "R5,600,000", "R168,000"
+    ]
+    # A user with no activity gets true zeros, not a refused template
+    assert WeeklyInsightsDispatcher.template_params("Sipho", insights["crm-2"]) == [
+        "Sipho", "0", "N/A", "0", "0", "R0", "R0"
+    ]
@@ -0,0 +1,131 @@
+"""
+Insights history: per-period keys and the merge/read round-trip
+"""
+from datetime import datetime
+
+import pytest
+
+from src import firebase_manager
+from src.firebase_manager import FirebaseManager
+
+
+def deep_merge(target, data):
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            deep_merge(target[key], value)
+        else:
+            target[key] = value
+
+
+class FakeRef:
+    def __init__(self, collection, doc_id):
+        self.collection = collection
+        self.id = doc_id
+
+
+class FakeSnapshot:
+    def __init__(self, data):
+        self.exists = data is not None
+        self._data = data
+    
+    def to_dict(self):
+        return self._data
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+    
+    def document(self, doc_id):
+        return FakeRef(self, doc_id)
+
+
+class FakeBatch:
+    def __init__(self):
+        self.writes = []
+    
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref, data, merge))
+    
+    def commit(self):
+        for ref, data, merge in self.writes:
+            docs = ref.collection.docs
+            if merge and ref.id in docs:
+                deep_merge(docs[ref.id], data)
+            else:
+                docs[ref.id] = data
+
+
+class FakeDb:
+    def batch(self):
+        return FakeBatch()
+    
+    def get_all(self, refs):
+        return [FakeSnapshot(ref.collection.docs.get(ref.id)) for ref in refs]
+
+
+@pytest.fixture
+def manager():
+    manager = FirebaseManager.__new__(FirebaseManager)
+    manager.db = FakeDb()
+    manager.insights_collection = FakeCollection()
+    manager.history_collection = FakeCollection()
+    return manager
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Set the reporting-timezone 'now' seen by save/read"""
+    current = {}
+    monkeypatch.setattr(firebase_manager, "get_current_time_in_timezone", lambda tz: current["now"])
+    
+    def set_now(*args):
+        current["now"] = datetime(*args)
+    return set_now
+
+
+def test_daily_reports_in_one_week_are_kept_separately(manager, clock):
+    for day, leads in ((19, 3), (20, 5), (21, 8)):
+        clock(2026, 10, day, 9)
+        manager.save_insights("u1", {"leads": str(leads)}, "daily")
+    
+    history = manager.get_insights_history("u1", frequency="daily")
+    
+    assert history["periods"] == ["2026-10-19", "2026-10-20", "2026-10-21"]
+    assert history["leads"] == [3, 5, 8]
+
+
+def test_report_repeated_in_the_same_period_replaces_the_first(manager, clock):
+    clock(2026, 10, 19, 9)
+    manager.save_insights("u1", {"leads": "3"}, "weekly")
+    clock(2026, 10, 22, 9)
+    manager.save_insights("u1", {"leads": "4"}, "weekly")
+    
+    history = manager.get_insights_history("u1")
+    
+    assert history["periods"] == ["2026-W43"]
+    assert history["leads"] == [4]
+
+
+def test_monthly_reports_read_back_across_months(manager, clock):
+    for month, sales in ((8, 1), (9, 2), (10, 3)):
+        clock(2026, month, 1, 9)
+        manager.save_insights("u1", {"sales": str(sales)}, "monthly")
+    
+    history = manager.get_insights_history("u1", months=3, frequency="monthly")
+    
+    assert history["periods"] == ["2026-08", "2026-09", "2026-10"]
+    assert history["sales"] == [1, 2, 3]
+    assert history["leads"] == [None, None, None]
+
+
+def test_legacy_week_maps_still_read_and_other_frequencies_are_filtered(manager, clock):
+    manager.history_collection.docs["u1_2026-10"] = {
+        "user_id": "u1", "month": "2026-10", "weeks": {"2026-W41": {"leads": 2}}
+    }
+    clock(2026, 10, 19, 9)
+    manager.save_insights("u1", {"leads": "6"}, "weekly")
+    manager.save_insights("u1", {"leads": "7"}, "daily")
+    
+    assert manager.get_insights_history("u1")["leads"] == [2, 6]
+    assert manager.get_insights_history("u1", frequency="daily")["periods"] == ["2026-10-19"]
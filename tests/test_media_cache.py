@@ -0,0 +1,44 @@
+"""
+Media ID cache shared between processes
+"""
+from src.media_cache import MediaCache
+
+
+def test_saves_merge_instead_of_overwriting(tmp_path):
+    path = str(tmp_path / "media.json")
+    first = MediaCache(path=path)
+    second = MediaCache(path=path)
+    
+    first.put("a", "media-a", "image/png")
+    second.put("b", "media-b", "image/png")
+    first.flush()
+    second.flush()
+    
+    reloaded = MediaCache(path=path)
+    assert reloaded.get("a") == "media-a"
+    assert reloaded.get("b") == "media-b"
+
+
+def test_miss_picks_up_another_process_upload(tmp_path):
+    path = str(tmp_path / "media.json")
+    reader = MediaCache(path=path)
+    writer = MediaCache(path=path)
+    
+    assert reader.get("a") is None
+    writer.put("a", "media-a", "image/png")
+    writer.flush()
+    
+    assert reader.get("a") == "media-a"
+
+
+def test_puts_are_batched(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.media_cache.settings.media_cache_save_interval_seconds", 3600)
+    path = tmp_path / "media.json"
+    cache = MediaCache(path=str(path))
+    
+    for i in range(10):
+        cache.put(str(i), f"media-{i}", "image/png")
+    assert not path.exists()
+    
+    cache.flush()
+    assert MediaCache(path=str(path)).get("9") == "media-9"
@@ -0,0 +1,116 @@
+"""
+Slotted models: dict-compatible access and Graph payload building
+"""
+from datetime import datetime
+
+import orjson
+import pytest
+
+from src.models import Insights, OutboundMessage, User
+from src.utils import format_phone_number
+
+
+USER_DOC = {
+    "phone": "0821234567", "name": "Thandi", "frequency": "daily", "active": True,
+    "timezone": "Africa/Johannesburg", "user_id": "crm-7",
+    "last_sent": datetime(2026, 10, 18, 8), "created_at": datetime(2026, 1, 1),
+}
+
+
+# Payload builders as they were before OutboundMessage
+def old_text_payload(to, message):
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": format_phone_number(to),
+        "type": "text",
+        "text": {
+            "preview_url": False,
+            "body": message
+        }
+    }
+
+
+def old_media_payload(to, media_type, media):
+    return {
+        "messaging_product": "whatsapp",
+        "recipient_type": "individual",
+        "to": format_phone_number(to),
+        "type": media_type,
+        media_type: media
+    }
+
+
+def test_user_reads_like_its_dict():
+    user = User.from_firestore("doc-1", USER_DOC)
+    as_dict = user.to_dict()
+    
+    for key in ("id", "phone", "name", "frequency", "timezone", "user_id", "last_sent"):
+        assert user[key] == as_dict[key]
+        assert user.get(key) == as_dict.get(key)
+        assert key in user
+    assert "created_at" not in as_dict
+
+
+def test_none_fields_count_as_missing():
+    user = User.from_firestore("doc-1", {"phone": "0821234567", "name": "Thandi"})
+    
+    assert "last_run_id" not in user
+    assert user.get("last_run_id") is None
+    assert user.get("last_run_id", "never") == "never"
+    assert user.get("timezone", "Africa/Johannesburg") == "Africa/Johannesburg"
+    with pytest.raises(KeyError):
+        user["last_sent"]
+    
+    # Keys that aren't fields behave like absent dict keys too
+    assert "nickname" not in user
+    assert user.get("nickname", "-") == "-"
+    with pytest.raises(KeyError):
+        user["nickname"]
+
+
+def test_falsy_values_are_present():
+    user = User.from_firestore("doc-1", {"phone": "0821234567", "name": "", "active": False})
+    insights = Insights.from_dict({"leads": 0, "revenue": 0.0})
+    
+    assert "active" in user and user["active"] is False
+    assert user.get("name", "fallback") == ""
+    assert insights["leads"] == 0
+    assert insights.get("revenue", 1.0) == 0.0
+
+
+def test_user_round_trips_through_dict():
+    user = User.from_firestore("doc-1", USER_DOC)
+    
+    assert User.from_dict(user.to_dict()) == user
+
+
+def test_insights_round_trip_keeps_unknown_keys():
+    data = {"leads": 12, "sales_change": "+5.0%", "portal_share": 60, "generated_at": "2026-10-19T08:00"}
+    insights = Insights.from_dict(data)
+    
+    assert insights.to_dict() == data
+    assert insights["leads"] == 12
+    assert "portal_share" not in insights  # extras are kept for to_dict(), not key access
+    assert "commission" not in insights
+
+
+def test_text_message_matches_the_old_payload():
+    message = OutboundMessage.text("0821234567", "Hello 👋")
+    
+    assert message.to_graph() == old_text_payload("0821234567", "Hello 👋")
+    assert message.encode() == orjson.dumps(old_text_payload("0821234567", "Hello 👋"))
+
+
+def test_media_message_matches_the_old_payload():
+    media = {"id": "media-42", "caption": "Your week"}
+    message = OutboundMessage.media("+27 82 123 4567", "image", media)
+    
+    assert message.to_graph() == old_media_payload("+27 82 123 4567", "image", media)
+    assert message.encode() == orjson.dumps(old_media_payload("+27 82 123 4567", "image", media))
+
+
+def test_from_graph_round_trips():
+    payload = old_media_payload("0821234567", "document", {"id": "media-1", "filename": "report.pdf"})
+    
+    assert OutboundMessage.from_graph(payload).to_graph() == payload
@@ -0,0 +1,60 @@
+"""
+Inbound rate limiting and reply coalescing, on an injected clock
+"""
+from src.rate_limiter import ReplyCoalescer, SlidingWindowRateLimiter
+
+
+def test_limit_per_window():
+    limiter = SlidingWindowRateLimiter(max_events=3, window_seconds=60)
+    
+    assert [limiter.allow("a", now=t) for t in (0, 1, 2, 3)] == [True, True, True, False]
+    # Other senders have their own window
+    assert limiter.allow("b", now=3)
+
+
+def test_window_slides():
+    limiter = SlidingWindowRateLimiter(max_events=2, window_seconds=60)
+    assert limiter.allow("a", now=0)
+    assert limiter.allow("a", now=30)
+    assert not limiter.allow("a", now=59)
+    
+    # The event at t=0 leaves the window at t=60; the one at t=30 is still in it
+    assert limiter.allow("a", now=60)
+    assert not limiter.allow("a", now=61)
+    assert limiter.allow("a", now=90.5)
+
+
+def test_dropped_events_do_not_extend_the_window():
+    limiter = SlidingWindowRateLimiter(max_events=1, window_seconds=10)
+    assert limiter.allow("a", now=0)
+    assert not limiter.allow("a", now=5)
+    assert limiter.allow("a", now=10)
+
+
+def test_idle_keys_are_pruned(monkeypatch):
+    monkeypatch.setattr(SlidingWindowRateLimiter, "PRUNE_EVERY", 3)
+    limiter = SlidingWindowRateLimiter(max_events=5, window_seconds=10)
+    limiter.allow("idle", now=0)
+    limiter.allow("busy", now=20)
+    limiter.allow("busy", now=21)
+    
+    assert "idle" not in limiter._events
+    assert "busy" in limiter._events
+
+
+def test_burst_is_coalesced_into_one_reply():
+    coalescer = ReplyCoalescer(window_seconds=30)
+    
+    assert coalescer.claim("insights:27821234567", now=0)
+    assert not coalescer.claim("insights:27821234567", now=1)
+    assert not coalescer.claim("insights:27821234567", now=29.9)
+    # A different request type or sender is answered separately
+    assert coalescer.claim("help:27821234567", now=1)
+    assert coalescer.claim("insights:27829999999", now=1)
+
+
+def test_claim_is_available_again_after_the_window():
+    coalescer = ReplyCoalescer(window_seconds=30)
+    assert coalescer.claim("insights:1", now=0)
+    assert coalescer.claim("insights:1", now=30)
+    assert not coalescer.claim("insights:1", now=45)
@@ -0,0 +1,84 @@
+"""
+Per-recipient pacing: minimum gap between releases and slot pruning
+"""
+from src.recipient_queue import RecipientQueue
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_paced_never_releases_one_recipient_closer_than_the_gap():
+    clock = Clock()
+    queue = RecipientQueue(min_gap=5.0, clock=clock)
+    items = [("0821", "chart"), ("0821", "text"), ("0832", "text"), ("0821", "retry")]
+    released = []
+    
+    for recipient, item in queue.paced(items, recipient_of=lambda pair: pair[0], sleep=clock.sleep):
+        released.append((clock.now, recipient, item))
+    
+    assert [item for _, _, item in released] == ["chart", "text", "text", "retry"]
+    times = [when for when, recipient, _ in released if recipient == "0821"]
+    assert all(later - earlier >= 5.0 for earlier, later in zip(times, times[1:]))
+    # Other recipients are not held behind the paced one
+    assert [when for when, recipient, _ in released if recipient == "0832"] == [100.0]
+
+
+def test_reserve_respects_a_later_actual_send_and_planned_time():
+    clock = Clock()
+    queue = RecipientQueue(min_gap=5.0, clock=clock)
+    
+    assert queue.reserve("0821") == 100.0
+    assert queue.reserve("0821", last_sent=103.0) == 108.0
+    assert queue.reserve("0832", not_before=150.0) == 150.0
+    assert queue.reserve("0832") == 155.0
+
+
+def test_pop_ready_only_returns_due_items():
+    clock = Clock()
+    queue = RecipientQueue(min_gap=5.0, clock=clock)
+    queue.push("0821", "first")
+    queue.push("0821", "second")
+    
+    assert queue.pop_ready() == ["first"]
+    assert queue.next_delay() == 5.0
+    
+    clock.now += 5.0
+    assert queue.pop_ready() == ["second"]
+    assert len(queue) == 0
+
+
+def test_recipients_past_their_gap_are_pruned():
+    clock = Clock()
+    queue = RecipientQueue(min_gap=5.0, clock=clock)
+    for number in range(queue._prune_at):
+        queue.reserve(f"old-{number}")
+    
+    clock.now += 10.0
+    queue.reserve("recent")
+    queue.reserve("new")
+    
+    assert set(queue._last_slot) == {"recent", "new"}
+    # A pruned recipient starts afresh, which is safe because its gap has passed
+    assert queue.reserve("old-0") == clock.now
+
+
+def test_pruning_keeps_recipients_still_inside_their_gap():
+    clock = Clock()
+    queue = RecipientQueue(min_gap=5.0, clock=clock)
+    queue.reserve("busy", not_before=200.0)
+    for number in range(queue._prune_at):
+        queue.reserve(f"old-{number}")
+    
+    clock.now += 10.0
+    queue.reserve("new")
+    
+    assert "busy" in queue._last_slot
+    assert queue.reserve("busy") == 205.0
@@ -0,0 +1,20 @@
+"""
+Message rendering in worker processes
+"""
+import json
+
+from src.render_pool import RenderPool
+
+
+def test_bodies_keep_the_deltas_attached_upstream():
+    user = {"id": "u1", "name": "Agent", "phone": "27821234567", "frequency": "weekly"}
+    insights = {"leads": 5, "deltas": {"leads": {"previous": 4, "change": 1, "percent": 25.0}}}
+    pool = RenderPool(processes=1)
+    try:
+        [(rendered_user, rendered_insights, body)] = list(pool.render([(user, insights)]))
+    finally:
+        pool.close()
+    
+    assert rendered_user is user
+    assert rendered_insights is insights
+    assert "▲ +1, +25.0%" in json.loads(body)["text"]["body"]
@@ -0,0 +1,199 @@
+"""
+Dry-run scheduler runs against synthetic users
+"""
+import heapq
+import time
+from datetime import datetime, timedelta
+
+import pytest
+import pytz
+
+from src.circuit_breaker import CircuitOpenError
+from src.config import settings
+from src.scheduler import InsightsScheduler
+from src.sharding import ShardCoordinator
+
+
+def dry_run_scheduler(users: int = 20, **kwargs) -> InsightsScheduler:
+    """Scheduler that builds payloads for synthetic weekly users without sending"""
+    return InsightsScheduler(use_mock_data=True, dry_run=True, synthetic_users=users,
+                             mock_seed=1, **kwargs)
+
+
+def test_dry_run_with_no_due_users():
+    scheduler = dry_run_scheduler()
+    try:
+        # Synthetic users are all weekly, so no daily user is due
+        result = scheduler.run_once(frequency="daily")
+    finally:
+        scheduler.close()
+    
+    assert result == {"success": 0, "fail": 0}
+    assert scheduler.whatsapp.messages_built == 0
+    assert scheduler.timer.calls["insights"] == 0
+
+
+def test_dry_run_sends_to_every_user():
+    scheduler = dry_run_scheduler(users=20)
+    try:
+        result = scheduler.run_once(frequency="weekly")
+    finally:
+        scheduler.close()
+    
+    assert result == {"success": 20, "fail": 0}
+    assert scheduler.whatsapp.messages_built == 20
+
+
+def test_parked_retry_never_resends(monkeypatch):
+    scheduler = dry_run_scheduler(users=5)
+    failures = {}
+    record_last_sent = scheduler.firebase.update_user_last_sent
+    
+    def update_user_last_sent(user_id, run_id=None):
+        # First attempt per user fails after the message has gone out
+        if user_id not in failures:
+            failures[user_id] = True
+            raise CircuitOpenError("firestore", 0)
+        record_last_sent(user_id, run_id)
+    
+    monkeypatch.setattr(scheduler.firebase, "update_user_last_sent", update_user_last_sent)
+    try:
+        result = scheduler.run_once(frequency="weekly")
+    finally:
+        scheduler.close()
+    
+    assert result == {"success": 5, "fail": 0}
+    assert len(failures) == 5
+    # One send per user: the retry only recorded last_sent
+    assert scheduler.whatsapp.messages_built == 5
+    assert scheduler.firebase.writes["save_insights"] == 5
+    assert scheduler.firebase.writes["update_user_last_sent"] == 5
+
+
+def test_throttle_backoff_grows_per_round():
+    first = InsightsScheduler._throttle_backoff(1)
+    third = InsightsScheduler._throttle_backoff(3)
+    
+    assert first >= max(settings.parked_throttle_backoff_seconds, settings.recipient_min_gap_seconds)
+    assert third > first
+
+
+def test_chart_and_text_keep_the_recipient_gap(monkeypatch):
+    monkeypatch.setattr(settings, "recipient_min_gap_seconds", 0.05)
+    scheduler = dry_run_scheduler(users=10, charts=True)
+    scheduler.send_workers = 4
+    sent = {}
+    build = scheduler.whatsapp._post
+    
+    def post(payload):
+        sent.setdefault(payload["to"], []).append((payload["type"], time.monotonic()))
+        return build(payload)
+    
+    monkeypatch.setattr(scheduler.whatsapp, "_post", post)
+    try:
+        result = scheduler.run_once(frequency="weekly")
+    finally:
+        scheduler.close()
+    
+    assert result == {"success": 10, "fail": 0}
+    for messages in sent.values():
+        (first, first_at), (second, second_at) = messages
+        assert (first, second) == ("image", "text")
+        assert second_at - first_at >= 0.05
+
+
+def test_spread_sends_wait_for_their_planned_time(monkeypatch):
+    scheduler = dry_run_scheduler(users=6, spread=True)
+    start = datetime.now(pytz.utc)
+    sent_at = []
+    
+    def plan(users):
+        # Planned a few tens of milliseconds apart instead of across the window
+        heap = [(start + timedelta(seconds=0.05 * (i + 1)), i, user) for i, user in enumerate(users)]
+        heapq.heapify(heap)
+        return heap
+    
+    monkeypatch.setattr(scheduler.planner, "plan", plan)
+    # Only the dry-run flag makes the plan replay instantly; keep the sinks
+    scheduler.dry_run = False
+    monkeypatch.setattr(scheduler.whatsapp, "send_text_message",
+                        lambda to, message: sent_at.append(datetime.now(pytz.utc)))
+    try:
+        result = scheduler.run_once(frequency="weekly")
+    finally:
+        scheduler.close()
+    
+    assert result == {"success": 6, "fail": 0}
+    assert [at >= start + timedelta(seconds=0.05 * (i + 1)) for i, at in enumerate(sent_at)] == [True] * 6
+    assert scheduler.planner.sends == 6
+    assert scheduler.planner.max_lag < 1
+
+
+def test_lost_lease_stops_the_shard(tmp_path):
+    scheduler = dry_run_scheduler(users=20, shard=(0, 1))
+    # Dry runs take no lease; use a real coordinator whose lease needs renewing every send
+    scheduler.coordinator = ShardCoordinator(path=str(tmp_path / "shards.db"), lease_seconds=1e-9)
+    renewals = []
+    
+    def renew(run_id, shard_index):
+        renewals.append(shard_index)
+        return len(renewals) < 5
+    
+    scheduler.coordinator.renew = renew
+    try:
+        result = scheduler.run_once(run_id="run", frequency="weekly")
+    finally:
+        scheduler.close()
+    
+    assert scheduler.lease_lost
+    assert len(renewals) == 5
+    assert result["success"] == 5
+    assert scheduler.whatsapp.messages_built == 5
+    # The shard was not marked done; its new owner finishes it
+    assert scheduler.coordinator.aggregate("run")["shards_done"] == 0
+
+
+@pytest.mark.parametrize("charts", [False, True])
+def test_failed_insights_stream_falls_back_to_per_user_queries(charts):
+    scheduler = dry_run_scheduler(users=10, charts=charts)
+    mock = scheduler.insights_gen
+    generated = []
+    
+    class BrokenStreamGenerator:
+        """Stream dies after the first user; per-user queries still work"""
+        def stream_cohort_insights(self, user_ids):
+            yield user_ids[0], mock.generate_mock_insights()
+            raise RuntimeError("server closed the connection unexpectedly")
+        
+        def generate_insights_for_user(self, user_id):
+            generated.append(user_id)
+            return mock.generate_mock_insights()
+        
+        def close(self):
+            pass
+    
+    scheduler.use_mock_data = False
+    scheduler.insights_gen = BrokenStreamGenerator()
+    try:
+        result = scheduler.run_once(frequency="weekly")
+    finally:
+        scheduler.close()
+    
+    assert result == {"success": 10, "fail": 0}
+    assert len(generated) == 9
+    assert scheduler.whatsapp.messages_built == (20 if charts else 10)
+
+
+def test_shard_takeover_skips_users_already_sent_in_the_run():
+    scheduler = dry_run_scheduler(users=10)
+    # The previous owner of the shard reached the first four before its lease expired
+    for user in scheduler.firebase.users[:4]:
+        user["last_run_id"] = "run-1"
+    scheduler.firebase.users[4]["last_run_id"] = "run-0"
+    try:
+        result = scheduler.run_once(run_id="run-1", frequency="weekly")
+    finally:
+        scheduler.close()
+    
+    assert result == {"success": 6, "fail": 0}
+    assert scheduler.whatsapp.messages_built == 6
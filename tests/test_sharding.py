@@ -0,0 +1,34 @@
+"""
+Shard lease ownership
+"""
+import sqlite3
+
+from src.sharding import ShardCoordinator
+
+
+def test_renew_fails_once_another_worker_takes_over(tmp_path):
+    path = str(tmp_path / "shards.db")
+    first = ShardCoordinator(path=path, lease_seconds=60)
+    second = ShardCoordinator(path=path, lease_seconds=60)
+    second.owner = "other-host:1"
+    
+    assert first.acquire("run", 0, 2)
+    assert first.renew("run", 0)
+    
+    # The first worker stalls past its lease and the second takes the shard
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE shard_runs SET lease_expires = 0")
+    conn.commit()
+    conn.close()
+    assert second.acquire("run", 0, 2)
+    
+    assert not first.renew("run", 0)
+    assert second.renew("run", 0)
+
+
+def test_renew_fails_after_complete(tmp_path):
+    coordinator = ShardCoordinator(path=str(tmp_path / "shards.db"), lease_seconds=60)
+    assert coordinator.acquire("run", 1, 2)
+    coordinator.complete("run", 1, success=3, fail=0)
+    
+    assert not coordinator.renew("run", 1)
@@ -0,0 +1,18 @@
+"""
+Per-stage timing
+"""
+from src.stage_timer import StageTimer
+
+
+def test_timed_iter_empty():
+    timer = StageTimer()
+    
+    assert list(timer.timed_iter("rows", [])) == []
+    assert timer.calls["rows"] == 0
+
+
+def test_timed_iter_counts_items():
+    timer = StageTimer()
+    
+    assert list(timer.timed_iter("rows", iter([1, 2, 3]))) == [1, 2, 3]
+    assert timer.calls["rows"] == 3
@@ -0,0 +1,97 @@
+"""
+Coalescing of WhatsApp status callbacks
+"""
+from datetime import datetime, timezone
+
+from src.status_tracker import StatusBuffer
+
+
+def callback(message_id: str, status: str, timestamp: int = 1_700_000_000, **extra) -> dict:
+    return {"id": message_id, "status": status, "timestamp": str(timestamp),
+            "recipient_id": "27821234567", **extra}
+
+
+def test_callbacks_for_one_message_collapse_into_one_record():
+    buffer = StatusBuffer(max_pending=100, max_age_seconds=60)
+    buffer.add(callback("wamid.1", "sent", 100))
+    buffer.add(callback("wamid.1", "delivered", 105))
+    
+    [record] = buffer.drain()
+    assert record["status"] == "delivered"
+    assert record["sent_at"] == datetime.fromtimestamp(100, tz=timezone.utc)
+    assert record["delivered_at"] == datetime.fromtimestamp(105, tz=timezone.utc)
+
+
+def test_late_sent_does_not_downgrade_delivered():
+    buffer = StatusBuffer(max_pending=100, max_age_seconds=60)
+    buffer.add(callback("wamid.1", "delivered", 105))
+    buffer.add(callback("wamid.1", "sent", 100))
+    
+    [record] = buffer.drain()
+    assert record["status"] == "delivered"
+    assert "sent_at" in record
+
+
+def test_unknown_statuses_are_ignored():
+    buffer = StatusBuffer(max_pending=100, max_age_seconds=60)
+    assert not buffer.add(callback("wamid.1", "deleted"))
+    assert not buffer.add({"status": "sent"})
+    assert len(buffer) == 0
+
+
+def test_size_threshold_requests_a_flush():
+    buffer = StatusBuffer(max_pending=2, max_age_seconds=60)
+    assert not buffer.add(callback("wamid.1", "sent"))
+    assert buffer.add(callback("wamid.2", "sent"))
+
+
+def test_drain_empties_the_buffer():
+    buffer = StatusBuffer(max_pending=100, max_age_seconds=60)
+    buffer.add(callback("wamid.1", "sent"))
+    buffer.add(callback("wamid.2", "read"))
+    
+    assert {record["message_id"] for record in buffer.drain()} == {"wamid.1", "wamid.2"}
+    assert len(buffer) == 0
+    assert buffer.drain() == []
+    assert not buffer.flush_due()
+
+
+def test_requeue_after_failed_flush_keeps_the_furthest_stage():
+    buffer = StatusBuffer(max_pending=100, max_age_seconds=60)
+    buffer.add(callback("wamid.1", "delivered", 105))
+    buffer.add(callback("wamid.2", "sent", 100))
+    records = buffer.drain()
+    
+    # A read callback arrives while the failed flush is in progress
+    buffer.add(callback("wamid.1", "read", 110))
+    buffer.requeue(records)
+    
+    merged = {record["message_id"]: record for record in buffer.drain()}
+    assert merged["wamid.1"]["status"] == "read"
+    assert {"delivered_at", "read_at"} <= merged["wamid.1"].keys()
+    assert merged["wamid.2"]["status"] == "sent"
+
+
+def test_requeued_status_outranks_an_earlier_newer_callback():
+    buffer = StatusBuffer(max_pending=100, max_age_seconds=60)
+    buffer.add(callback("wamid.1", "read", 110))
+    records = buffer.drain()
+    
+    buffer.add(callback("wamid.1", "sent", 100))
+    buffer.requeue(records)
+    
+    [record] = buffer.drain()
+    assert record["status"] == "read"
+
+
+def test_requeue_restarts_the_age_clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.status_tracker.time.monotonic", lambda: now[0])
+    buffer = StatusBuffer(max_pending=100, max_age_seconds=30)
+    buffer.add(callback("wamid.1", "sent"))
+    records = buffer.drain()
+    
+    buffer.requeue(records)
+    assert not buffer.flush_due()
+    now[0] += 30
+    assert buffer.flush_due()
@@ -0,0 +1,69 @@
+"""
+weekly_insights template parameters and payloads
+"""
+import orjson
+import pytest
+
+from src.insight_generator import InsightGenerator
+from src.template_dispatcher import WeeklyInsightsDispatcher
+from src.template_registry import TemplateValidationError
+
+
+FULL_INSIGHTS = {
+    "leads": 145, "most_active_portal": "P24 - 60%", "new_offers": 0, "sales": 3,
+    "revenue": 8_000_000, "commission": 240_000,
+}
+
+
+def test_template_params_from_full_insights():
+    params = WeeklyInsightsDispatcher.template_params("Thandi", FULL_INSIGHTS)
+    
+    assert params == ["Thandi", "145", "P24 - 60%", "0", "3", "R8,000,000", "R240,000"]
+
+
+def test_template_params_refuse_missing_metrics():
+    # Shape of a real report from the CRM database
+    insights = {"sales_change": "+5.0%", "active_listings": 12, "avg_price": "R1,250,000",
+                "sales_velocity": "21 days"}
+    
+    with pytest.raises(TemplateValidationError, match="leads"):
+        WeeklyInsightsDispatcher.template_params("Thandi", insights)
+
+
+def test_template_params_refuse_empty_name():
+    with pytest.raises(TemplateValidationError):
+        WeeklyInsightsDispatcher.template_params("  ", FULL_INSIGHTS)
+
+
+def test_build_body_refuses_empty_parameter():
+    dispatcher = WeeklyInsightsDispatcher()
+    params = WeeklyInsightsDispatcher.template_params("Thandi", FULL_INSIGHTS)
+    
+    body = orjson.loads(dispatcher.build_body("0821234567", params))
+    assert [p["text"] for p in body["template"]["components"][0]["parameters"]] == params
+    
+    with pytest.raises(ValueError):
+        dispatcher.build_body("0821234567", params[:-1] + [""])
+
+
+def test_generator_produces_every_template_metric():
+    assert set(WeeklyInsightsDispatcher.REQUIRED_METRICS) <= set(InsightGenerator.METRICS)
+
+
+class PausingRegistry:
+    def __init__(self):
+        self.status = "APPROVED"
+    
+    def validate(self, name, language, body_params=None):
+        if self.status != "APPROVED":
+            raise TemplateValidationError(f"Template '{name}' ({language}) is {self.status}, not APPROVED")
+
+
+def test_check_template_sees_changes_after_startup():
+    registry = PausingRegistry()
+    dispatcher = WeeklyInsightsDispatcher(registry=registry)
+    
+    registry.status = "PAUSED"
+    
+    with pytest.raises(TemplateValidationError, match="PAUSED"):
+        dispatcher.check_template()
@@ -0,0 +1,105 @@
+"""
+Template registry fallback to its disk cache
+"""
+import json
+
+import pytest
+import requests
+
+from src.template_registry import TemplateRegistry
+
+
+def unreachable(*args, **kwargs):
+    raise requests.ConnectionError("Graph API unreachable")
+
+
+def test_stale_cache_is_served_when_refresh_fails(tmp_path, monkeypatch):
+    cache_path = tmp_path / "templates.json"
+    cache_path.write_text(json.dumps({
+        "etag": "abc",
+        "fetched_at": 0.0,
+        "templates": [{
+            "name": "weekly_insights",
+            "language": "en",
+            "status": "APPROVED",
+            "components": [{"type": "BODY", "text": "Hi {{1}}, {{2}} leads"}],
+        }],
+    }))
+    monkeypatch.setattr("src.template_registry.requests.get", unreachable)
+    
+    registry = TemplateRegistry(cache_path=str(cache_path))
+    
+    assert registry.is_approved("weekly_insights")
+    assert registry.parameter_counts("weekly_insights")["body"] == 2
+    assert registry.is_stale
+
+
+def test_refresh_failure_without_cache_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr("src.template_registry.requests.get", unreachable)
+    
+    with pytest.raises(requests.ConnectionError):
+        TemplateRegistry(cache_path=str(tmp_path / "templates.json"))
+
+
+class FakeResponse:
+    def __init__(self, templates, status_code=200):
+        self.status_code = status_code
+        self.headers = {"ETag": f"etag-{len(templates)}"}
+        self._templates = templates
+    
+    def raise_for_status(self):
+        pass
+    
+    def json(self):
+        return {"data": self._templates}
+
+
+def template(status):
+    return {"name": "weekly_insights", "language": "en", "status": status,
+            "components": [{"type": "BODY", "text": "Hi {{1}}"}]}
+
+
+def test_lookups_refresh_once_the_ttl_has_passed(tmp_path, monkeypatch):
+    now = [1_000.0]
+    responses = [FakeResponse([template("APPROVED")]), FakeResponse([template("PAUSED")])]
+    calls = []
+    
+    def fake_get(url, headers=None, **kwargs):
+        calls.append(headers.get("If-None-Match"))
+        return responses.pop(0)
+    
+    monkeypatch.setattr("src.template_registry.time.time", lambda: now[0])
+    monkeypatch.setattr("src.template_registry.requests.get", fake_get)
+    registry = TemplateRegistry(cache_path=str(tmp_path / "templates.json"), ttl_seconds=60)
+    
+    now[0] += 30
+    assert registry.is_approved("weekly_insights")
+    assert len(calls) == 1
+    
+    now[0] += 60
+    assert not registry.is_approved("weekly_insights")
+    assert calls == [None, "etag-1"]
+
+
+def test_failing_refresh_is_not_retried_on_every_lookup(tmp_path, monkeypatch):
+    now = [1_000.0]
+    calls = []
+    
+    def fake_get(url, headers=None, **kwargs):
+        calls.append(url)
+        if len(calls) > 1:
+            raise requests.ConnectionError("Graph API unreachable")
+        return FakeResponse([template("APPROVED")])
+    
+    monkeypatch.setattr("src.template_registry.time.time", lambda: now[0])
+    monkeypatch.setattr("src.template_registry.requests.get", fake_get)
+    registry = TemplateRegistry(cache_path=str(tmp_path / "templates.json"), ttl_seconds=60)
+    
+    now[0] += 120
+    registry.validate("weekly_insights", body_params=["Thandi"])
+    registry.validate("weekly_insights", body_params=["Thandi"])
+    assert len(calls) == 2
+    
+    now[0] += TemplateRegistry.RETRY_SECONDS
+    assert registry.is_approved("weekly_insights")
+    assert len(calls) == 3
@@ -0,0 +1,118 @@
+"""
+Bulk user import: record validation and batched writes
+"""
+import itertools
+
+import pytest
+
+from src import firebase_manager
+from src.firebase_manager import FirebaseManager
+from src.user_import import import_users, normalize_record, read_records
+
+
+class FakeBatch:
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+    
+    def set(self, ref, data):
+        self.writes.append((ref.id, data))
+    
+    def commit(self):
+        if self.db.fail_commits:
+            raise RuntimeError("commit failed")
+        self.db.committed.extend(self.writes)
+
+
+class FakeDocument:
+    def __init__(self, doc_id):
+        self.id = doc_id
+
+
+class FakeCollection:
+    def __init__(self):
+        self.ids = itertools.count()
+    
+    def document(self):
+        return FakeDocument(f"user-{next(self.ids)}")
+
+
+class FakeDb:
+    def __init__(self, fail_commits=False):
+        self.fail_commits = fail_commits
+        self.committed = []
+    
+    def batch(self):
+        return FakeBatch(self)
+
+
+def fake_manager(fail_commits=False) -> FirebaseManager:
+    manager = FirebaseManager.__new__(FirebaseManager)
+    manager.db = FakeDb(fail_commits)
+    manager.users_collection = FakeCollection()
+    manager.get_phone_index = lambda: {}
+    return manager
+
+
+def test_malformed_jsonl_lines_are_rejected_not_fatal(tmp_path, monkeypatch):
+    path = tmp_path / "agents.jsonl"
+    path.write_text(
+        '{"name": "Ann", "phone": "0821234567"}\n'
+        '{"name": "Bob", "phone": \n'
+        '["not", "a", "dict"]\n'
+        '\n'
+        '{"name": "Cat", "phone": "0831234567", "timezone": "Africa/Johannesburg"}\n'
+    )
+    manager = fake_manager()
+    monkeypatch.setattr(firebase_manager, "FirebaseManager", lambda: manager)
+    
+    summary = import_users(str(path))
+    
+    assert summary == {"read": 4, "invalid": 2, "added": 2, "duplicates": 0}
+    assert [data["name"] for _, data in manager.db.committed] == ["Ann", "Cat"]
+
+
+def test_read_records_yields_none_for_bad_json(tmp_path):
+    path = tmp_path / "agents.jsonl"
+    path.write_text('{"name": "Ann"}\n{broken\n')
+    
+    assert list(read_records(str(path))) == [{"name": "Ann"}, None]
+
+
+@pytest.mark.parametrize("timezone, valid", [
+    ("Africa/Johannesburg", True),
+    ("Europe/London", True),
+    ("Mars/Olympus_Mons", False),
+    ("../etc/passwd", False),
+    ("SAST", False),
+])
+def test_timezone_is_validated(timezone, valid):
+    user = normalize_record({"name": "Ann", "phone": "0821234567", "timezone": timezone})
+    assert (user is not None) == valid
+
+
+def test_non_dict_records_are_invalid():
+    assert normalize_record(None) is None
+    assert normalize_record(["Ann", "0821234567"]) is None
+
+
+def test_bulk_add_dedupes_within_the_import():
+    manager = fake_manager()
+    index = {"27820000000": "existing"}
+    users = [{"name": "Ann", "phone": "27821234567"}, {"name": "Ann again", "phone": "27821234567"},
+             {"name": "Old", "phone": "27820000000"}, {"name": "Bob", "phone": "27831234567"}]
+    
+    result = manager.bulk_add_users(users, batch_size=1, phone_index=index)
+    
+    assert result == {"added": 2, "duplicates": 2}
+    assert set(index) == {"27820000000", "27821234567", "27831234567"}
+
+
+def test_failed_commit_leaves_the_phone_index_unchanged():
+    manager = fake_manager(fail_commits=True)
+    index = {}
+    
+    with pytest.raises(RuntimeError):
+        manager.bulk_add_users([{"name": "Ann", "phone": "27821234567"}], phone_index=index)
+    
+    assert index == {}
@@ -0,0 +1,51 @@
+"""
+X-Hub-Signature-256 verification
+"""
+import hashlib
+import hmac
+
+from src.webhook_security import SignatureVerifier
+
+SECRET = "app-secret"
+BODY = b'{"entry": [{"changes": []}]}'
+
+
+def sign(body: bytes, secret: str = SECRET) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_valid_signature_is_accepted():
+    assert SignatureVerifier(SECRET).verify(BODY, sign(BODY))
+
+
+def test_tampered_body_is_rejected():
+    assert not SignatureVerifier(SECRET).verify(BODY + b" ", sign(BODY))
+
+
+def test_wrong_secret_is_rejected():
+    assert not SignatureVerifier(SECRET).verify(BODY, sign(BODY, "other-secret"))
+
+
+def test_missing_header_is_rejected():
+    verifier = SignatureVerifier(SECRET)
+    assert not verifier.verify(BODY, None)
+    assert not verifier.verify(BODY, "")
+
+
+def test_malformed_header_is_rejected():
+    verifier = SignatureVerifier(SECRET)
+    digest = sign(BODY)[len("sha256="):]
+    assert not verifier.verify(BODY, digest)
+    assert not verifier.verify(BODY, "sha1=" + digest)
+    assert not verifier.verify(BODY, "sha256=not-hex-é")
+
+
+def test_missing_secret_fails_closed_outside_development():
+    verifier = SignatureVerifier("", environment="production")
+    assert not verifier.enabled
+    assert not verifier.verify(BODY, sign(BODY))
+    assert not verifier.verify(BODY, None)
+
+
+def test_missing_secret_allows_unsigned_in_development():
+    assert SignatureVerifier("", environment="development").verify(BODY, None)
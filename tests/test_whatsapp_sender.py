@@ -0,0 +1,51 @@
+"""
+WhatsApp sender media cache setup
+"""
+import pytest
+
+from src import whatsapp_sender
+from src.whatsapp_sender import WhatsAppSender
+
+
+class FakeResponse:
+    def json(self):
+        return {"id": "media-1"}
+
+
+@pytest.fixture
+def created(monkeypatch):
+    created = []
+    
+    class CountingCache(whatsapp_sender.MediaCache):
+        def __init__(self, *args, **kwargs):
+            created.append(self)
+            super().__init__(*args, **kwargs)
+    
+    monkeypatch.setattr(whatsapp_sender, "MediaCache", CountingCache)
+    monkeypatch.setattr(whatsapp_sender, "graph_post", lambda *args, **kwargs: FakeResponse())
+    return created
+
+
+def test_media_cache_is_not_opened_until_a_cached_upload(created, isolated_cwd):
+    sender = WhatsAppSender()
+    sender.build_text_payload("0821234567", "Hi")
+    sender.upload_media(b"chart", "image/png", cache=False)
+    
+    assert created == []
+    assert not (isolated_cwd / "data").exists()
+    
+    assert sender.upload_media(b"logo", "image/png") == "media-1"
+    assert sender.upload_media(b"logo", "image/png") == "media-1"
+    assert len(created) == 1
+    assert sender.media_cache is created[0]
+
+
+def test_given_media_cache_is_used(created, tmp_path):
+    cache = whatsapp_sender.MediaCache(path=str(tmp_path / "media.json"))
+    created.clear()
+    
+    sender = WhatsAppSender(media_cache=cache)
+    sender.upload_media(b"logo", "image/png")
+    
+    assert created == []
+    assert cache.get(whatsapp_sender.content_digest(b"logo")) == "media-1"